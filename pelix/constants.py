@@ -70,6 +70,35 @@ Property that indicates the ranking of a service. It is used to sort the
 results of methods like get_service_references()
 """
 
+SERVICE_SCOPE = "service.scope"
+"""
+Property indicating how the service object is given to the consumers:
+the same object for every bundle (SCOPE_SINGLETON), an object created by a
+service factory for each consumer bundle (SCOPE_BUNDLE) or for each request
+(SCOPE_PROTOTYPE).
+This property is set by the framework and can't be modified.
+"""
+
+SCOPE_SINGLETON = "singleton"
+""" The same service object is given to all consumers """
+
+SCOPE_BUNDLE = "bundle"
+"""
+The service object is a service factory, called once per consumer bundle.
+It must implement:
+
+* get_service(bundle, registration) -> service object
+* unget_service(bundle, registration, service)
+"""
+
+SCOPE_PROTOTYPE = "prototype"
+"""
+The service object is a prototype service factory: get_service() gives the
+same object to all the calls of a bundle, but the ServiceObjects returned by
+BundleContext.get_service_objects() get a new object from the factory on each
+call. The factory implements the same methods as a SCOPE_BUNDLE factory.
+"""
+
 FRAMEWORK_UID = "framework.uid"
 """
 Framework instance "unique" identifier. Used in Remote Services to identify
@@ -78,6 +107,13 @@ It can be generated or be forced using the framework initialization properties.
 This property is constant during the life of a framework instance.
 """
 
+LOCKS_PROFILING = "pelix.locks.profiling"
+"""
+If this framework property is set to a "true" value, the internal locks of the
+framework and of iPOPO record their wait and hold times, and the stacks of
+their holders. See Framework.get_lock_profiler().
+"""
+
 # ------------------------------------------------------------------------------
 
 class BundleException(Exception):
@@ -43,12 +43,14 @@ from pelix.constants import *
 # Pelix beans
 from pelix.internals.events import BundleEvent, ServiceEvent
 from pelix.internals.registry import EventDispatcher, ServiceRegistry, \
-    ServiceReference, ServiceRegistration
+    ServiceReference, ServiceRegistration, ServiceObjects
+from pelix.internals.locks import LockProfiler, create_lock
 
 # Pelix utility modules
 from pelix.utilities import SynchronizedClassMethod, is_string
 
 # Standard library
+import bisect
 import imp
 import importlib
 import inspect
@@ -100,7 +102,8 @@ class Bundle(object):
         :param module: The bundle module
         """
         # A reentrant lock for synchronization
-        self._lock = threading.RLock()
+        self._lock = create_lock(framework._lock_profiler, "Bundle._lock",
+                                 True)
 
         # Bundle
         self.__context = BundleContext(framework, self)
@@ -113,7 +116,8 @@ class Bundle(object):
 
         # Registered services
         self.__registered_services = []
-        self.__registration_lock = threading.Lock()
+        self.__registration_lock = create_lock(framework._lock_profiler,
+                                               "Bundle.__registration_lock")
 
 
     def __str__(self):
@@ -505,10 +509,6 @@ class Framework(Bundle):
 
         :param properties: The framework properties
         """
-        # Framework bundle set up
-        Bundle.__init__(self, self, 0, self.get_symbolic_name(),
-                        sys.modules[__name__])
-
         # Framework properties
         if not isinstance(properties, dict):
             self.__properties = {}
@@ -516,6 +516,18 @@ class Framework(Bundle):
             # Use a copy of the properties, to avoid external changes
             self.__properties = properties.copy()
 
+        # Locks profiler (set before creating the locks)
+        profiling = self.__properties.get(LOCKS_PROFILING,
+                                          os.getenv(LOCKS_PROFILING))
+        if is_string(profiling):
+            profiling = profiling.strip().lower() in ('1', 'true', 'yes', 'on')
+
+        self._lock_profiler = LockProfiler() if profiling else None
+
+        # Framework bundle set up
+        Bundle.__init__(self, self, 0, self.get_symbolic_name(),
+                        sys.modules[__name__])
+
         # Generate a framework instance UUID, if needed
         framework_uid = self.__properties.get(FRAMEWORK_UID)
         if not framework_uid:
@@ -525,7 +537,8 @@ class Framework(Bundle):
         self.__properties[FRAMEWORK_UID] = str(framework_uid)
 
         # Properties lock
-        self.__properties_lock = threading.Lock()
+        self.__properties_lock = create_lock(self._lock_profiler,
+                                             "Framework.__properties_lock")
 
         # Bundles (start at 1, as 0 is reserved for the framework itself)
         self.__next_bundle_id = 1
@@ -534,13 +547,15 @@ class Framework(Bundle):
         self.__bundles = {}
 
         # Bundles lock
-        self.__bundles_lock = threading.RLock()
+        self.__bundles_lock = create_lock(self._lock_profiler,
+                                          "Framework.__bundles_lock", True)
 
         # Event dispatcher
-        self._dispatcher = EventDispatcher()
+        self._dispatcher = EventDispatcher(lock_profiler=self._lock_profiler)
 
         # Service registry
-        self._registry = ServiceRegistry(self)
+        self._registry = ServiceRegistry(self,
+                                         lock_profiler=self._lock_profiler)
         self.__unregistering_services = {}
 
         # The wait_for_stop event (initially stopped)
@@ -656,6 +671,17 @@ class Framework(Bundle):
             return self.__properties.get(name, os.getenv(name))
 
 
+    def get_lock_profiler(self):
+        """
+        Retrieves the profiler of the framework and iPOPO internal locks, if
+        activated by the ``pelix.locks.profiling`` framework property. Its
+        snapshot() method returns the statistics of the locks.
+
+        :return: A LockProfiler object, or None
+        """
+        return self._lock_profiler
+
+
     def get_property_keys(self):
         """
         Returns an array of the keys in the properties of the service
@@ -682,7 +708,8 @@ class Framework(Bundle):
         if not isinstance(reference, ServiceReference):
             raise TypeError("Second argument must be a ServiceReference object")
 
-        if reference in self.__unregistering_services:
+        if reference in self.__unregistering_services \
+                and not reference.is_factory():
             # Unregistering service, just give it
             return self.__unregistering_services[reference]
 
@@ -905,16 +932,16 @@ class Framework(Bundle):
         return bundles, failed
 
 
-    def register_service(self, bundle, clazz, service, properties, send_event):
+    def __prepare_registration(self, bundle, clazz, service, properties):
         """
-        Registers a service and calls the listeners
+        Checks the parameters of a service registration
 
         :param bundle: The bundle registering the service
         :param clazz: Name(s) of the interface(s) implemented by service
+        :param service: The service instance
         :param properties: Service properties
-        :param send_event: If not, doesn't trigger a service registered event
-        :return: A ServiceRegistration object
-        :raise BundleException: An error occurred while registering the service
+        :return: A (classes, properties) tuple, with normalized values
+        :raise BundleException: Invalid registration parameters
         """
         if bundle is None or service is None or not clazz:
             raise BundleException("Invalid registration parameters")
@@ -948,22 +975,89 @@ class Framework(Bundle):
             # Class OK
             classes.append(svc_clazz)
 
+        return classes, properties
+
+
+    def fire_registered_events(self, registrations):
+        """
+        Calls the service listeners about the given registrations. This method
+        must only be called for services registered without sending events.
+
+        :param registrations: A list of ServiceRegistration objects
+        """
+        for registration in registrations:
+            event = ServiceEvent(ServiceEvent.REGISTERED,
+                                 registration.get_reference())
+            self._dispatcher.fire_service_event(event)
+
+
+    def register_service(self, bundle, clazz, service, properties, send_event,
+                         factory=False, prototype=False):
+        """
+        Registers a service and calls the listeners
+
+        :param bundle: The bundle registering the service
+        :param clazz: Name(s) of the interface(s) implemented by service
+        :param properties: Service properties
+        :param send_event: If not, doesn't trigger a service registered event
+        :param factory: If True, the given service is a service factory
+        :param prototype: If True, the given service is a prototype service
+                          factory (implies *factory*)
+        :return: A ServiceRegistration object
+        :raise BundleException: An error occurred while registering the service
+        """
+        classes, properties = self.__prepare_registration(bundle, clazz,
+                                                          service, properties)
+
         # Make the service registration
         registration = self._registry.register(bundle, classes, properties,
-                                               service)
+                                               service, factory, prototype)
 
         # Update the bundle registration information
         bundle._registered_service(registration)
 
         if send_event:
             # Call the listeners
-            event = ServiceEvent(ServiceEvent.REGISTERED,
-                                 registration.get_reference())
-            self._dispatcher.fire_service_event(event)
+            self.fire_registered_events((registration,))
 
         return registration
 
 
+    def register_services(self, services, send_event=True):
+        """
+        Registers a batch of services. The registry is locked only once, and
+        the listeners are called after all services have been registered, in
+        the order of the given list.
+
+        :param services: A list of (bundle, clazz, service, properties) tuples
+        :param send_event: If not, doesn't trigger the service registered
+                           events (see fire_registered_events())
+        :return: The list of ServiceRegistration objects, in the same order
+        :raise BundleException: Invalid registration parameters (no service
+                                is registered in that case)
+        """
+        # Check all parameters before registering anything
+        entries = []
+        for bundle, clazz, service, properties in services:
+            classes, properties = self.__prepare_registration(bundle, clazz,
+                                                              service,
+                                                              properties)
+            entries.append((bundle, classes, properties, service))
+
+        # Make the service registrations
+        registrations = self._registry.register_many(entries)
+
+        # Update the bundles registration information
+        for entry, registration in zip(entries, registrations):
+            entry[0]._registered_service(registration)
+
+        if send_event:
+            # Call the listeners
+            self.fire_registered_events(registrations)
+
+        return registrations
+
+
     @SynchronizedClassMethod('_lock')
     def start(self):
         """
@@ -1130,6 +1224,10 @@ class Framework(Bundle):
         # Remove the unregistering reference
         del self.__unregistering_services[reference]
 
+        if reference.is_factory():
+            # Release the services created by the factory
+            self._registry.release_service_factory(reference)
+
         return True
 
 
@@ -1322,6 +1420,22 @@ class BundleContext(object):
         return self.__framework.get_service(self.__bundle, reference)
 
 
+    def get_service_objects(self, reference):
+        """
+        Returns a ServiceObjects object, which gives the service objects of
+        the given reference. With a prototype service factory, each call to
+        its get_service() method returns a new service object.
+
+        :param reference: A ServiceReference object
+        :return: A ServiceObjects object
+        :raise TypeError: The argument is not a ServiceReference object
+        """
+        if not isinstance(reference, ServiceReference):
+            raise TypeError("Argument must be a ServiceReference object")
+
+        return ServiceObjects(self.__framework, self.__bundle, reference)
+
+
     def get_service_reference(self, clazz, ldap_filter=None):
         """
         Returns a ServiceReference object for a service that implements and \
@@ -1405,19 +1519,36 @@ class BundleContext(object):
         return self.__framework.install_visiting(path, visitor)
 
 
-    def register_service(self, clazz, service, properties, send_event=True):
+    def register_service(self, clazz, service, properties, send_event=True,
+                         factory=False, prototype=False):
         """
-        Registers a service
+        Registers a service.
+
+        If *factory* is True, the given service must be a service factory,
+        i.e. an object with the following methods, called the first time a
+        bundle gets the service and when it releases it:
+
+        * get_service(bundle, registration) -> service object
+        * unget_service(bundle, registration, service)
+
+        If *prototype* is True, the service factory is also called each time a
+        bundle gets a service object through the ServiceObjects returned by
+        get_service_objects().
 
         :param clazz: Class or Classes (list) implemented by this service
         :param service: The service instance
         :param properties: The services properties (dictionary)
         :param send_event: If not, doesn't trigger a service registered event
+        :param factory: If True, the given service is a service factory
+        :param prototype: If True, the given service is a prototype service
+                          factory (implies *factory*)
         :return: A ServiceRegistration object
         :raise BundleException: An error occurred while registering the service
         """
         return self.__framework.register_service(self.__bundle, clazz,
-                                                service, properties, send_event)
+                                                 service, properties,
+                                                 send_event, factory,
+                                                 prototype)
 
 
     def remove_bundle_listener(self, listener):
@@ -1462,6 +1593,274 @@ class BundleContext(object):
 
 # ------------------------------------------------------------------------------
 
+class ServiceTracker(object):
+    """
+    Keeps track of the services matching a specification and a filter, using
+    service events instead of looking for them on each call.
+
+    The best service (highest ranking, then lowest service ID) is kept with
+    its service object: get() is a simple read. With *aggregate* set, the
+    service objects of all the matching services are kept, and get_all()
+    returns a snapshot tuple which is rebuilt only when the tracked services
+    change.
+
+    The tracker must be opened before use, and closed to release the services.
+    It can also be used in a "with" block.
+    """
+    def __init__(self, bundle_context, specification, ldap_filter=None,
+                 aggregate=False):
+        """
+        Sets up the tracker
+
+        :param bundle_context: The context of the bundle using the services
+        :param specification: The specification of the tracked services
+        :param ldap_filter: Filter on the service properties (optional)
+        :param aggregate: If True, get the service objects of all the matching
+                          services
+        :raise ValueError: Invalid specification
+        """
+        if not specification:
+            raise ValueError("A specification is required")
+
+        self.__context = bundle_context
+        self.__specification = specification
+        self.__filter = ldap_filter
+        self.__aggregate = aggregate
+        self.__lock = threading.RLock()
+
+        # Tracked references, sorted: the best one is the last
+        self.__references = []
+
+        # Service reference -> Service object
+        self.__services = {}
+
+        # Read without the lock: (best reference, service object) tuple and
+        # tuple of the service objects, best first
+        self.__best = (None, None)
+        self.__snapshot = tuple()
+        self.__opened = False
+
+
+    def __enter__(self):
+        """
+        Opens the tracker when entering a "with" block
+        """
+        self.open()
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        Closes the tracker when leaving a "with" block
+        """
+        self.close()
+        return False
+
+
+    def __len__(self):
+        """
+        Returns the number of tracked services
+        """
+        return len(self.__references)
+
+
+    def open(self):
+        """
+        Starts tracking the services. Does nothing if the tracker is already
+        opened.
+        """
+        with self.__lock:
+            if self.__opened:
+                return
+
+            self.__opened = True
+            self.__context.add_service_listener(self, self.__filter,
+                                                self.__specification)
+
+            references = self.__context.get_all_service_references(
+                                    self.__specification, self.__filter) or []
+            for reference in references:
+                if reference not in self.__references:
+                    bisect.insort(self.__references, reference)
+
+                    if self.__aggregate:
+                        self.__get_service(reference)
+
+            self.__update()
+
+
+    def close(self):
+        """
+        Stops tracking the services and releases them
+        """
+        with self.__lock:
+            if not self.__opened:
+                return
+
+            self.__opened = False
+            self.__context.remove_service_listener(self)
+
+            for reference in list(self.__services):
+                self.__unget_service(reference)
+
+            del self.__references[:]
+            self.__best = (None, None)
+            self.__snapshot = tuple()
+
+
+    def get(self):
+        """
+        Returns the service object of the best tracked service
+
+        :return: A service object, or None
+        """
+        return self.__best[1]
+
+
+    def get_reference(self):
+        """
+        Returns the reference of the best tracked service
+
+        :return: A ServiceReference object, or None
+        """
+        return self.__best[0]
+
+
+    def get_all(self):
+        """
+        Returns the service objects of all the tracked services, best first.
+        Only the best one is given if the tracker is not an aggregate one.
+
+        :return: A tuple of service objects (can be empty)
+        """
+        return self.__snapshot
+
+
+    def get_references(self):
+        """
+        Returns the references of all the tracked services, best first
+
+        :return: A list of ServiceReference objects (can be empty)
+        """
+        with self.__lock:
+            return self.__references[::-1]
+
+
+    def service_changed(self, event):
+        """
+        Called by the framework when a service event occurs
+
+        :param event: A ServiceEvent object
+        """
+        kind = event.get_kind()
+        reference = event.get_service_reference()
+
+        with self.__lock:
+            if not self.__opened:
+                return
+
+            known = reference in self.__references
+            if kind in (ServiceEvent.REGISTERED, ServiceEvent.MODIFIED) \
+                    and not known:
+                # New matching service
+                bisect.insort(self.__references, reference)
+                if self.__aggregate:
+                    self.__get_service(reference)
+
+                self.__update(True)
+
+            elif kind == ServiceEvent.MODIFIED:
+                # The ranking might have changed
+                previous = self.__references[:]
+                self.__references.sort()
+                self.__update(previous != self.__references)
+
+            elif kind in (ServiceEvent.UNREGISTERING,
+                          ServiceEvent.MODIFIED_ENDMATCH) and known:
+                # The service doesn't match anymore
+                self.__references.remove(reference)
+                if reference in self.__services:
+                    self.__unget_service(reference)
+
+                self.__update(True)
+
+
+    def __get_service(self, reference):
+        """
+        Gets the service object of the given reference. The lock must be held
+        by the caller.
+
+        If the service can't be retrieved (e.g. its factory failed), its
+        reference is dropped: it will be tracked again if it is modified.
+
+        :param reference: A ServiceReference object
+        :return: True if the service object has been retrieved
+        """
+        try:
+            self.__services[reference] = self.__context.get_service(reference)
+            return True
+
+        except BundleException as ex:
+            _logger.warning("Error getting the tracked service %s: %s",
+                            reference, ex)
+            self.__references.remove(reference)
+            return False
+
+
+    def __unget_service(self, reference):
+        """
+        Releases the service object of the given reference. The lock must be
+        held by the caller.
+
+        :param reference: A ServiceReference object
+        """
+        del self.__services[reference]
+        try:
+            self.__context.unget_service(reference)
+
+        except BundleException:
+            # Service already gone
+            pass
+
+
+    def __update(self, changed=True):
+        """
+        Updates the best service and the snapshot. The lock must be held by the
+        caller.
+
+        :param changed: If False, the snapshot is kept as is
+        """
+        best_ref = self.__references[-1] if self.__references else None
+        previous_ref = self.__best[0]
+        if not self.__aggregate:
+            # Get the new best service, falling back to the next ones on error
+            while best_ref is not None and best_ref is not previous_ref \
+                    and not self.__get_service(best_ref):
+                best_ref = self.__references[-1] if self.__references else None
+
+        if best_ref is not previous_ref:
+            if not self.__aggregate and previous_ref in self.__services:
+                # Release the previous best service
+                self.__unget_service(previous_ref)
+
+            if best_ref is None:
+                self.__best = (None, None)
+
+            else:
+                self.__best = (best_ref, self.__services[best_ref])
+
+        if self.__aggregate:
+            if changed:
+                self.__snapshot = tuple(self.__services[reference]
+                                        for reference
+                                        in reversed(self.__references))
+
+        elif best_ref is not previous_ref:
+            self.__snapshot = (self.__best[1],) if best_ref is not None \
+                              else tuple()
+
+# ------------------------------------------------------------------------------
+
 class FrameworkFactory(object):
     """
     A framework factory
@@ -0,0 +1,368 @@
+#!/usr/bin/env python
+# -- Content-Encoding: UTF-8 --
+"""
+Pelix locks profiling: instrumented locks recording their acquisition wait
+time, their hold time and the stack of their holders, per lock name.
+
+Profiling is activated by the ``pelix.locks.profiling`` framework property;
+the snapshot of the statistics is given by the framework lock profiler.
+
+:author: Thomas Calmant
+:copyright: Copyright 2013, isandlaTech
+:license: Apache License 2.0
+:version: 0.5.5
+:status: Beta
+
+..
+
+    Copyright 2013 isandlaTech
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Module version
+__version_info__ = (0, 5, 5)
+__version__ = ".".join(str(x) for x in __version_info__)
+
+# Documentation strings format
+__docformat__ = "restructuredtext en"
+
+# ------------------------------------------------------------------------------
+
+# Standard library
+import sys
+import threading
+import time
+import traceback
+
+try:
+    # Python 3
+    from threading import get_ident as _get_ident
+
+except ImportError:
+    # Python 2
+    from thread import get_ident as _get_ident
+
+# ------------------------------------------------------------------------------
+
+# Most precise clock available
+_clock = getattr(time, "perf_counter", time.time)
+
+
+def _caller_frame():
+    """
+    Returns the frame of the first caller outside this module
+
+    :return: A frame object, or None
+    """
+    try:
+        frame = sys._getframe(2)
+
+    except (AttributeError, ValueError):
+        # No frame support
+        return None
+
+    while frame is not None and frame.f_globals.get('__name__') == __name__:
+        frame = frame.f_back
+
+    return frame
+
+
+def _format_stack(frame):
+    """
+    Formats the stack of the given frame
+
+    :param frame: A frame object or None
+    :return: A list of strings (can be empty)
+    """
+    if frame is None:
+        return []
+
+    return [line.rstrip() for line in traceback.format_stack(frame)]
+
+# ------------------------------------------------------------------------------
+
+class _LockStats(object):
+    """
+    Statistics of the locks sharing the same name
+    """
+    def __init__(self, name):
+        """
+        Sets up the statistics
+
+        :param name: The name of the locks
+        """
+        self.name = name
+        self.lock = threading.Lock()
+        self.instances = 0
+        self.acquisitions = 0
+        self.contentions = 0
+        self.wait_total = 0.
+        self.wait_max = 0.
+        self.hold_total = 0.
+        self.hold_max = 0.
+        self.hold_max_stack = []
+
+        # id(ProfiledLock) -> (thread name, frame of the acquisition)
+        self.holders = {}
+
+
+    def reset(self):
+        """
+        Resets the counters (keeps the current holders)
+        """
+        with self.lock:
+            self.acquisitions = 0
+            self.contentions = 0
+            self.wait_total = 0.
+            self.wait_max = 0.
+            self.hold_total = 0.
+            self.hold_max = 0.
+            self.hold_max_stack = []
+
+
+    def snapshot(self):
+        """
+        Returns a copy of the statistics
+
+        :return: A dictionary
+        """
+        with self.lock:
+            holders = list(self.holders.values())
+            result = {"instances": self.instances,
+                      "acquisitions": self.acquisitions,
+                      "contentions": self.contentions,
+                      "wait_total": self.wait_total,
+                      "wait_max": self.wait_max,
+                      "hold_total": self.hold_total,
+                      "hold_max": self.hold_max,
+                      "hold_max_stack": self.hold_max_stack[:]}
+
+        result["holders"] = [{"thread": thread_name,
+                              "stack": _format_stack(frame)}
+                             for thread_name, frame in holders]
+        return result
+
+
+class ProfiledLock(object):
+    """
+    A Lock or RLock recording its statistics. Only the outermost acquisition
+    of a reentrant lock is measured.
+    """
+    __slots__ = ('__lock', '__stats', '__reentrant', '__owner', '__depth',
+                 '__acquired_at', '__frame', '__weakref__')
+
+    def __init__(self, stats, reentrant=False):
+        """
+        Sets up the lock
+
+        :param stats: The _LockStats object associated to the lock name
+        :param reentrant: If True, the lock is reentrant (RLock)
+        """
+        self.__lock = threading.RLock() if reentrant else threading.Lock()
+        self.__stats = stats
+        self.__reentrant = reentrant
+        self.__owner = None
+        self.__depth = 0
+        self.__acquired_at = 0.
+        self.__frame = None
+
+        with stats.lock:
+            stats.instances += 1
+
+
+    def __enter__(self):
+        """
+        Acquires the lock in a "with" block
+        """
+        self.acquire()
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        Releases the lock when leaving a "with" block
+        """
+        self.release()
+        return False
+
+
+    def acquire(self, blocking=True, timeout=-1):
+        """
+        Acquires the lock
+
+        :param blocking: If False, don't wait for the lock
+        :param timeout: Maximum time to wait for the lock (Python 3 only)
+        :return: True if the lock has been acquired
+        """
+        ident = _get_ident()
+        if self.__reentrant and self.__owner == ident:
+            # Inner acquisition: not measured
+            self.__lock.acquire()
+            self.__depth += 1
+            return True
+
+        start = _clock()
+        contended = not self.__lock.acquire(False)
+        if contended:
+            if not blocking:
+                acquired = False
+
+            elif timeout is None or timeout < 0:
+                acquired = self.__lock.acquire()
+
+            else:
+                acquired = self.__lock.acquire(True, timeout)
+
+        else:
+            acquired = True
+
+        now = _clock()
+        stats = self.__stats
+        with stats.lock:
+            if contended:
+                stats.contentions += 1
+
+            if not acquired:
+                return False
+
+            wait = now - start
+            stats.acquisitions += 1
+            stats.wait_total += wait
+            if wait > stats.wait_max:
+                stats.wait_max = wait
+
+            frame = _caller_frame()
+            stats.holders[id(self)] = (threading.current_thread().name, frame)
+
+        self.__owner = ident
+        self.__depth = 1
+        self.__acquired_at = now
+        self.__frame = frame
+        return True
+
+
+    def release(self):
+        """
+        Releases the lock
+        """
+        if self.__reentrant and self.__depth > 1:
+            # Inner release
+            self.__depth -= 1
+            self.__lock.release()
+            return
+
+        hold = _clock() - self.__acquired_at
+        frame = self.__frame
+        self.__owner = None
+        self.__depth = 0
+        self.__frame = None
+        self.__lock.release()
+
+        stats = self.__stats
+        with stats.lock:
+            stats.holders.pop(id(self), None)
+            stats.hold_total += hold
+            if hold > stats.hold_max:
+                stats.hold_max = hold
+                stats.hold_max_stack = _format_stack(frame)
+
+
+    def locked(self):
+        """
+        Tests if the lock is held
+
+        :return: True if the lock is held by a thread
+        """
+        return self.__depth > 0
+
+# ------------------------------------------------------------------------------
+
+class LockProfiler(object):
+    """
+    Creates the instrumented locks and gives the snapshot of their statistics,
+    grouped by name
+    """
+    def __init__(self):
+        """
+        Sets up the profiler
+        """
+        # Lock name -> _LockStats
+        self.__stats = {}
+        self.__lock = threading.Lock()
+
+
+    def create_lock(self, name, reentrant=False):
+        """
+        Creates an instrumented lock
+
+        :param name: The name of the lock. Statistics of locks with the same
+                     name are grouped.
+        :param reentrant: If True, create a reentrant lock (RLock)
+        :return: A ProfiledLock object
+        """
+        with self.__lock:
+            try:
+                stats = self.__stats[name]
+
+            except KeyError:
+                stats = self.__stats[name] = _LockStats(name)
+
+        return ProfiledLock(stats, reentrant)
+
+
+    def reset(self):
+        """
+        Resets the statistics of all locks
+        """
+        with self.__lock:
+            all_stats = list(self.__stats.values())
+
+        for stats in all_stats:
+            stats.reset()
+
+
+    def snapshot(self):
+        """
+        Returns the statistics of the locks: a dictionary associating the
+        lock name to a dictionary with the following entries:
+
+        * instances: number of locks created with this name
+        * acquisitions: number of outermost acquisitions
+        * contentions: number of acquisitions which had to wait
+        * wait_total, wait_max: time waited to acquire the locks (seconds)
+        * hold_total, hold_max: time the locks were held (seconds)
+        * hold_max_stack: stack of the acquisition of the longest hold
+        * holders: list of the current holders: {"thread", "stack"}
+
+        :return: A dictionary: name -> statistics
+        """
+        with self.__lock:
+            all_stats = list(self.__stats.values())
+
+        return dict((stats.name, stats.snapshot()) for stats in all_stats)
+
+
+def create_lock(profiler, name, reentrant=False):
+    """
+    Creates a lock, instrumented if a profiler is given
+
+    :param profiler: A LockProfiler object, or None
+    :param name: The name of the lock
+    :param reentrant: If True, create a reentrant lock (RLock)
+    :return: A lock object
+    """
+    if profiler is None:
+        return threading.RLock() if reentrant else threading.Lock()
+
+    return profiler.create_lock(name, reentrant)
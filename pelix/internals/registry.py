@@ -37,8 +37,10 @@ __docformat__ = "restructuredtext en"
 
 # Pelix beans
 from pelix.constants import OBJECTCLASS, SERVICE_ID, SERVICE_RANKING, \
+    SERVICE_SCOPE, SCOPE_BUNDLE, SCOPE_PROTOTYPE, SCOPE_SINGLETON, \
     BundleException
 from pelix.internals.events import ServiceEvent
+from pelix.internals.locks import create_lock
 
 # Pelix utility modules
 from pelix.utilities import is_string
@@ -49,43 +51,62 @@ import bisect
 import logging
 import threading
 
+try:
+    # Python 3
+    from threading import get_ident as _get_ident
+
+except ImportError:
+    # Python 2
+    from thread import get_ident as _get_ident
+
 # ------------------------------------------------------------------------------
 
 class _UsageCounter(object):
     """
-    Simple reference usage counter
+    Simple reference usage counter.
+
+    The counter is a list of tokens: list.append() and list.pop() are atomic,
+    so the counter can be updated without holding a lock.
     """
+    __slots__ = ('__tokens',)
+
     def __init__(self):
         """
         Sets up the counter
         """
-        self.__count = 0
+        self.__tokens = []
 
 
     def inc(self):
         """
         Counter is incremented
         """
-        self.__count += 1
+        self.__tokens.append(None)
 
 
     def dec(self):
         """
         Counter is decremented
-        
+
         :return: True if the counter is still greater than 0
         """
-        self.__count -= 1
-        return self.__count > 0
+        try:
+            self.__tokens.pop()
+
+        except IndexError:
+            # Already at 0
+            pass
+
+        return bool(self.__tokens)
 
 
     def is_used(self):
         """
         Tests if the reference is still used
-        
+
         :return: True if the counter is still greater than 0
         """
-        return self.__count > 0
+        return bool(self.__tokens)
 
 # ------------------------------------------------------------------------------
 
@@ -118,6 +139,9 @@ class ServiceReference(object):
         self.__bundle = bundle
         self.__properties = properties
         self.__service_id = properties[SERVICE_ID]
+        scope = properties.get(SERVICE_SCOPE)
+        self.__is_factory = scope in (SCOPE_BUNDLE, SCOPE_PROTOTYPE)
+        self.__is_prototype = scope == SCOPE_PROTOTYPE
 
         # Bundle object -> Usage Counter object
         self.__using_bundles = {}
@@ -202,6 +226,27 @@ class ServiceReference(object):
         return list(self.__using_bundles.keys())
 
 
+    def is_factory(self):
+        """
+        Checks if the service object is a service factory, i.e. if each
+        consumer bundle gets its own service object
+
+        :return: True if the service is provided by a service factory
+        """
+        return self.__is_factory
+
+
+    def is_prototype(self):
+        """
+        Checks if the service object is a prototype service factory, i.e. if
+        a new service object can be created on each request (see
+        BundleContext.get_service_objects())
+
+        :return: True if the service is provided by a prototype factory
+        """
+        return self.__is_prototype
+
+
     def get_properties(self):
         """
         Returns a copy of the service properties
@@ -271,14 +316,19 @@ class ServiceReference(object):
             self.__using_bundles.setdefault(bundle, _UsageCounter()).inc()
 
 
-    def update_sort_key(self):
+    def update_sort_key(self, ranking=None):
         """
         Recomputes the sort key, based on the service ranking and ID
 
         See: http://www.osgi.org/javadoc/r4v43/org/osgi/framework/ServiceReference.html#compareTo%28java.lang.Object%29
+
+        :param ranking: The new service ranking (if None, the one in the
+                        service properties)
         """
-        self.__sort_key = (int(self.__properties.get(SERVICE_RANKING, 0)),
-                           (-self.__service_id))
+        if ranking is None:
+            ranking = self.__properties.get(SERVICE_RANKING, 0)
+
+        self.__sort_key = (int(ranking), (-self.__service_id))
 
 # ------------------------------------------------------------------------------
 
@@ -327,7 +377,7 @@ class ServiceRegistration(object):
             raise TypeError("Waiting for dictionary")
 
         # Keys that must not be updated
-        forbidden_keys = (OBJECTCLASS, SERVICE_ID)
+        forbidden_keys = (OBJECTCLASS, SERVICE_ID, SERVICE_SCOPE)
 
         for forbidden_key in forbidden_keys:
             if forbidden_key in properties:
@@ -347,15 +397,18 @@ class ServiceRegistration(object):
             # Nothing to do
             return
 
+        if SERVICE_RANKING in properties:
+            # Sort key updated: the registry must sort its lists again.
+            # Done before locking the properties, as the registry reads them
+            # while holding its own lock
+            self.__framework._registry.update_sort_key(
+                                self.__reference, properties[SERVICE_RANKING])
+
         with self.__reference._props_lock:
             # Update the properties
             previous = self.__properties.copy()
             self.__properties.update(properties)
 
-            if SERVICE_RANKING in properties:
-                # Sort key updated
-                self.__reference.update_sort_key()
-
             # Trigger a new computation in the framework
             event = ServiceEvent(ServiceEvent.MODIFIED, self.__reference,
                                  previous)
@@ -369,6 +422,65 @@ class ServiceRegistration(object):
         """
         self.__framework.unregister_service(self)
 
+# ------------------------------------------------------------------------------
+
+class ServiceObjects(object):
+    """
+    Gives the service objects of a service to a bundle. With a prototype
+    service factory, each call to get_service() returns a new service object;
+    other services behave as with BundleContext.get_service().
+    """
+    def __init__(self, framework, bundle, reference):
+        """
+        Sets up the service objects accessor
+
+        :param framework: The host framework
+        :param bundle: The bundle using the service
+        :param reference: A service reference
+        """
+        self.__framework = framework
+        self.__bundle = bundle
+        self.__reference = reference
+
+
+    def get_service(self):
+        """
+        Retrieves a service object. The object must be released with
+        unget_service().
+
+        :return: A service object
+        :raise BundleException: The service could not be found, or its
+                                factory failed
+        """
+        if self.__reference.is_prototype():
+            return self.__framework._registry.get_prototype_service(
+                                                self.__bundle, self.__reference)
+
+        return self.__framework.get_service(self.__bundle, self.__reference)
+
+
+    def get_service_reference(self):
+        """
+        Returns the reference of the service
+
+        :return: A ServiceReference object
+        """
+        return self.__reference
+
+
+    def unget_service(self, service):
+        """
+        Releases a service object given by get_service()
+
+        :param service: A service object
+        :return: True if the service object has been released
+        """
+        if self.__reference.is_prototype():
+            return self.__framework._registry.unget_prototype_service(
+                                    self.__bundle, self.__reference, service)
+
+        return self.__framework._registry.unget_service(self.__bundle,
+                                                        self.__reference)
 
 # ------------------------------------------------------------------------------
 
@@ -396,28 +508,31 @@ class EventDispatcher(object):
     """
     Simple event dispatcher
     """
-    def __init__(self, logger=None):
+    def __init__(self, logger=None, lock_profiler=None):
         """
         Sets up the dispatcher
 
         :param logger: The logger to be used
+        :param lock_profiler: The LockProfiler creating the locks (optional)
         """
         # Logger
         self._logger = logger or logging.getLogger("EventDispatcher")
 
         # Bundle listeners
         self.__bnd_listeners = []
-        self.__bnd_lock = threading.Lock()
+        self.__bnd_lock = create_lock(lock_profiler,
+                                      "EventDispatcher.__bnd_lock")
 
         # Service listeners (specification -> listener bean)
         self.__svc_listeners = {}
         # listener instance -> listener bean
         self.__listeners_data = {}
-        self.__svc_lock = threading.Lock()
+        self.__svc_lock = create_lock(lock_profiler,
+                                      "EventDispatcher.__svc_lock")
 
         # Framework stop listeners
         self.__fw_listeners = []
-        self.__fw_lock = threading.Lock()
+        self.__fw_lock = create_lock(lock_profiler, "EventDispatcher.__fw_lock")
 
 
     def clear(self):
@@ -669,12 +784,13 @@ class ServiceRegistry(object):
 
     Associates service references to instances and bundles.
     """
-    def __init__(self, framework, logger=None):
+    def __init__(self, framework, logger=None, lock_profiler=None):
         """
         Sets up the registry
 
         :param framework: Associated framework
         :param logger: Logger to use
+        :param lock_profiler: The LockProfiler creating the locks (optional)
         """
         # Associated framework
         self.__framework = framework
@@ -697,11 +813,28 @@ class ServiceRegistry(object):
         # Bundle -> Service references[]
         self.__bundle_svc = {}
 
-        # Bundle -> Service references[]
+        # Bundle -> {Service reference -> _UsageCounter}
         self.__bundle_imports = {}
 
+        # Service reference -> (Service factory, Service registration)
+        self.__svc_factories = {}
+
+        # Service reference -> {Bundle -> [Service object given by its
+        # factory, _UsageCounter]}
+        self.__factored = {}
+
+        # Service reference -> {Bundle -> [Service objects given by its
+        # prototype factory]}
+        self.__prototypes = {}
+
         # Locks
-        self.__svc_lock = threading.Lock()
+        self.__svc_lock = create_lock(lock_profiler,
+                                      "ServiceRegistry.__svc_lock")
+
+        # Service objects being created by service factories, made outside
+        # the registry lock as they may register or look for services:
+        # (Service reference, Bundle) -> (Event set when done, thread ID)
+        self.__factoring = {}
 
 
     def clear(self):
@@ -714,9 +847,14 @@ class ServiceRegistry(object):
             self.__svc_bundle.clear()
             self.__bundle_svc.clear()
             self.__bundle_imports.clear()
+            self.__svc_factories.clear()
+            self.__factored.clear()
+            self.__prototypes.clear()
+            self.__factoring.clear()
 
 
-    def register(self, bundle, classes, properties, svc_instance):
+    def register(self, bundle, classes, properties, svc_instance,
+                 factory=False, prototype=False):
         """
         Registers a service.
 
@@ -724,35 +862,82 @@ class ServiceRegistry(object):
         :param classes: The classes implemented by the service
         :param properties: The properties associated to the service
         :param svc_instance: The instance of the service
+        :param factory: If True, svc_instance is a service factory
+        :param prototype: If True, svc_instance is a prototype service factory
         :return: The ServiceRegistration object
         """
         with self.__svc_lock:
-            # Prepare properties
-            service_id = self.__next_service_id
-            self.__next_service_id += 1
-            properties[OBJECTCLASS] = classes
-            properties[SERVICE_ID] = service_id
+            return self.__register(bundle, classes, properties, svc_instance,
+                                   factory, prototype)
+
+
+    def register_many(self, services):
+        """
+        Registers a batch of services, locking the registry only once
+
+        :param services: A list of (bundle, classes, properties, svc_instance)
+                         tuples
+        :return: The list of ServiceRegistration objects, in the same order
+        """
+        with self.__svc_lock:
+            return [self.__register(bundle, classes, properties, svc_instance)
+                    for bundle, classes, properties, svc_instance in services]
 
-            # Make the service reference
-            svc_ref = ServiceReference(bundle, properties)
 
-            # Make the service registration
-            svc_registration = ServiceRegistration(self.__framework, svc_ref,
-                                                   properties)
+    def __register(self, bundle, classes, properties, svc_instance,
+                   factory=False, prototype=False):
+        """
+        Registers a service. The registry lock must be held by the caller.
+
+        :param bundle: The bundle that registers the service
+        :param classes: The classes implemented by the service
+        :param properties: The properties associated to the service
+        :param svc_instance: The instance of the service
+        :param factory: If True, svc_instance is a service factory
+        :param prototype: If True, svc_instance is a prototype service factory
+        :return: The ServiceRegistration object
+        """
+        # Prepare properties
+        service_id = self.__next_service_id
+        self.__next_service_id += 1
+        properties[OBJECTCLASS] = classes
+        properties[SERVICE_ID] = service_id
 
-            # Store service information
-            self.__svc_registry[svc_ref] = svc_instance
-            self.__svc_bundle[svc_ref] = bundle
+        if prototype:
+            # A prototype factory is also a bundle factory
+            factory = True
+            properties[SERVICE_SCOPE] = SCOPE_PROTOTYPE
 
-            for spec in classes:
-                spec_refs = self.__svc_specs.setdefault(spec, [])
-                bisect.insort_left(spec_refs, svc_ref)
+        elif factory:
+            properties[SERVICE_SCOPE] = SCOPE_BUNDLE
 
-            # Reverse map, to ease bundle/service association
-            bundle_services = self.__bundle_svc.setdefault(bundle, [])
-            bisect.insort_left(bundle_services, svc_ref)
+        else:
+            properties[SERVICE_SCOPE] = SCOPE_SINGLETON
 
-            return svc_registration
+        # Make the service reference
+        svc_ref = ServiceReference(bundle, properties)
+
+        # Make the service registration
+        svc_registration = ServiceRegistration(self.__framework, svc_ref,
+                                               properties)
+
+        # Store service information
+        self.__svc_registry[svc_ref] = svc_instance
+        self.__svc_bundle[svc_ref] = bundle
+
+        for spec in classes:
+            spec_refs = self.__svc_specs.setdefault(spec, [])
+            bisect.insort_left(spec_refs, svc_ref)
+
+        # Reverse map, to ease bundle/service association
+        bundle_services = self.__bundle_svc.setdefault(bundle, [])
+        bisect.insort_left(bundle_services, svc_ref)
+
+        if factory:
+            # Keep track of the factory until its services have been released
+            self.__svc_factories[svc_ref] = (svc_instance, svc_registration)
+
+        return svc_registration
 
 
     def unregister(self, svc_ref):
@@ -792,6 +977,33 @@ class ServiceRegistry(object):
             return service
 
 
+    def update_sort_key(self, reference, ranking):
+        """
+        Updates the sort key of the given reference, as its ranking is being
+        modified, and its position in the sorted lists of references
+
+        :param reference: A service reference
+        :param ranking: The new ranking of the service
+        """
+        with self.__svc_lock:
+            if reference not in self.__svc_registry:
+                # Unknown service: only update its key
+                reference.update_sort_key(ranking)
+                return
+
+            # Remove the reference from the sorted lists, using its old key
+            lists = [self.__svc_specs[spec]
+                     for spec in reference.get_property(OBJECTCLASS)]
+            lists.append(self.__bundle_svc[self.__svc_bundle[reference]])
+            for references in lists:
+                del references[bisect.bisect_left(references, reference)]
+
+            # Insert it back with its new key
+            reference.update_sort_key(ranking)
+            for references in lists:
+                bisect.insort_left(references, reference)
+
+
     def find_service_references(self, clazz=None, ldap_filter=None,
                                 only_one=False):
         """
@@ -871,7 +1083,7 @@ class ServiceRegistry(object):
         :return: The references of the services used by this bundle
         """
         with self.__svc_lock:
-            return self.__bundle_imports.get(bundle, [])
+            return sorted(self.__bundle_imports.get(bundle, {}))
 
 
     def get_bundle_registered_services(self, bundle):
@@ -895,16 +1107,35 @@ class ServiceRegistry(object):
         :return: The requested service
         :raise BundleException: The service could not be found
         """
+        if reference.is_factory():
+            # The service object is given by a service factory
+            return self.__get_factored_service(bundle, reference)
+
+        # Fast path: the bundle already uses the service, no lock needed
+        try:
+            counter = self.__bundle_imports[bundle][reference]
+            service = self.__svc_registry[reference]
+
+        except KeyError:
+            # First usage or unknown service
+            pass
+
+        else:
+            counter.inc()
+            if self.__bundle_imports.get(bundle, {}).get(reference) \
+                    is counter:
+                return service
+
+            # The usage has been removed in the meantime: use the slow path
+            counter.dec()
+
         with self.__svc_lock:
             # Be sure to have the instance
             try:
                 service = self.__svc_registry[reference]
 
                 # Indicate the dependency
-                imports = self.__bundle_imports.setdefault(bundle, [])
-                bisect.insort(imports, reference)
-                reference.used_by(bundle)
-
+                self.__add_import(bundle, reference)
                 return service
 
             except KeyError:
@@ -913,33 +1144,360 @@ class ServiceRegistry(object):
                                       .format(reference))
 
 
-    def unget_service(self, bundle, reference):
+    def __add_import(self, bundle, reference):
+        """
+        Indicates that the given bundle uses the given service. The registry
+        lock must be held by the caller.
+
+        :param bundle: The bundle using the service
+        :param reference: A service reference
+        """
+        imports = self.__bundle_imports.setdefault(bundle, {})
+        try:
+            imports[reference].inc()
+
+        except KeyError:
+            # First usage of the service by this bundle
+            counter = imports[reference] = _UsageCounter()
+            counter.inc()
+            reference.used_by(bundle)
+
+
+    def __remove_import(self, bundle, reference):
         """
-        Removes the usage of a service by a bundle
+        Removes one usage of the given service by the given bundle. The
+        registry lock must be held by the caller.
 
         :param bundle: The bundle that used the service
         :param reference: A service reference
-        :return: True if the bundle usage has been removed
+        :return: True if the usage has been removed
+        """
+        try:
+            imports = self.__bundle_imports[bundle]
+            counter = imports[reference]
+
+        except KeyError:
+            # Unknown bundle or reference
+            return False
+
+        if not counter.dec():
+            # The bundle doesn't use the service anymore
+            del imports[reference]
+            if not imports:
+                del self.__bundle_imports[bundle]
+
+            # Update the service reference
+            reference.unused_by(bundle)
+
+        return True
+
+
+    def __call_factory(self, factory, bundle, registration):
+        """
+        Calls the get_service() method of a service factory
+
+        :param factory: The service factory
+        :param bundle: The bundle requiring the service
+        :param registration: The registration of the factory
+        :return: The service object created by the factory
+        :raise BundleException: The factory failed or returned None
+        """
+        reference = registration.get_reference()
+        try:
+            service = factory.get_service(bundle, registration)
+
+        except Exception as ex:
+            self._logger.exception("Error calling the service factory "
+                                   "of %s", reference)
+            raise BundleException("Service factory error: {0}".format(ex))
+
+        if service is None:
+            raise BundleException("Service factory of {0} returned None"
+                                  .format(reference))
+
+        return service
+
+
+    def __get_factory(self, reference):
+        """
+        Retrieves the factory of the given reference and its registration. The
+        registry lock must be held by the caller.
+
+        :param reference: A service reference
+        :return: A (factory, registration) tuple
+        :raise BundleException: Unknown service factory
+        """
+        try:
+            return self.__svc_factories[reference]
+
+        except KeyError:
+            # Not found
+            raise BundleException("Service not found (reference: {0})"
+                                  .format(reference))
+
+
+    def __get_factored_service(self, bundle, reference):
+        """
+        Retrieves the service object the factory of the given reference
+        created for the given bundle. The factory is called the first time the
+        bundle gets the service.
+
+        :param bundle: The bundle requiring the service
+        :param reference: A service reference
+        :return: The requested service
+        :raise BundleException: The service could not be found or the factory
+                                failed
+        """
+        key = (reference, bundle)
+        while True:
+            with self.__svc_lock:
+                factory, registration = self.__get_factory(reference)
+
+                try:
+                    # Already created for this bundle
+                    service, counter = self.__factored[reference][bundle]
+                    counter.inc()
+                    self.__add_import(bundle, reference)
+                    return service
+
+                except KeyError:
+                    # Service object not yet created
+                    pass
+
+                try:
+                    done, owner = self.__factoring[key]
+
+                except KeyError:
+                    # Create the service object in this thread
+                    done = threading.Event()
+                    self.__factoring[key] = (done, _get_ident())
+                    break
+
+            if owner == _get_ident():
+                raise BundleException("Recursive call to the service factory "
+                                      "of {0}".format(reference))
+
+            # Wait for the other thread creating the object for this bundle
+            done.wait()
+
+        try:
+            # Call the factory outside the registry lock
+            service = self.__call_factory(factory, bundle, registration)
+
+            with self.__svc_lock:
+                released = reference not in self.__svc_factories
+                if not released:
+                    counter = _UsageCounter()
+                    counter.inc()
+                    self.__factored.setdefault(reference, {})[bundle] = \
+                                                            [service, counter]
+                    self.__add_import(bundle, reference)
+                    return service
+
+            # Service released while calling the factory
+            self.__unget_factored(factory, registration, bundle, service)
+            raise BundleException("Service released (reference: {0})"
+                                  .format(reference))
+
+        finally:
+            with self.__svc_lock:
+                del self.__factoring[key]
+
+            done.set()
+
+
+    def get_prototype_service(self, bundle, reference):
+        """
+        Retrieves a new service object from the prototype factory of the given
+        reference. The object must be released with unget_prototype_service().
+
+        :param bundle: The bundle requiring the service
+        :param reference: A service reference
+        :return: A new service object
+        :raise BundleException: The service could not be found, is not a
+                                prototype, or the factory failed
+        """
+        if not reference.is_prototype():
+            raise BundleException("Not a prototype service factory: {0}"
+                                  .format(reference))
+
+        with self.__svc_lock:
+            factory, registration = self.__get_factory(reference)
+
+        # Call the factory outside the registry lock
+        service = self.__call_factory(factory, bundle, registration)
+
+        with self.__svc_lock:
+            if reference in self.__svc_factories:
+                self.__prototypes.setdefault(reference, {}) \
+                                 .setdefault(bundle, []).append(service)
+                self.__add_import(bundle, reference)
+                return service
+
+        # Service released while calling the factory
+        self.__unget_factored(factory, registration, bundle, service)
+        raise BundleException("Service released (reference: {0})"
+                              .format(reference))
+
+
+    def unget_prototype_service(self, bundle, reference, service):
+        """
+        Releases a service object given by get_prototype_service(). The
+        prototype factory is notified immediately.
+
+        :param bundle: The bundle that used the service
+        :param reference: A service reference
+        :param service: The service object to release
+        :return: True if the service object has been released
         """
         with self.__svc_lock:
             try:
-                # Remove the service reference from the bundle
-                imports = self.__bundle_imports[bundle]
+                factory, registration = self.__svc_factories[reference]
+                services = self.__prototypes[reference][bundle]
 
-                idx = bisect.bisect_left(imports, reference)
-                if imports[idx] == reference:
-                    del imports[idx]
+            except KeyError:
+                # Unknown service, bundle or factory already released
+                return False
 
-                    if not imports:
-                        del self.__bundle_imports[bundle]
+            # Look for the service object itself, not an equal one
+            for idx, known in enumerate(services):
+                if known is service:
+                    del services[idx]
+                    break
 
-                    # Update the service reference
-                    reference.unused_by(bundle)
-                    return True
+            else:
+                # Unknown service object
+                return False
+
+            if not services:
+                prototypes = self.__prototypes[reference]
+                del prototypes[bundle]
+                if not prototypes:
+                    del self.__prototypes[reference]
+
+            self.__remove_import(bundle, reference)
+
+        self.__unget_factored(factory, registration, bundle, service)
+        return True
+
+
+    def unget_service(self, bundle, reference):
+        """
+        Removes the usage of a service by a bundle.
+        If the service comes from a service factory and the bundle doesn't use
+        it anymore, the factory is notified.
+
+        :param bundle: The bundle that used the service
+        :param reference: A service reference
+        :return: True if the bundle usage has been removed
+        """
+        if not isinstance(reference, ServiceReference):
+            # Invalid reference
+            return False
+
+        if not reference.is_factory():
+            try:
+                counter = self.__bundle_imports[bundle][reference]
 
-                # Unknown reference
+            except KeyError:
+                # Unknown bundle or reference
                 return False
 
+            if counter.dec():
+                # Fast path: the bundle still uses the service
+                return True
+
+            with self.__svc_lock:
+                imports = self.__bundle_imports.get(bundle, {})
+                if imports.get(reference) is counter:
+                    # Forget the usage first: a concurrent fast path call
+                    # then either sees the counter is used again, or misses
+                    # it and takes the lock
+                    del imports[reference]
+                    if counter.is_used():
+                        # The service has been got again in the meantime
+                        imports[reference] = counter
+
+                    else:
+                        if not imports:
+                            del self.__bundle_imports[bundle]
+
+                        reference.unused_by(bundle)
+
+            return True
+
+        with self.__svc_lock:
+            try:
+                service, counter = self.__factored[reference][bundle]
+
             except KeyError:
-                # Unknown bundle
+                # The bundle didn't get the service object
+                return False
+
+            if not self.__remove_import(bundle, reference):
+                # Unknown bundle or reference
                 return False
+
+            if counter.dec():
+                # Nothing more to do
+                return True
+
+            # The bundle doesn't use the factored service anymore
+            factored = self.__factored[reference]
+            del factored[bundle]
+            if not factored:
+                del self.__factored[reference]
+
+            try:
+                factory, registration = self.__svc_factories[reference]
+
+            except KeyError:
+                # Factory already released
+                return True
+
+        self.__unget_factored(factory, registration, bundle, service)
+        return True
+
+
+    def release_service_factory(self, reference):
+        """
+        Releases the service objects created by the service factory of the
+        given reference. Called by the framework once the service has been
+        unregistered and the listeners have been notified.
+
+        :param reference: A service reference
+        """
+        with self.__svc_lock:
+            try:
+                factory, registration = self.__svc_factories.pop(reference)
+
+            except KeyError:
+                # Unknown factory
+                return
+
+            factored = self.__factored.pop(reference, {})
+            prototypes = self.__prototypes.pop(reference, {})
+
+        for bundle, (service, _) in factored.items():
+            self.__unget_factored(factory, registration, bundle, service)
+
+        for bundle, services in prototypes.items():
+            for service in services:
+                self.__unget_factored(factory, registration, bundle, service)
+
+
+    def __unget_factored(self, factory, registration, bundle, service):
+        """
+        Notifies a service factory that a bundle released its service object
+
+        :param factory: The service factory
+        :param registration: The registration of the factory
+        :param bundle: The bundle that released the service
+        :param service: The service object created by the factory
+        """
+        try:
+            factory.unget_service(bundle, registration, service)
+
+        except Exception:
+            self._logger.exception("Error calling the service factory of %s",
+                                   registration.get_reference())
@@ -76,6 +76,7 @@ IPOPO_GETTER_SUFFIX = "_getter"
 IPOPO_SETTER_SUFFIX = "_setter"
 IPOPO_PROPERTY_PREFIX = "_ipopo_property"
 IPOPO_CONTROLLER_PREFIX = "_ipopo_controller"
+IPOPO_BATCH_PROPERTIES = "_ipopo_batch"
 
 # ------------------------------------------------------------------------------
 
@@ -124,6 +125,40 @@ IPOPO_AUTO_RESTART = "pelix.ipopo.auto_restart"
 If True, the component will be re-instantiated after its bundle has been updated
 """
 
+IPOPO_ASYNC_CALLBACKS = "pelix.ipopo.async_callbacks"
+"""
+If True, the validation and invalidation callbacks of the component are called
+by the iPOPO thread pool, without holding the lock of the component.
+Can also be set as a framework property, to apply to all components.
+"""
+
+IPOPO_LAZY = "pelix.ipopo.lazy"
+"""
+If True, the services of the component are registered through a service factory
+and the component is instantiated the first time one of them is used
+"""
+
+# Framework properties
+IPOPO_DEFERRED_REGISTRATION = "pelix.ipopo.deferred_registration"
+"""
+If True, the services provided by components validated during a validation
+cascade are registered breadth-first, in batches, instead of recursively
+"""
+
+IPOPO_CALLBACKS_THREADS = "pelix.ipopo.callbacks_threads"
+"""
+Size of the thread pool calling the asynchronous callbacks of components
+(see IPOPO_ASYNC_CALLBACKS). Default: 4
+"""
+
+IPOPO_VALIDATION_TIMEOUT = "pelix.ipopo.validation_timeout"
+"""
+Maximum time (in seconds) to wait for the future returned by the validation
+callback of a component, before considering it as erroneous.
+Can also be set as a framework property, to apply to all components.
+Default: no timeout
+"""
+
 # ------------------------------------------------------------------------------
 
 def get_ipopo_svc_ref(bundle_context):
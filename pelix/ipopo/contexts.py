@@ -48,6 +48,7 @@ import pelix.ipopo.constants as constants
 
 # Standard library
 import copy
+import weakref
 
 # ------------------------------------------------------------------------------
 
@@ -58,6 +59,11 @@ class Requirement(object):
     # The dictionary form fields (filter is a special case)
     __stored_fields__ = ('specification', 'aggregate', 'optional')
 
+    # Requirements are shared by the instances of a factory
+    __slots__ = ('specification', 'aggregate', 'optional', 'filter',
+                 '__original_filter', '__full_filter', '__filtered',
+                 '__weakref__')
+
     def __init__(self, specification, aggregate=False, optional=False,
                  spec_filter=None):
         """
@@ -88,6 +94,9 @@ class Requirement(object):
         # Full filter (with the specification test)
         self.__full_filter = None
 
+        # Cache of the filtered copies still in use: filter string -> Requirement
+        self.__filtered = None
+
         # Set up the requirement filter (after setting up self.specification)
         self.filter = None
         self.set_filter(spec_filter)
@@ -144,6 +153,32 @@ class Requirement(object):
                            self.__original_filter)
 
 
+    def filtered_copy(self, props_filter):
+        """
+        Returns a copy of this requirement, with the given filter.
+        The copies are cached while they are used: the components using the
+        same filter share the same Requirement object, which must not be
+        modified.
+
+        :param props_filter: The new requirement filter on service properties
+        :return: A Requirement object
+        :raise TypeError: Unknown filter type
+        :raise ValueError: Invalid filter
+        """
+        key = None if props_filter is None else str(props_filter)
+        if self.__filtered is None:
+            # Weak values: the copies are forgotten with their last instance
+            self.__filtered = weakref.WeakValueDictionary()
+
+        requirement = self.__filtered.get(key)
+        if requirement is None:
+            requirement = self.copy()
+            requirement.set_filter(props_filter)
+            self.__filtered[key] = requirement
+
+        return requirement
+
+
     def matches(self, properties):
         """
         Tests if the given _StoredInstance matches this requirement
@@ -239,6 +274,12 @@ class FactoryContext(object):
         # The factory manipulation has been completed
         self.completed = False
 
+        # The callbacks tables have been computed (on first registration)
+        self.callbacks_ready = False
+
+        # Maximum number of killed instances kept for reuse (0: no pool)
+        self.pool_size = 0
+
         # Handler ID -> configuration
         self.__handlers = {}
 
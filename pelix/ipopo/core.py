@@ -37,9 +37,11 @@ __docformat__ = "restructuredtext en"
 
 # Pelix
 from pelix.internals.events import BundleEvent, ServiceEvent
+from pelix.internals.locks import create_lock
 from pelix.framework import BundleContext, Bundle
 from pelix.utilities import add_listener, remove_listener, is_string
 import pelix.framework as pelix
+import pelix.threadpool as threadpool
 
 # iPOPO constants
 import pelix.ipopo.constants as constants
@@ -47,11 +49,13 @@ import pelix.ipopo.handlers.constants as handlers_const
 
 # iPOPO beans
 from pelix.ipopo.contexts import FactoryContext, ComponentContext
+from pelix.ipopo.decorators import setup_factory_callbacks
 from pelix.ipopo.instance import StoredInstance
 
 # Standard library
 import copy
 import inspect
+import itertools
 import logging
 import threading
 
@@ -65,8 +69,57 @@ BUILTIN_HANDLERS = ('pelix.ipopo.handlers.properties',
                     'pelix.ipopo.handlers.provides',
                     'pelix.ipopo.handlers.requires')
 
+# Maximum time (in seconds) to wait for the asynchronous validation of a lazy
+# component, when no validation timeout is configured
+_LAZY_VALIDATION_TIMEOUT = 60
+
 # ------------------------------------------------------------------------------
 
+def _is_flag_set(value):
+    """
+    Converts the value of a boolean property
+
+    :param value: The value of the property
+    :return: True if the property is set to a "true" value
+    """
+    if is_string(value):
+        # String value (from the environment, ...)
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+    return bool(value)
+
+
+def _get_flag_property(bundle_context, name):
+    """
+    Retrieves the value of a boolean framework property
+
+    :param bundle_context: A bundle context
+    :param name: Name of the framework property
+    :return: True if the property is set to a "true" value
+    """
+    return _is_flag_set(bundle_context.get_property(name))
+
+
+def _get_timeout(value):
+    """
+    Converts the value of a timeout property
+
+    :param value: The value of the property (in seconds)
+    :return: The timeout as a float, or None for no timeout
+    """
+    try:
+        timeout = float(value)
+
+    except (TypeError, ValueError):
+        # No (valid) timeout
+        return None
+
+    if timeout > 0:
+        return timeout
+
+    return None
+
+
 def _set_factory_context(factory_class, bundle_context):
     """
     Transforms the context data dictionary into its FactoryContext object form.
@@ -126,6 +179,67 @@ def _load_bundle_factories(bundle):
 
 # ------------------------------------------------------------------------------
 
+class _LazyComponent(object):
+    """
+    Service factory standing for a component instantiated the first time one
+    of its services is used (see IPOPO_LAZY)
+    """
+    __slots__ = ('_ipopo', 'factory_name', 'name', 'context', 'registrations',
+                 'instance', '_lock')
+
+    def __init__(self, ipopo, factory_name, context):
+        """
+        Sets up the lazy component
+
+        :param ipopo: The iPOPO service
+        :param factory_name: Name of the component factory
+        :param context: The ComponentContext of the future component
+        """
+        self._ipopo = ipopo
+        self.factory_name = factory_name
+        self.name = context.name
+        self.context = context
+
+        # The registrations of the services provided by the component
+        self.registrations = []
+
+        # The component instance, once created
+        self.instance = None
+
+        # Serializes the instantiation, requested by any bundle
+        self._lock = threading.RLock()
+
+
+    def get_service(self, bundle, registration):
+        """
+        Instantiates the component the first time one of its services is used.
+        The other bundles asking for a service meanwhile wait for the
+        instantiation to end.
+
+        :param bundle: The bundle requiring the service
+        :param registration: The registration of the service
+        :return: The component instance
+        """
+        if self.instance is None:
+            with self._lock:
+                if self.instance is None:
+                    self.instance = self._ipopo._instantiate_lazy(self)
+
+        return self.instance
+
+
+    def unget_service(self, bundle, registration, service):
+        """
+        A bundle released the service: the component stays alive
+
+        :param bundle: The bundle releasing the service
+        :param registration: The registration of the service
+        :param service: The component instance
+        """
+        pass
+
+# ------------------------------------------------------------------------------
+
 class _IPopoService(object):
     """
     The iPOPO registry and service
@@ -146,6 +260,16 @@ class _IPopoService(object):
         # Instances registry : name -> StoredInstance object
         self.__instances = {}
 
+        # Lazy instances, not yet instantiated : name -> _LazyComponent
+        self.__lazy_instances = {}
+
+        # Pools of poolable factories:
+        # factory name -> [(component, handlers, requires filters)]
+        self.__pools = {}
+
+        # Pools statistics: factory name -> [hits, misses]
+        self.__pools_stats = {}
+
         # Event listeners
         self.__listeners = []
 
@@ -155,10 +279,44 @@ class _IPopoService(object):
         # Service state
         self.running = False
 
+        # Deferred services registration (breadth-first validation cascades)
+        self.deferred_registration = _get_flag_property(bundle_context,
+                                        constants.IPOPO_DEFERRED_REGISTRATION)
+        self.__cascade = threading.local()
+
+        # Asynchronous component callbacks
+        self.async_callbacks = _get_flag_property(bundle_context,
+                                        constants.IPOPO_ASYNC_CALLBACKS)
+        try:
+            self.__callbacks_threads = int(bundle_context.get_property(
+                                        constants.IPOPO_CALLBACKS_THREADS))
+
+        except (TypeError, ValueError):
+            self.__callbacks_threads = 4
+
+        # Maximum duration of the validation of components (None: no limit)
+        self.validation_timeout = _get_timeout(bundle_context.get_property(
+                                        constants.IPOPO_VALIDATION_TIMEOUT))
+
+        # Locks profiler of the framework (None if not activated)
+        self.__lock_profiler = bundle_context.get_bundle(0) \
+                                             .get_lock_profiler()
+
+        # The thread pool calling the asynchronous callbacks (created on use)
+        self.__callbacks_pool = None
+        self.__callbacks_lock = create_lock(self.__lock_profiler,
+                                            "_IPopoService.__callbacks_lock")
+
         # Registries locks
-        self.__factories_lock = threading.RLock()
-        self.__instances_lock = threading.RLock()
-        self.__listeners_lock = threading.RLock()
+        self.__factories_lock = create_lock(self.__lock_profiler,
+                                            "_IPopoService.__factories_lock",
+                                            True)
+        self.__instances_lock = create_lock(self.__lock_profiler,
+                                            "_IPopoService.__instances_lock",
+                                            True)
+        self.__listeners_lock = create_lock(self.__lock_profiler,
+                                            "_IPopoService.__listeners_lock",
+                                            True)
 
         # Handlers factories
         self._handlers_refs = set()
@@ -222,6 +380,10 @@ class _IPopoService(object):
             # We weren't using this handler
             pass
 
+        else:
+            # Pooled handlers may come from this factory
+            self.__pools.clear()
+
 
     def __get_stored_instances_by_factory(self, factory_name):
         """
@@ -233,7 +395,9 @@ class _IPopoService(object):
         """
         with self.__instances_lock:
             return [stored_instance \
-                    for stored_instance in self.__instances.values() \
+                    for stored_instance in itertools.chain(
+                                            self.__instances.values(),
+                                            self.__lazy_instances.values()) \
                     if stored_instance.factory_name == factory_name]
 
 
@@ -247,7 +411,9 @@ class _IPopoService(object):
             # Prepare the list of components
             store = self.__auto_restart.setdefault(bundle, [])
 
-            for stored_instance in self.__instances.values():
+            for stored_instance in itertools.chain(
+                                            self.__instances.values(),
+                                            self.__lazy_instances.values()):
                 # Get the factory name
                 factory = stored_instance.factory_name
 
@@ -300,6 +466,123 @@ class _IPopoService(object):
                 del self.__auto_restart[bundle]
 
 
+    def _defer_registration(self, handler):
+        """
+        Registers the service described by the given handler, when the current
+        validation cascade reaches it.
+
+        The first call in a thread starts a cascade: the registrations queued
+        while the events of a step are propagated (i.e. the services provided
+        by the components they validated) are done in a single batch, in the
+        next step, instead of recursively.
+
+        :param handler: A handler with the get_registration_request() and
+                        set_registration() methods
+        """
+        pending = getattr(self.__cascade, 'pending', None)
+        if pending is not None:
+            # A cascade is running in this thread: queue the registration
+            pending.append(handler)
+            return
+
+        # Start a new cascade
+        pending = self.__cascade.pending = [handler]
+        try:
+            while pending:
+                # Next step of the cascade
+                step = pending[:]
+                del pending[:]
+                self.__register_services(step)
+
+        finally:
+            self.__cascade.pending = None
+
+
+    def __register_services(self, handlers):
+        """
+        Registers the services described by the given handlers in a single
+        batch, then calls the service listeners
+
+        :param handlers: Handlers waiting for their service to be registered
+        """
+        to_register = []
+        requests = []
+        for handler in handlers:
+            if handler in to_register:
+                # Queued twice
+                continue
+
+            # The handler state might have changed since it has been queued
+            request = handler.get_registration_request()
+            if request is not None:
+                bundle_context, specifications, service, properties = request
+                to_register.append(handler)
+                requests.append((bundle_context.get_bundle(), specifications,
+                                 service, properties))
+
+        if not requests:
+            # Nothing to do
+            return
+
+        framework = self.__context.get_bundle(0)
+        try:
+            registrations = framework.register_services(requests, False)
+
+        except pelix.BundleException as ex:
+            # Nothing has been registered: register the services one by one,
+            # to isolate the invalid ones
+            _logger.warning("Error registering the services of a validation "
+                            "cascade, registering them separately: %s", ex)
+            registered = []
+            registrations = []
+            for handler, request in zip(to_register, requests):
+                try:
+                    registrations.extend(
+                                framework.register_services([request], False))
+
+                except pelix.BundleException as ex:
+                    # Same behavior as a direct registration by the handler
+                    _logger.error("Error registering a service providing "
+                                  "%s: %s", request[1], ex)
+
+                else:
+                    registered.append(handler)
+
+            to_register = registered
+
+        # Associate handlers and registrations before sending the events
+        for handler, registration in zip(to_register, registrations):
+            handler.set_registration(registration)
+
+        # Propagate the events: components might be validated and queue
+        # their own services
+        framework.fire_registered_events(registrations)
+
+
+    def _enqueue_callback(self, method, *args):
+        """
+        Calls the given component life-cycle method in the callbacks thread
+        pool. The method is called immediately if iPOPO is stopping.
+
+        :param method: The method to call
+        :param args: The method arguments
+        """
+        with self.__callbacks_lock:
+            if self.running:
+                if self.__callbacks_pool is None:
+                    # First asynchronous call
+                    self.__callbacks_pool = threadpool.ThreadPool(
+                                                self.__callbacks_threads,
+                                                logname="ipopo-callbacks")
+                    self.__callbacks_pool.start()
+
+                self.__callbacks_pool.enqueue(method, *args)
+                return
+
+        # Stopping: no more thread pool
+        method(*args)
+
+
     def _fire_ipopo_event(self, kind, factory_name, component_name=None):
         """
         Triggers an iPOPO event
@@ -389,6 +672,10 @@ class _IPopoService(object):
             raise TypeError("Invalid factory class '{0}'".format(
                                                         type(factory).__name__))
 
+        # Find the callbacks of the factory (done only once per class)
+        setup_factory_callbacks(factory,
+                                getattr(factory, constants.IPOPO_FACTORY_CONTEXT))
+
         with self.__factories_lock:
             if factory_name in self.__factories:
                 if override:
@@ -461,6 +748,17 @@ class _IPopoService(object):
             self._handlers.clear()
             self._handlers_refs.clear()
 
+            # Release the pooled components
+            self.__pools.clear()
+
+        # Stop the callbacks thread pool, outside the lock: its tasks may
+        # enqueue new callbacks (called directly, as we're not running)
+        with self.__callbacks_lock:
+            pool, self.__callbacks_pool = self.__callbacks_pool, None
+
+        if pool is not None:
+            pool.stop()
+
 
     def framework_stopping(self):
         """
@@ -525,60 +823,63 @@ class _IPopoService(object):
                 self.__remove_handler_factory(svc_ref)
 
 
-    def instantiate(self, factory_name, name, properties=None):
+    def __get_factory(self, factory_name, name):
         """
-        Instantiates a component from the given factory, with the given name
+        Retrieves the elements required to instantiate a component from the
+        given factory. The instances lock must be held by the caller.
 
         :param factory_name: Name of the component factory
-        :param name: Name of the instance to be started
-        :return: The component instance
-        :raise TypeError: The given factory is unknown
-        :raise ValueError: The given name or factory name is invalid, or an
-                           instance with the given name already exists
-        :raise Exception: Something wrong occurred in the factory
+        :param name: Name of the component instance
+        :return: A (factory class, factory context, handler factories) tuple
+        :raise TypeError: Unknown factory or missing handler
         """
-        # Test parameters
-        if not factory_name or not is_string(factory_name):
-            raise ValueError("Invalid factory name")
+        with self.__factories_lock:
+            # Can raise a ValueError exception
+            factory = self.__factories.get(factory_name, None)
+            if factory is None:
+                raise TypeError("Unknown factory '{0}'" \
+                                .format(factory_name))
+
+            # Get the factory context
+            factory_context = getattr(factory, \
+                                      constants.IPOPO_FACTORY_CONTEXT, None)
+            if factory_context is None:
+                raise TypeError("Factory context missing in '{0}'" \
+                                .format(factory_name))
 
-        if not name or not is_string(name):
-            raise ValueError("Invalid component name")
+        try:
+            # Look for the required handlers
+            handler_factories = set()
+            for handler_id in factory_context.get_handlers_ids():
+                # Not a 'set-comprehension': handler_id must be visible
+                handler_factories.add(self._handlers[handler_id])
 
-        if not self.running:
-            # Stop working if the framework is stopping
-            raise ValueError("Framework is stopping")
+        except KeyError:
+            raise TypeError("Missing handler '{0}' for factory '{1}', "
+                            "component '{2}'" \
+                            .format(handler_id, factory_name, name))
 
-        with self.__instances_lock:
-            if name in self.__instances:
-                raise ValueError("'{0}' is an already running instance name" \
-                                 .format(name))
+        return factory, factory_context, handler_factories
 
-            with self.__factories_lock:
-                # Can raise a ValueError exception
-                factory = self.__factories.get(factory_name, None)
-                if factory is None:
-                    raise TypeError("Unknown factory '{0}'" \
-                                    .format(factory_name))
 
-                # Get the factory context
-                factory_context = getattr(factory, \
-                                          constants.IPOPO_FACTORY_CONTEXT, None)
-                if factory_context is None:
-                    raise TypeError("Factory context missing in '{0}'" \
-                                    .format(factory_name))
+    def __create_instance(self, factory, handler_factories, component_context):
+        """
+        Creates a component instance and its handlers, and stores it.
+        The instances lock must be held by the caller.
 
-            try:
-                # Look for the required handlers
-                handler_factories = set()
-                for handler_id in factory_context.get_handlers_ids():
-                    # Not a 'set-comprehension': handler_id must be visible
-                    handler_factories.add(self._handlers[handler_id])
+        :param factory: The factory class
+        :param handler_factories: The handler factories used by the factory
+        :param component_context: The ComponentContext of the instance
+        :return: The StoredInstance object
+        :raise TypeError: Error creating the instance
+        """
+        factory_name = component_context.get_factory_name()
+        name = component_context.name
 
-            except KeyError:
-                raise TypeError("Missing handler '{0}' for factory '{1}', "
-                                "component '{2}'" \
-                                .format(handler_id, factory_name, name))
+        # Reuse a pooled instance, if possible
+        instance, all_handlers = self.__take_pooled(component_context)
 
+        if instance is None:
             # Create component instance
             try:
                 instance = factory()
@@ -590,14 +891,7 @@ class _IPopoService(object):
                 raise TypeError("Factory '{0}' failed to create '{1}'" \
                                 .format(factory_name, name))
 
-            # Normalize the given properties
-            properties = self._prepare_instance_properties(properties,
-                                                   factory_context.properties)
-
-            # Set up the component instance context
-            component_context = ComponentContext(factory_context, name, \
-                                                 properties)
-
+        if all_handlers is None:
             # Instantiate the handlers
             all_handlers = set()
             for handler_factory in handler_factories:
@@ -606,29 +900,301 @@ class _IPopoService(object):
                 if handlers:
                     all_handlers.update(handlers)
 
-            # Prepare the stored instance
-            stored_instance = StoredInstance(self, component_context, instance,
-                                             all_handlers)
+        # Prepare the stored instance
+        async_callbacks = self.async_callbacks or _is_flag_set(
+                component_context.properties.get(
+                                        constants.IPOPO_ASYNC_CALLBACKS))
+        validation_timeout = _get_timeout(component_context.properties.get(
+                                        constants.IPOPO_VALIDATION_TIMEOUT)) \
+                             or self.validation_timeout
+        stored_instance = StoredInstance(self, component_context, instance,
+                                         all_handlers, async_callbacks,
+                                         validation_timeout,
+                                         self.__lock_profiler)
+
+        # Manipulate the properties
+        for handler in all_handlers:
+            handler.manipulate(stored_instance, instance)
+
+        # Store the instance
+        self.__instances[name] = stored_instance
+        return stored_instance
+
+
+    def __take_pooled(self, component_context):
+        """
+        Retrieves a component instance and its handlers from the pool of its
+        factory. The instances lock must be held by the caller.
+
+        :param component_context: The ComponentContext of the new instance
+        :return: A (component instance, handlers) tuple. Both values are None
+                 if the pool is empty, and the handlers are None if they
+                 can't be reused.
+        """
+        if not component_context.factory_context.pool_size:
+            # Not a poolable factory
+            return None, None
+
+        factory_name = component_context.get_factory_name()
+        stats = self.__pools_stats.setdefault(factory_name, [0, 0])
+        pool = self.__pools.get(factory_name)
+        if not pool:
+            # Miss
+            stats[1] += 1
+            return None, None
+
+        # Hit
+        stats[0] += 1
+        instance, handlers, requires_filters = pool.pop()
+        if requires_filters != component_context.properties.get(
+                                            constants.IPOPO_REQUIRES_FILTERS):
+            # The requirements of the handlers don't match anymore
+            for handler in handlers:
+                handler.clear()
+
+            handlers = None
+
+        return instance, handlers
+
+
+    def __kill_instance(self, stored_instance):
+        """
+        Kills the given stored instance and keeps its component instance and
+        handlers in the pool of its factory, if possible. The instances lock
+        must be held by the caller.
+
+        :param stored_instance: The StoredInstance to kill
+        """
+        context = stored_instance.context
+        pool_size = context.factory_context.pool_size if context else 0
+        if not pool_size or not self.running:
+            # Not a poolable factory
+            stored_instance.kill()
+            return
+
+        pool = self.__pools.setdefault(stored_instance.factory_name, [])
+        if len(pool) >= pool_size:
+            # Pool full
+            stored_instance.kill()
+            return
+
+        # Keep the members before they are cleared
+        instance = stored_instance.instance
+        handlers = stored_instance.get_handlers()
+        requires_filters = context.properties.get(
+                                            constants.IPOPO_REQUIRES_FILTERS)
+        if stored_instance.kill(True):
+            pool.append((instance, handlers, requires_filters))
+
+
+    def get_pool_stats(self):
+        """
+        Retrieves the statistics of the pools of poolable factories (see
+        @Poolable)
+
+        :return: A dictionary: factory name -> {"hits": reused instances,
+                 "misses": created instances, "hit_rate": ratio of reused
+                 instances, "pooled": number of instances in the pool}
+        """
+        with self.__instances_lock:
+            result = {}
+            for factory_name, (hits, misses) in self.__pools_stats.items():
+                total = hits + misses
+                result[factory_name] = {
+                        "hits": hits,
+                        "misses": misses,
+                        "hit_rate": float(hits) / total if total else 0.,
+                        "pooled": len(self.__pools.get(factory_name, ()))}
+
+            return result
 
-            # Manipulate the properties
-            for handler in all_handlers:
-                handler.manipulate(stored_instance, instance)
 
-            # Store the instance
-            self.__instances[name] = stored_instance
+    def __start_instance(self, stored_instance):
+        """
+        Starts the manager of the given component and tries to validate it
 
+        :param stored_instance: The StoredInstance of the component
+        """
         # Start the manager
         stored_instance.start()
 
         # Notify listeners now that every thing is ready to run
         self._fire_ipopo_event(constants.IPopoEvent.INSTANTIATED,
-                               factory_name, name)
+                               stored_instance.factory_name,
+                               stored_instance.name)
 
         # Try to validate it
         stored_instance.update_bindings()
         stored_instance.check_lifecycle()
 
-        return instance
+
+    def instantiate(self, factory_name, name, properties=None):
+        """
+        Instantiates a component from the given factory, with the given name.
+
+        If the IPOPO_LAZY property of the component is set and the component
+        provides services, those services are registered through a service
+        factory and the component is only instantiated the first time one of
+        them is used. In that case, this method returns None.
+
+        :param factory_name: Name of the component factory
+        :param name: Name of the instance to be started
+        :return: The component instance (None for a lazy component)
+        :raise TypeError: The given factory is unknown
+        :raise ValueError: The given name or factory name is invalid, or an
+                           instance with the given name already exists
+        :raise Exception: Something wrong occurred in the factory
+        """
+        # Test parameters
+        if not factory_name or not is_string(factory_name):
+            raise ValueError("Invalid factory name")
+
+        if not name or not is_string(name):
+            raise ValueError("Invalid component name")
+
+        if not self.running:
+            # Stop working if the framework is stopping
+            raise ValueError("Framework is stopping")
+
+        with self.__instances_lock:
+            if name in self.__instances or name in self.__lazy_instances:
+                raise ValueError("'{0}' is an already running instance name" \
+                                 .format(name))
+
+            factory, factory_context, handler_factories = \
+                                    self.__get_factory(factory_name, name)
+
+            # Normalize the given properties
+            properties = self._prepare_instance_properties(properties,
+                                                   factory_context.properties)
+
+            # Set up the component instance context
+            component_context = ComponentContext(factory_context, name, \
+                                                 properties)
+
+            provides = component_context.get_handler(
+                                                constants.HANDLER_PROVIDES)
+            if component_context.properties.get(constants.IPOPO_LAZY) \
+            and provides and not any(config[2] for config in provides):
+                # (a service factory component can't be lazy: the factory
+                # itself must be instantiated to give the service objects)
+                # Only register the provided services
+                lazy = _LazyComponent(self, factory_name, component_context)
+                self.__register_lazy(lazy)
+                self.__lazy_instances[name] = lazy
+
+            else:
+                lazy = None
+                stored_instance = self.__create_instance(factory,
+                                                         handler_factories,
+                                                         component_context)
+
+        if lazy is not None:
+            # Notify the service listeners, once the component is stored
+            self.__context.get_bundle(0).fire_registered_events(
+                                                            lazy.registrations)
+            return None
+
+        self.__start_instance(stored_instance)
+        return stored_instance.instance
+
+
+    def __register_lazy(self, lazy):
+        """
+        Registers the services provided by the given lazy component, without
+        sending the service events
+
+        :param lazy: A _LazyComponent object
+        """
+        context = lazy.context
+        bundle_context = context.get_bundle_context()
+        try:
+            for config in context.get_handler(constants.HANDLER_PROVIDES):
+                lazy.registrations.append(bundle_context.register_service(
+                                            config[0], lazy,
+                                            context.properties.copy(),
+                                            send_event=False, factory=True))
+
+        except:
+            # Clean up the services registered so far
+            self.__unregister_lazy(lazy)
+            raise
+
+
+    def __unregister_lazy(self, lazy):
+        """
+        Unregisters the services provided by the given lazy component
+
+        :param lazy: A _LazyComponent object
+        """
+        registrations = lazy.registrations[:]
+        del lazy.registrations[:]
+
+        for registration in registrations:
+            try:
+                registration.unregister()
+
+            except pelix.BundleException as ex:
+                # Only log the error at this level
+                _logger.error("Error unregistering a service of '%s': %s",
+                              lazy.name, ex)
+
+
+    def _instantiate_lazy(self, lazy):
+        """
+        Instantiates the given lazy component. Its service providers take over
+        the registrations of the service factory.
+
+        :param lazy: A _LazyComponent object
+        :return: The component instance
+        :raise BundleException: The component has been killed or can't be
+                                validated
+        """
+        with self.__instances_lock:
+            if self.__lazy_instances.get(lazy.name) is not lazy:
+                raise pelix.BundleException("Component '{0}' has been killed"
+                                            .format(lazy.name))
+
+            factory, _, handler_factories = self.__get_factory(
+                                                lazy.factory_name, lazy.name)
+            del self.__lazy_instances[lazy.name]
+            stored_instance = self.__create_instance(factory,
+                                                     handler_factories,
+                                                     lazy.context)
+
+            # Give the registrations to the service providers
+            providers = list(stored_instance.get_handlers(
+                                        handlers_const.KIND_SERVICE_PROVIDER))
+            adopters = []
+            for registration in lazy.registrations:
+                specifications = registration.get_reference() \
+                                            .get_property(pelix.OBJECTCLASS)
+                for handler in providers:
+                    if getattr(handler, 'specifications', None) \
+                            == specifications:
+                        handler.set_registration(registration)
+                        providers.remove(handler)
+                        adopters.append(handler)
+                        break
+
+        self.__start_instance(stored_instance)
+
+        # Wait for an asynchronous validation
+        if not stored_instance.wait_validation(self.validation_timeout
+                                               or _LAZY_VALIDATION_TIMEOUT):
+            raise pelix.BundleException("Component '{0}' not validated in "
+                                        "time".format(lazy.name))
+
+        if stored_instance.state != StoredInstance.VALID:
+            # The services will be registered again once the component is
+            # validated
+            for handler in adopters:
+                handler.pre_invalidate()
+
+            raise pelix.BundleException("Component '{0}' can't be validated"
+                                        .format(lazy.name))
+
+        return stored_instance.instance
 
 
     def invalidate(self, name):
@@ -666,7 +1232,27 @@ class _IPopoService(object):
         :param name: A component name to be tested
         """
         with self.__instances_lock:
-            return name in self.__instances
+            return name in self.__instances or name in self.__lazy_instances
+
+
+    def retry_erroneous(self, name):
+        """
+        Tries to validate again a component in the ERRONEOUS state, i.e. whose
+        validation failed or timed out
+
+        :param name: Name of the component to retry
+        :return: The new state of the component
+        :raise ValueError: Invalid component name
+        """
+        with self.__instances_lock:
+            try:
+                stored_instance = self.__instances[name]
+
+            except KeyError:
+                raise ValueError("Unknown component instance '{0}'" \
+                                 .format(name))
+
+        return stored_instance.retry_erroneous()
 
 
     def kill(self, name):
@@ -680,6 +1266,11 @@ class _IPopoService(object):
             raise ValueError("Name can't be None or empty")
 
         with self.__instances_lock:
+            if name in self.__lazy_instances:
+                # Never used: only unregister its services
+                self.__unregister_lazy(self.__lazy_instances.pop(name))
+                return
+
             if name not in self.__instances:
                 raise ValueError("Unknown component instance '{0}'" \
                                  .format(name))
@@ -687,7 +1278,7 @@ class _IPopoService(object):
             stored_instance = self.__instances.pop(name)
 
             # Kill it
-            stored_instance.kill()
+            self.__kill_instance(stored_instance)
 
 
     def register_factory(self, bundle_context, factory):
@@ -751,6 +1342,10 @@ class _IPopoService(object):
                         # => ignore
                         pass
 
+                # Release the pooled components and their statistics
+                self.__pools.pop(factory_name, None)
+                self.__pools_stats.pop(factory_name, None)
+
             # Remove the factory from the registry
             del self.__factories[factory_name]
 
@@ -801,6 +1396,9 @@ class _IPopoService(object):
                 result.append((name, stored_instance.factory_name,
                                stored_instance.state))
 
+            for name, lazy in self.__lazy_instances.items():
+                result.append((name, lazy.factory_name, StoredInstance.LAZY))
+
             result.sort()
             return result
 
@@ -839,6 +1437,10 @@ class _IPopoService(object):
             raise ValueError("Component name must be a string")
 
         with self.__instances_lock:
+            if name in self.__lazy_instances:
+                # Not yet instantiated
+                return self.__get_lazy_details(self.__lazy_instances[name])
+
             if name not in self.__instances:
                 raise ValueError("Unknown component: {0}".format(name))
 
@@ -896,6 +1498,158 @@ class _IPopoService(object):
                 return result
 
 
+    def __get_lazy_details(self, lazy):
+        """
+        Retrieves a snapshot of the given lazy component, in the format of
+        get_instance_details(). It has no dependencies yet.
+
+        :param lazy: A _LazyComponent object
+        :return: A dictionary of details
+        """
+        services = {}
+        for registration in lazy.registrations:
+            svc_ref = registration.get_reference()
+            services[svc_ref.get_property(pelix.SERVICE_ID)] = svc_ref
+
+        properties = lazy.context.properties.items()
+        return {"name": lazy.name,
+                "factory": lazy.factory_name,
+                "bundle_id": lazy.context.get_bundle_context().get_bundle() \
+                                                            .get_bundle_id(),
+                "state": StoredInstance.LAZY,
+                "services": services,
+                "dependencies": {},
+                "properties": dict((str(key), str(value))
+                                   for key, value in properties)}
+
+
+    def get_dependency_graph(self):
+        """
+        Retrieves a snapshot of the graph of the component instances, their
+        requirements and the services they are bound to. The result dictionary
+        can be converted to JSON and has the following keys:
+
+        * instances: A list of dictionaries, one per component instance:
+
+          * name: The component name
+          * factory: The name of the component factory
+          * state: The current component state
+          * validations: The number of validations of the component
+          * validation_time: The duration of the last validation, in seconds.
+            It includes the validations triggered by the registration of the
+            services provided by the component.
+          * total_validation_time: The total duration of the validations
+          * services: The IDs of the services provided by the component
+          * requirements: A list of dictionaries, one per requirement:
+
+            * field: The injected field
+            * specification: The required specification
+            * filter: The requirement LDAP filter (can be None)
+            * optional: The requirement optional flag
+            * aggregate: The requirement aggregate flag
+            * bindings: A list of {service, provider, count} dictionaries, with
+              the ID of the bound service, the name of the component providing
+              it (or None) and the number of times it has been bound
+            * candidates: A list of {service, provider} dictionaries, with the
+              services matching the requirement
+
+        * services: A list of {id, specifications, bundle_id, provider}
+          dictionaries, describing the services bound to or matching a
+          requirement of a component
+
+        :return: A dictionary describing the graph
+        """
+        with self.__instances_lock:
+            stored_instances = sorted(self.__instances.values(),
+                                      key=lambda stored: stored.name)
+
+            # Service ID -> name of the providing component
+            providers = {}
+            for stored_instance in stored_instances:
+                for handler in stored_instance.get_handlers(
+                                        handlers_const.KIND_SERVICE_PROVIDER):
+                    svc_ref = handler.get_service_reference()
+                    if svc_ref is not None:
+                        svc_id = svc_ref.get_property(pelix.SERVICE_ID)
+                        providers[svc_id] = stored_instance.name
+
+            # Service ID -> description
+            services = {}
+
+            def describe(svc_ref):
+                """
+                Stores the description of the given service
+
+                :param svc_ref: A ServiceReference object
+                :return: The ID of the service and its provider
+                """
+                svc_id = svc_ref.get_property(pelix.SERVICE_ID)
+                provider = providers.get(svc_id)
+                if svc_id not in services:
+                    services[svc_id] = {
+                        "id": svc_id,
+                        "specifications":
+                                list(svc_ref.get_property(pelix.OBJECTCLASS)),
+                        "bundle_id": svc_ref.get_bundle().get_bundle_id(),
+                        "provider": provider}
+
+                return svc_id, provider
+
+            instances = []
+            for stored_instance in stored_instances:
+                with stored_instance._lock:
+                    node = {"name": stored_instance.name,
+                            "factory": stored_instance.factory_name,
+                            "state": stored_instance.state,
+                            "validations": stored_instance.validation_count,
+                            "validation_time": stored_instance.validation_time,
+                            "total_validation_time":
+                                        stored_instance.total_validation_time,
+                            "services": sorted(
+                                    svc_id
+                                    for svc_id, provider in providers.items()
+                                    if provider == stored_instance.name),
+                            "requirements": []}
+
+                    for dependency in stored_instance.get_handlers(
+                                                handlers_const.KIND_DEPENDENCY):
+                        req = dependency.requirement
+                        field = dependency.get_field()
+                        info = {"field": field,
+                                "specification": req.specification,
+                                "filter": str(req.filter) if req.filter
+                                          else None,
+                                "optional": req.optional,
+                                "aggregate": req.aggregate,
+                                "bindings": [],
+                                "candidates": []}
+
+                        # Current bindings
+                        for svc_ref in dependency.get_bindings():
+                            svc_id, provider = describe(svc_ref)
+                            count = stored_instance.bind_counts.get(
+                                                        (field, svc_id), 0)
+                            info["bindings"].append({"service": svc_id,
+                                                     "provider": provider,
+                                                     "count": count})
+
+                        # Matching services
+                        svc_refs = self.__context.get_all_service_references(
+                                                req.specification, req.filter)
+                        for svc_ref in svc_refs or []:
+                            svc_id, provider = describe(svc_ref)
+                            info["candidates"].append({"service": svc_id,
+                                                       "provider": provider})
+
+                        node["requirements"].append(info)
+
+                instances.append(node)
+
+            return {"instances": instances,
+                    "services": [services[svc_id]
+                                 for svc_id in sorted(services)]}
+
+
     def get_factories(self):
         """
         Retrieves the names of the registered factories
@@ -41,6 +41,7 @@ from pelix.ipopo.contexts import FactoryContext, Requirement
 import pelix.ipopo.constants as constants
 
 # Standard library
+import copy
 import inspect
 import logging
 import threading
@@ -51,6 +52,9 @@ import types
 # Prepare the module logger
 _logger = logging.getLogger("ipopo.decorators")
 
+# Lock protecting the computation of the factories callbacks tables
+_callbacks_lock = threading.RLock()
+
 # ------------------------------------------------------------------------------
 
 def is_from_parent(cls, attribute_name, value=None):
@@ -172,6 +176,7 @@ def _get_factory_context(cls):
 
         # * Manipulation has not been applied yet
         context.completed = False
+        context.callbacks_ready = False
 
     else:
         # Nothing special to do
@@ -288,6 +293,44 @@ def _ipopo_setup_field_callback(cls, context):
     context.field_callbacks.clear()
     context.field_callbacks.update(callbacks)
 
+
+def setup_factory_callbacks(factory_class, context):
+    """
+    Computes the callbacks tables of a manipulated class, if it has not yet
+    been done. This is deferred until the first registration of the factory,
+    as it inspects all the members of the class.
+
+    The callbacks of the parent factories are computed first, as the child
+    inherits them.
+
+    :param factory_class: A manipulated class
+    :param context: The factory context of the class
+    """
+    if context.callbacks_ready:
+        # Already computed
+        return
+
+    with _callbacks_lock:
+        if context.callbacks_ready:
+            # Computed while waiting for the lock
+            return
+
+        # Look for the context the class context was copied from
+        for parent in inspect.getmro(factory_class)[1:]:
+            parent_context = vars(parent).get(constants.IPOPO_FACTORY_CONTEXT)
+            if parent_context is not None:
+                if parent_context.completed:
+                    setup_factory_callbacks(parent, parent_context)
+
+                context.callbacks = parent_context.callbacks.copy()
+                context.field_callbacks = copy.deepcopy(
+                                                parent_context.field_callbacks)
+                break
+
+        _ipopo_setup_callback(factory_class, context)
+        _ipopo_setup_field_callback(factory_class, context)
+        context.callbacks_ready = True
+
 # ------------------------------------------------------------------------------
 
 def _append_object_entry(obj, list_name, entry):
@@ -436,6 +479,53 @@ class Instantiate(object):
 
 # ------------------------------------------------------------------------------
 
+class Poolable(object):
+    """
+    @Poolable decorator
+
+    Marks a component factory as stateless: the killed instances of this
+    factory are kept in a pool, with their handlers, and are reused by the
+    next instantiations, instead of creating new objects.
+    The constructor of a reused object is not called again.
+    """
+    def __init__(self, max_size=10):
+        """
+        Sets up the decorator
+
+        :param max_size: Maximum number of instances kept in the pool
+        :raise ValueError: Invalid pool size
+        """
+        if type(max_size) is not int or max_size < 1:
+            raise ValueError("Invalid pool size: {0}".format(max_size))
+
+        self.__max_size = max_size
+
+
+    def __call__(self, clazz):
+        """
+        Stores the pool size in the factory context
+
+        :param clazz: The class to decorate
+        :return: The decorated class
+        :raise TypeError: If *clazz* is not a type
+        """
+        if not inspect.isclass(clazz):
+            raise TypeError("@Poolable can decorate only classes, not '{0}'" \
+                            .format(type(clazz).__name__))
+
+        # Get the factory context
+        context = _get_factory_context(clazz)
+        if context.completed:
+            # Do nothing if the class has already been manipulated
+            _logger.warning("@Poolable: Already manipulated class: %s",
+                            get_method_description(clazz))
+            return clazz
+
+        context.pool_size = self.__max_size
+        return clazz
+
+# ------------------------------------------------------------------------------
+
 class ComponentFactory(object):
     """
     Decorator that sets up a component factory class
@@ -481,9 +571,8 @@ class ComponentFactory(object):
             context.name = self.__factory_name
             context.completed = True
 
-            # Find callbacks
-            _ipopo_setup_callback(factory_class, context)
-            _ipopo_setup_field_callback(factory_class, context)
+            # Callbacks are looked for on the first registration of the
+            # factory (see setup_factory_callbacks())
 
             # Clean up inherited fields, to avoid weird behavior
             for field in ComponentFactory.NON_INHERITABLE_FIELDS:
@@ -500,6 +589,7 @@ class ComponentFactory(object):
                         + constants.IPOPO_GETTER_SUFFIX, None)
                 setattr(factory_class, constants.IPOPO_PROPERTY_PREFIX \
                         + constants.IPOPO_SETTER_SUFFIX, None)
+                setattr(factory_class, constants.IPOPO_BATCH_PROPERTIES, None)
 
         else:
             # Manipulation already applied: do nothing more
@@ -633,8 +723,16 @@ class Provides(object):
     @Provides decorator
 
     Defines an interface exported by a component.
+
+    If *factory* is True, the component is registered as a service factory:
+    it must implement the ``get_service(bundle, registration)`` and
+    ``unget_service(bundle, registration, service)`` methods, which give and
+    release the service object of each consumer bundle. If *prototype* is
+    True, the component is a prototype service factory, called for each
+    service object requested through ``BundleContext.get_service_objects()``.
     """
-    def __init__(self, specifications=None, controller=None):
+    def __init__(self, specifications=None, controller=None, factory=False,
+                 prototype=False):
         """
         Sets up a provided service.
         A service controller can be defined to enable or disable the service.
@@ -642,6 +740,9 @@ class Provides(object):
         :param specifications: A list of provided interface(s) name(s)
                                (can't be empty)
         :param controller: Name of the service controller class field (optional)
+        :param factory: If True, the component is a service factory
+        :param prototype: If True, the component is a prototype service factory
+                          (implies *factory*)
         :raise ValueError: If the specifications are invalid
         """
         if controller is not None:
@@ -659,6 +760,8 @@ class Provides(object):
 
         self.__specifications = _get_specifications(specifications)
         self.__controller = controller
+        self.__prototype = bool(prototype)
+        self.__factory = bool(factory) or self.__prototype
 
 
     def __call__(self, clazz):
@@ -675,6 +778,12 @@ class Provides(object):
             raise TypeError("@Provides can decorate only classes, not '{0}'" \
                             .format(type(clazz).__name__))
 
+        if self.__factory:
+            for method in ('get_service', 'unget_service'):
+                if not inspect.isroutine(getattr(clazz, method, None)):
+                    raise TypeError("@Provides: a service factory must "
+                                    "implement a '{0}' method".format(method))
+
         # Get the factory context
         context = _get_factory_context(clazz)
         if context.completed:
@@ -691,7 +800,8 @@ class Provides(object):
 
         # Store the service information
         config = context.get_handler(constants.HANDLER_PROVIDES, [])
-        config.append((filtered_specs, self.__controller))
+        config.append((filtered_specs, self.__controller, self.__factory,
+                       self.__prototype))
 
         if self.__controller:
             # Inject a property in the class. The property will call an instance
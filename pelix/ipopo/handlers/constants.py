@@ -76,6 +76,9 @@ It should also implement the following ones:
   False.
 * on_property_change(): Called when a component property has been modified.
   The provided service properties should be modified accordingly.
+* on_properties_change(): Called at the end of a properties batch, with all
+  the modified properties. The provided service properties should be modified
+  with a single update.
 """
 
 # ------------------------------------------------------------------------------
@@ -100,6 +103,10 @@ class Handler(object):
     """
     Basic handler abstract class
     """
+    # Handlers are created for each component: sub-classes should define
+    # __slots__ too
+    __slots__ = ()
+
     def get_kinds(self):
         """
         Returns the kinds of this handler
@@ -152,6 +159,16 @@ class Handler(object):
         """
         pass
 
+    def on_properties_change(self, changes):
+        """
+        Handles the properties changed during a batch. By default, calls
+        on_property_change() for each modified property.
+
+        :param changes: A dictionary: name -> (old value, new value)
+        """
+        for name, (old_value, new_value) in changes.items():
+            self.on_property_change(name, old_value, new_value)
+
     def start(self):
         """
         Starts the handler (listeners, ...). Called once, after the component
@@ -172,6 +189,18 @@ class Handler(object):
         """
         pass
 
+    def reset(self, component_instance):
+        """
+        Called instead of clear() when a killed component is kept in the pool
+        of its factory (see @Poolable). The handler should release the
+        resources associated to the killed instance and undo the manipulation
+        of the component, but keep its configuration.
+
+        :param component_instance: The component instance
+        :return: True if the handler can be reused by the next instance
+        """
+        return False
+
     def pre_validate(self):
         """
         Called just before a component is validated
@@ -202,6 +231,8 @@ class ServiceProviderHandler(Handler):
     """
     Service provider handler abstract class
     """
+    __slots__ = ()
+
     def get_service_reference(self):
         """
         Returns the reference to the service provided by this handler
@@ -214,6 +245,8 @@ class DependencyHandler(Handler):
     """
     Dependency handler abstract class
     """
+    __slots__ = ()
+
     def get_field(self):
         """
         Returns the name of the field where to inject the dependency
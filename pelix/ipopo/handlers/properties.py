@@ -100,11 +100,22 @@ class PropertiesHandler(constants.Handler):
     """
     Handles the properties
     """
+    __slots__ = ('_ipopo_instance',)
+
     def __init__(self):
         """
         Sets up the handler
         """
-        pass
+        self._ipopo_instance = None
+
+
+    def get_kinds(self):
+        """
+        Retrieves the kinds of this handler: 'properties'
+
+        :return: the kinds of this handler
+        """
+        return (constants.KIND_PROPERTIES,)
 
 
     def _field_property_generator(self):
@@ -170,3 +181,28 @@ class PropertiesHandler(constants.Handler):
         # Inject the getter and setter at the instance level
         setattr(component_instance, getter_name, getter)
         setattr(component_instance, setter_name, setter)
+
+        # Inject the batch context manager: with self._ipopo_batch(): ...
+        setattr(component_instance, ipopo_constants.IPOPO_BATCH_PROPERTIES,
+                stored_instance.batch_properties)
+
+
+    def reset(self, component_instance):
+        """
+        Prepares the handler to be reused by a pooled component
+
+        :param component_instance: The component instance
+        :return: True (the handler can be reused)
+        """
+        self._ipopo_instance = None
+
+        # Remove the injected methods: the class defaults are used again
+        injected = vars(component_instance)
+        for name in (ipopo_constants.IPOPO_PROPERTY_PREFIX
+                     + ipopo_constants.IPOPO_GETTER_SUFFIX,
+                     ipopo_constants.IPOPO_PROPERTY_PREFIX
+                     + ipopo_constants.IPOPO_SETTER_SUFFIX,
+                     ipopo_constants.IPOPO_BATCH_PROPERTIES):
+            injected.pop(name, None)
+
+        return True
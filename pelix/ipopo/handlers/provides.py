@@ -67,8 +67,9 @@ class _HandlerFactory(constants.HandlerFactory):
             return tuple()
 
         # 1 handler per provided service
-        return [ServiceRegistrationHandler(specs, controller)
-                for specs, controller in provides]
+        return [ServiceRegistrationHandler(specs, controller, factory,
+                                           prototype)
+                for specs, controller, factory, prototype in provides]
 
 
 class _Activator(object):
@@ -114,16 +115,25 @@ class ServiceRegistrationHandler(constants.ServiceProviderHandler):
     """
     Handles the registration of a service provided by a component
     """
-    def __init__(self, specifications, controller_name):
+    __slots__ = ('specifications', '__controller', '_ipopo_instance',
+                 '__controller_on', '__validated', '_registration',
+                 '_svc_reference', '__factory', '__prototype')
+
+    def __init__(self, specifications, controller_name, factory=False,
+                 prototype=False):
         """
         Sets up the handler
 
         :param specifications: The service specifications
         :param controller_name: Name of the associated service controller
                                 (can be None)
+        :param factory: If True, the component is a service factory
+        :param prototype: If True, the component is a prototype service factory
         """
         self.specifications = specifications
         self.__controller = controller_name
+        self.__factory = factory
+        self.__prototype = prototype
         self._ipopo_instance = None
 
         # Controller is "on" by default
@@ -205,6 +215,30 @@ class ServiceRegistrationHandler(constants.ServiceProviderHandler):
         setattr(component_instance, setter_name, setter)
 
 
+    def reset(self, component_instance):
+        """
+        Prepares the handler to be reused by a pooled component
+
+        :param component_instance: The component instance
+        :return: True (the handler can be reused)
+        """
+        self._ipopo_instance = None
+        self._registration = None
+        self._svc_reference = None
+        self.__controller_on = True
+        self.__validated = False
+
+        if self.__controller is not None:
+            # Remove the injected methods: the class default is used again
+            injected = vars(component_instance)
+            for suffix in (ipopo_constants.IPOPO_GETTER_SUFFIX,
+                           ipopo_constants.IPOPO_SETTER_SUFFIX):
+                injected.pop(ipopo_constants.IPOPO_CONTROLLER_PREFIX + suffix,
+                             None)
+
+        return True
+
+
     def check_event(self, svc_event):
         """
         Tests if the given service event corresponds to the registered service
@@ -268,6 +302,18 @@ class ServiceRegistrationHandler(constants.ServiceProviderHandler):
             self._registration.set_properties({name: new_value})
 
 
+    def on_properties_change(self, changes):
+        """
+        Called by the instance manager at the end of a properties batch
+
+        :param changes: A dictionary: name -> (old value, new value)
+        """
+        if self._registration is not None:
+            # Update all properties at once: a single service event
+            self._registration.set_properties(
+                    dict((name, values[1]) for name, values in changes.items()))
+
+
     def post_validate(self):
         """
         Called by the instance manager once the component has been validated
@@ -292,18 +338,50 @@ class ServiceRegistrationHandler(constants.ServiceProviderHandler):
         """
         Registers the provided service, if possible
         """
+        request = self.get_registration_request()
+        if request is None:
+            # Nothing to do
+            return
+
+        ipopo = self._ipopo_instance._ipopo_service
+        if ipopo is not None and ipopo.deferred_registration \
+        and not self.__factory:
+            # Let iPOPO register the service with the rest of the cascade
+            ipopo._defer_registration(self)
+
+        else:
+            # Register the service
+            bundle_context, specifications, service, properties = request
+            self.set_registration(bundle_context.register_service(
+                                            specifications, service,
+                                            properties, factory=self.__factory,
+                                            prototype=self.__prototype))
+
+
+    def get_registration_request(self):
+        """
+        Retrieves the description of the service to register, if it must be
+        registered
+
+        :return: A (bundle context, specifications, service, properties) tuple
+                 or None
+        """
         if self._registration is None and self.specifications \
         and self.__validated and self.__controller_on:
             # Use a copy of component properties
-            properties = self._ipopo_instance.context.properties.copy()
-            bundle_context = self._ipopo_instance.bundle_context
+            return (self._ipopo_instance.bundle_context, self.specifications,
+                    self._ipopo_instance.instance,
+                    self._ipopo_instance.context.properties.copy())
 
-            # Register the service
-            self._registration = bundle_context.register_service(
-                                            self.specifications,
-                                            self._ipopo_instance.instance,
-                                            properties)
-            self._svc_reference = self._registration.get_reference()
+
+    def set_registration(self, registration):
+        """
+        Stores the registration of the provided service
+
+        :param registration: The ServiceRegistration object of the service
+        """
+        self._registration = registration
+        self._svc_reference = registration.get_reference()
 
 
     def _unregister_service(self):
@@ -45,7 +45,6 @@ import pelix.ipopo.handlers.constants as constants
 
 # Standard library
 import logging
-import threading
 
 # ------------------------------------------------------------------------------
 
@@ -55,6 +54,12 @@ class _HandlerFactory(constants.HandlerFactory):
     """
     def _prepare_requirements(self, requirements, requires_filters):
         """
+        Overrides the filters of the requirements of a component with the ones
+        given in its properties
+
+        :param requirements: The factory requirements (field -> Requirement)
+        :param requires_filters: The filters to override (field -> filter)
+        :return: The requirements of the component (field -> Requirement)
         """
         if not requires_filters or not isinstance(requires_filters, dict):
             # No explicit filter configured
@@ -66,10 +71,10 @@ class _HandlerFactory(constants.HandlerFactory):
             try:
                 explicit_filter = requires_filters[field]
 
-                # Store an updated copy of the requirement
-                requirement_copy = requirement.copy()
-                requirement_copy.set_filter(explicit_filter)
-                new_requirements[field] = requirement_copy
+                # Store an updated copy of the requirement, shared with the
+                # other instances using the same filter
+                new_requirements[field] = requirement.filtered_copy(
+                                                            explicit_filter)
 
             except (KeyError, TypeError, ValueError):
                 # No information for this one, or invalid filter:
@@ -153,6 +158,9 @@ class _RuntimeDependency(constants.DependencyHandler):
     """
     Manages a required dependency field when a component is running
     """
+    __slots__ = ('_lock', '_ipopo_instance', '_context', '_field',
+                 'requirement', '_value')
+
     def __init__(self, field, requirement):
         """
         Sets up the dependency
@@ -160,8 +168,9 @@ class _RuntimeDependency(constants.DependencyHandler):
         :param field: The injected field name
         :param requirement: The Requirement describing this dependency
         """
-        # The internal state lock
-        self._lock = threading.RLock()
+        # The internal state lock (the instance lock, given during
+        # manipulation)
+        self._lock = None
 
         # The iPOPO StoredInstance object (given during manipulation)
         self._ipopo_instance = None
@@ -192,6 +201,10 @@ class _RuntimeDependency(constants.DependencyHandler):
         # ... and the bundle context
         self._context = stored_instance.bundle_context
 
+        # Share the lock of the instance: the dependency calls it back while
+        # holding its own lock, and vice versa
+        self._lock = stored_instance._lock
+
 
     def clear(self):
         """
@@ -208,6 +221,24 @@ class _RuntimeDependency(constants.DependencyHandler):
         self._field = None
 
 
+    def reset(self, component_instance):
+        """
+        Prepares the handler to be reused by a pooled component. The
+        bindings have been removed when the handler was stopped.
+
+        :param component_instance: The component instance
+        :return: True (the handler can be reused)
+        """
+        self._lock = None
+        self._ipopo_instance = None
+        self._context = None
+        self._value = None
+
+        # Clean up the injected field
+        setattr(component_instance, self._field, None)
+        return True
+
+
     def get_bindings(self):
         """
         Retrieves the list of the references to the bound services
@@ -328,6 +359,8 @@ class SimpleDependency(_RuntimeDependency):
     """
     Manages a simple dependency field
     """
+    __slots__ = ('reference',)
+
     def __init__(self, field, requirement):
         """
         Sets up the dependency
@@ -349,6 +382,17 @@ class SimpleDependency(_RuntimeDependency):
         super(SimpleDependency, self).clear()
 
 
+    def reset(self, component_instance):
+        """
+        Prepares the handler to be reused by a pooled component
+
+        :param component_instance: The component instance
+        :return: True (the handler can be reused)
+        """
+        self.reference = None
+        return super(SimpleDependency, self).reset(component_instance)
+
+
     def get_bindings(self):
         """
         Retrieves the list of the references to the bound services
@@ -371,9 +415,12 @@ class SimpleDependency(_RuntimeDependency):
         """
         with self._lock:
             if self._value is None:
+                # Get the service first: a service factory might fail
+                service = self._context.get_service(svc_ref)
+
                 # Inject the service
                 self.reference = svc_ref
-                self._value = self._context.get_service(svc_ref)
+                self._value = service
 
                 self._ipopo_instance.bind(self, self._value, self.reference)
                 return True
@@ -454,6 +501,8 @@ class AggregateDependency(_RuntimeDependency):
     """
     Manages an aggregated dependency field
     """
+    __slots__ = ('services', '_future_value')
+
     def __init__(self, field, requirement):
         """
         Sets up the dependency
@@ -484,6 +533,18 @@ class AggregateDependency(_RuntimeDependency):
         super(AggregateDependency, self).clear()
 
 
+    def reset(self, component_instance):
+        """
+        Prepares the handler to be reused by a pooled component
+
+        :param component_instance: The component instance
+        :return: True (the handler can be reused)
+        """
+        self.services.clear()
+        self._future_value = None
+        return super(AggregateDependency, self).reset(component_instance)
+
+
     def get_bindings(self):
         """
         Retrieves the list of the references to the bound services
@@ -36,7 +36,9 @@ __docformat__ = "restructuredtext en"
 # ------------------------------------------------------------------------------
 
 # Pelix
-from pelix.constants import FrameworkException
+from pelix.constants import FrameworkException, SERVICE_ID
+from pelix.internals.locks import create_lock
+from pelix.services import SERVICE_EVENT_LOOP
 
 # iPOPO constants
 import pelix.ipopo.constants as constants
@@ -46,8 +48,54 @@ import pelix.ipopo.handlers.constants as handlers_const
 from pelix.ipopo.contexts import ComponentContext
 
 # Standard library
+import contextlib
+import inspect
 import logging
 import threading
+import time
+
+# ------------------------------------------------------------------------------
+
+def _overrides_check_event(handler):
+    """
+    Tests if the given handler implements its own check_event() method, i.e.
+    if it can refuse a service event
+
+    :param handler: A component handler
+    :return: True if the handler has a specific check_event() method
+    """
+    method = getattr(type(handler), 'check_event', None)
+    if method is None:
+        # No filtering at all
+        return False
+
+    # Compare the underlying functions (unbound methods in Python 2)
+    default = handlers_const.Handler.check_event
+    return getattr(method, '__func__', method) \
+        is not getattr(default, '__func__', default)
+
+
+def _is_future(value):
+    """
+    Tests if the given value looks like a future, i.e. if it has done() and
+    result() methods (FutureResult, concurrent.futures.Future, ...)
+
+    :param value: A value returned by a component callback
+    :return: True if the value is a future
+    """
+    return callable(getattr(value, 'done', None)) \
+        and callable(getattr(value, 'result', None))
+
+
+def _is_coroutine(value):
+    """
+    Tests if the given value is a coroutine object (``async def``)
+
+    :param value: A value returned by a component callback
+    :return: True if the value is a coroutine (always False before Python 3.5)
+    """
+    iscoroutine = getattr(inspect, 'iscoroutine', None)
+    return iscoroutine is not None and iscoroutine(value)
 
 # ------------------------------------------------------------------------------
 
@@ -57,8 +105,12 @@ class StoredInstance(object):
     """
     # Try to reduce memory footprint (stored instances)
     __slots__ = ('bundle_context', 'context', 'factory_name', 'instance',
-                 'name', 'state', '_controllers_state', '_handlers',
-                 '_ipopo_service', '_lock', '_logger')
+                 'name', 'state', 'bind_counts', 'validation_count',
+                 'validation_time', 'total_validation_time',
+                 '_controllers_state', '_event_checkers', '_handlers',
+                 '_ipopo_service', '_lock', '__logger', '__async_callbacks',
+                 '__pending_unbinds', '__validation_timeout',
+                 '__batched_changes', '__validating')
 
     INVALID = 0
     """ This component has been invalidated """
@@ -72,7 +124,18 @@ class StoredInstance(object):
     VALIDATING = 3
     """ This component is currently validating """
 
-    def __init__(self, ipopo_service, context, instance, handlers):
+    LAZY = 4
+    """ This component will be instantiated on the first use of its services """
+
+    INVALIDATING = 5
+    """ This component is currently invalidating """
+
+    ERRONEOUS = 6
+    """ The validation of this component failed or timed out """
+
+    def __init__(self, ipopo_service, context, instance, handlers,
+                 async_callbacks=False, validation_timeout=None,
+                 lock_profiler=None):
         """
         Sets up the instance object
 
@@ -80,15 +143,22 @@ class StoredInstance(object):
         :param context: The component context
         :param instance: The component instance
         :param handlers: The list of handlers associated to this component
+        :param async_callbacks: If True, the validation and invalidation
+                                callbacks are called by the iPOPO thread pool,
+                                without holding the instance lock
+        :param validation_timeout: Maximum time (in seconds) to wait for the
+                                   future returned by the validation callback
+                                   (None to wait forever)
+        :param lock_profiler: The LockProfiler creating the instance lock
+                              (optional)
         """
         assert isinstance(context, ComponentContext)
 
-        # The logger
-        self._logger = logging.getLogger('-'.join(("InstanceManager",
-                                                   context.name)))
+        # The logger, created on first use (loggers are never released)
+        self.__logger = None
 
         # The lock
-        self._lock = threading.RLock()
+        self._lock = create_lock(lock_profiler, "StoredInstance._lock", True)
 
         # The iPOPO service
         self._ipopo_service = ipopo_service
@@ -114,6 +184,29 @@ class StoredInstance(object):
         # The controllers state dictionary
         self._controllers_state = {}
 
+        # Asynchronous life-cycle callbacks
+        self.__async_callbacks = async_callbacks
+
+        # Unbindings delayed during an asynchronous invalidation
+        self.__pending_unbinds = None
+
+        # Maximum duration of the validation of the component
+        self.__validation_timeout = validation_timeout
+
+        # Properties changed during a batch: name -> (old value, new value)
+        self.__batched_changes = None
+
+        # Event set at the end of a validation delegated to the thread pool
+        self.__validating = None
+
+        # Statistics: (field, service ID) -> number of bindings
+        self.bind_counts = {}
+
+        # Statistics: number and duration (in seconds) of validations
+        self.validation_count = 0
+        self.validation_time = 0
+        self.total_validation_time = 0
+
         # Handlers: kind -> [handlers]
         self._handlers = {}
         for handler in handlers:
@@ -122,6 +215,22 @@ class StoredInstance(object):
                 for kind in kinds:
                     self._handlers.setdefault(kind, []).append(handler)
 
+        # Handlers which really filter service events (tuple: read lock-free)
+        self._event_checkers = tuple(handler for handler in handlers
+                                     if _overrides_check_event(handler))
+
+
+    @property
+    def _logger(self):
+        """
+        The logger of this component instance
+        """
+        if self.__logger is None:
+            self.__logger = logging.getLogger('-'.join(("InstanceManager",
+                                                        self.name)))
+
+        return self.__logger
+
 
     def __repr__(self):
         """
@@ -143,16 +252,32 @@ class StoredInstance(object):
         Tests if the given service event must be handled or ignored, based
         on the state of the iPOPO service and on the content of the event.
 
+        This method doesn't acquire the instance lock: the state flag and the
+        tuple of event checkers are replaced atomically, so reading them can't
+        see a partially updated instance.
+
         :param event: A service event
         :return: True if the event can be handled, False if it must be ignored
         """
-        with self._lock:
-            if self.state == StoredInstance.KILLED:
-                # This call may have been blocked by the internal state lock,
-                # ignore it
-                return False
+        # Keep a reference to the tuple: kill() replaces it
+        checkers = self._event_checkers
+        if self.state == StoredInstance.KILLED:
+            # The instance is (being) killed: ignore the event
+            return False
 
-            return self.__safe_handlers_callback('check_event', event)
+        for handler in checkers:
+            try:
+                result = handler.check_event(event)
+                if result is not None and not result:
+                    # A handler told to ignore the event
+                    return False
+
+            except Exception as ex:
+                # Log errors, but consider the handler accepted the event
+                self._logger.exception("Error calling handler '%s': %s",
+                                       handler, ex)
+
+        return True
 
 
     def bind(self, dependency, svc, svc_ref):
@@ -184,6 +309,12 @@ class StoredInstance(object):
             # Invalidate first (if needed)
             self.check_lifecycle()
 
+            if self.__pending_unbinds is not None:
+                # The invalidation callback is running: remove the injection
+                # once it has returned
+                self.__pending_unbinds.append((dependency, svc, svc_ref))
+                return
+
             # Call unbind() and remove the injection
             self.__unset_binding(dependency, svc, svc_ref)
 
@@ -224,10 +355,47 @@ class StoredInstance(object):
         :param new_value: The new property value
         """
         with self._lock:
+            if self.__batched_changes is not None:
+                # Keep the value from before the batch
+                old_value = self.__batched_changes.get(name, (old_value,))[0]
+                self.__batched_changes[name] = (old_value, new_value)
+                return
+
             self.__safe_handlers_callback('on_property_change', name, old_value,
                                           new_value)
 
 
+    @contextlib.contextmanager
+    def batch_properties(self):
+        """
+        Context manager grouping the property changes made in its block: the
+        handlers are notified once, at the end of the outermost batch, and
+        the service properties are updated with a single event.
+
+        The instance lock is held during the whole batch.
+        """
+        with self._lock:
+            if self.__batched_changes is not None:
+                # Nested batch
+                yield
+                return
+
+            self.__batched_changes = {}
+            try:
+                yield
+
+            finally:
+                changes, self.__batched_changes = self.__batched_changes, None
+
+                # Ignore the properties set back to their previous value
+                changes = dict((name, values)
+                               for name, values in changes.items()
+                               if values[0] != values[1])
+                if changes:
+                    self.__safe_handlers_callback('on_properties_change',
+                                                  changes)
+
+
     def get_handlers(self, kind=None):
         """
         Retrieves the handlers of the given kind. If kind is None, all handlers
@@ -257,7 +425,9 @@ class StoredInstance(object):
             # Validation flags
             was_valid = (self.state == StoredInstance.VALID)
             can_validate = self.state not in (StoredInstance.VALIDATING,
-                                              StoredInstance.VALID)
+                                              StoredInstance.VALID,
+                                              StoredInstance.INVALIDATING,
+                                              StoredInstance.ERRONEOUS)
 
             # Test the validity of all handlers
             handlers_valid = self.__safe_handlers_callback('is_valid',
@@ -302,57 +472,167 @@ class StoredInstance(object):
             self.__safe_handlers_callback('start')
 
 
+    def retry_erroneous(self):
+        """
+        Resets the state of an erroneous component and tries to validate it
+        again
+
+        :return: The new state of the component
+        """
+        with self._lock:
+            if self.state == StoredInstance.ERRONEOUS:
+                self.state = StoredInstance.INVALID
+                self.check_lifecycle()
+
+            return self.state
+
+
     def invalidate(self, callback=True):
         """
         Applies the component invalidation.
 
+        If the component callbacks are asynchronous, the invalidation callback
+        is called by the iPOPO thread pool: the component stays in the
+        INVALIDATING state until it returns, and the services unbound meanwhile
+        are removed afterwards.
+
         :param callback: If True, call back the component before the
                          invalidation
         """
+        self.__invalidate(callback, self.__async_callbacks)
+
+
+    def __invalidate(self, callback, asynchronous):
+        """
+        Applies the component invalidation.
+
+        :param callback: If True, call back the component before the
+                         invalidation
+        :param asynchronous: If True, the callback is called by the iPOPO
+                             thread pool
+        """
         with self._lock:
             if self.state != StoredInstance.VALID:
                 # Instance is not running...
                 return
 
             # Change the state
-            self.state = StoredInstance.INVALID
+            self.state = StoredInstance.INVALIDATING
 
             # Call the handlers
             self.__safe_handlers_callback('pre_invalidate')
 
             # Call the component
             if callback:
+                if asynchronous:
+                    self.__pending_unbinds = []
+                    self._ipopo_service._enqueue_callback(
+                                                self.__async_invalidation)
+                    return
+
                 self.__safe_callback(constants.IPOPO_CALLBACK_INVALIDATE,
-                                   self.bundle_context)
+                                     self.bundle_context)
 
-                # Trigger an "Invalidated" event
-                self._ipopo_service._fire_ipopo_event(
-                                              constants.IPopoEvent.INVALIDATED,
-                                              self.factory_name, self.name)
+            self.__end_invalidation(callback)
 
-            # Call the handlers
-            self.__safe_handlers_callback('post_invalidate')
+
+    def __end_invalidation(self, callback):
+        """
+        Ends the component invalidation. The instance lock must be held by the
+        caller.
+
+        :param callback: If True, the component has been called back
+        """
+        if self.state != StoredInstance.INVALIDATING:
+            # Killed by the callback
+            return
+
+        # Change the state
+        self.state = StoredInstance.INVALID
+
+        if callback:
+            # Trigger an "Invalidated" event
+            self._ipopo_service._fire_ipopo_event(
+                                          constants.IPopoEvent.INVALIDATED,
+                                          self.factory_name, self.name)
+
+        # Call the handlers
+        self.__safe_handlers_callback('post_invalidate')
+
+
+    def __async_invalidation(self):
+        """
+        Calls the invalidation callback of the component, from the iPOPO
+        thread pool
+        """
+        with self._lock:
+            if self.state != StoredInstance.INVALIDATING:
+                # Killed before being called back
+                return
+
+            callback = self.context.get_callback(
+                                        constants.IPOPO_CALLBACK_INVALIDATE)
+            instance = self.instance
+            bundle_context = self.bundle_context
+
+        if callback:
+            # Call the component without holding the lock
+            self.__run_callback(constants.IPOPO_CALLBACK_INVALIDATE, callback,
+                                instance, bundle_context)
+
+        with self._lock:
+            pending, self.__pending_unbinds = self.__pending_unbinds, None
+            if self.state != StoredInstance.INVALIDATING:
+                # Killed while calling back: kill() removed the bindings
+                return
+
+            self.__end_invalidation(True)
+
+            # Remove the injections delayed during the callback
+            for dependency, svc, svc_ref in pending:
+                self.__unset_binding(dependency, svc, svc_ref)
+
+            # Try a new configuration
+            if self.update_bindings():
+                self.check_lifecycle()
 
 
-    def kill(self):
+    def kill(self, recycle=False):
         """
         This instance is killed : invalidate it if needed, clean up all members
 
         When this method is called, this StoredInstance object must have
         been removed from the registry
+
+        :param recycle: If True, try to reset the handlers instead of clearing
+                        them, to reuse them with the component instance
+        :return: True if the component instance and its handlers can be
+                 reused
         """
         with self._lock:
             # Already dead...
             if self.state == StoredInstance.KILLED:
-                return
+                return False
+
+            # A callback still running in the thread pool will use the
+            # component instance: it can't be reused
+            recycle = recycle and self.state not in (
+                                                StoredInstance.VALIDATING,
+                                                StoredInstance.INVALIDATING)
 
             try:
-                self.invalidate(True)
+                # Call back the component before cleaning it up
+                self.__invalidate(True, False)
 
             except:
                 self._logger.exception("%s: Error invalidating the instance",
                                        self.name)
 
+            # Remove the injections delayed by an asynchronous invalidation
+            pending, self.__pending_unbinds = self.__pending_unbinds, None
+            for dependency, svc, svc_ref in pending or tuple():
+                self.__unset_binding(dependency, svc, svc_ref)
+
             # Now that we are nearly clean, be sure we were in a good registry
             # state
             assert not self._ipopo_service.is_registered_instance(self.name)
@@ -371,10 +651,15 @@ class StoredInstance(object):
                                                "%s", handler, ex)
 
             # Call the handlers
-            self.__safe_handlers_callback('clear')
+            if recycle:
+                recycle = self.__reset_handlers()
+
+            if not recycle:
+                self.__safe_handlers_callback('clear')
 
             # Change the state
             self.state = StoredInstance.KILLED
+            self._event_checkers = tuple()
 
             # Trigger the event
             self._ipopo_service._fire_ipopo_event(constants.IPopoEvent.KILLED,
@@ -386,98 +671,385 @@ class StoredInstance(object):
             self.context = None
             self.instance = None
             self._ipopo_service = None
+            return recycle
+
+
+    def __reset_handlers(self):
+        """
+        Resets the handlers of the component, to reuse them in a new instance.
+        The instance lock must be held by the caller.
+
+        :return: True if all handlers can be reused
+        """
+        for handler in self.get_handlers():
+            if not self.__safe_handler_callback(handler, 'reset',
+                                                self.instance):
+                return False
+
+        return True
 
 
     def validate(self, safe_callback=True):
         """
-        Ends the component validation, registering services
+        Ends the component validation, registering services.
+
+        If the component callbacks are asynchronous, the validation callback
+        is called by the iPOPO thread pool: the component stays in the
+        VALIDATING state, and its services are not registered, until it
+        returns.
+
+        The validation callback can also return a future (an object with
+        done() and result() methods): the component then stays in the
+        VALIDATING state until the future completes. If the future raises an
+        exception or doesn't complete before the validation timeout, the
+        component goes into the ERRONEOUS state.
 
         :param safe_callback: If True, calls the component validation callback
         :raise RuntimeError: You try to awake a dead component
         """
         with self._lock:
             if self.state in (StoredInstance.VALID,
-                              StoredInstance.VALIDATING):
+                              StoredInstance.VALIDATING,
+                              StoredInstance.INVALIDATING,
+                              StoredInstance.ERRONEOUS):
                 # No work to do (yet)
                 return
 
             if self.state == StoredInstance.KILLED:
                 raise RuntimeError("{0}: Zombies !".format(self.name))
 
+            start = time.time()
+
             # Call the handlers
             self.__safe_handlers_callback('pre_validate')
 
             if safe_callback:
                 # Safe call back needed and not yet passed
                 self.state = StoredInstance.VALIDATING
-                if not self.__safe_callback(constants.IPOPO_CALLBACK_VALIDATE,
-                                            self.bundle_context):
+                if self.__async_callbacks:
+                    # Let the thread pool call the component
+                    self.__validating = validation = threading.Event()
+                    self._ipopo_service._enqueue_callback(
+                                self.__async_validation, validation, start)
+                    return
+
+                result = self.__safe_callback(constants.IPOPO_CALLBACK_VALIDATE,
+                                              self.bundle_context)
+                if _is_future(result):
+                    # Wait for the future in the thread pool
+                    self.__validating = validation = threading.Event()
+                    self._ipopo_service._enqueue_callback(
+                                self.__wait_validation, validation, result,
+                                start, self.context, self.instance,
+                                self.bundle_context)
+                    return
+
+                elif not result:
                     # Stop there if the callback failed
-                    self.invalidate(True)
+                    self.__fail_validation()
                     return
 
-            # All good
-            self.state = StoredInstance.VALID
+            self.__end_validation(start)
 
-            # Call the handlers
-            self.__safe_handlers_callback('post_validate')
 
-            # We may have caused a framework error, so check if iPOPO is active
-            if self._ipopo_service is not None:
-                # Trigger the iPOPO event (after the service _registration)
-                self._ipopo_service._fire_ipopo_event(
-                                              constants.IPopoEvent.VALIDATED,
-                                              self.factory_name, self.name)
+    def wait_validation(self, timeout=None):
+        """
+        Waits for the end of a validation delegated to the iPOPO thread pool
+        (asynchronous callback or future returned by the callback)
+
+        :param timeout: Maximum time to wait (in seconds)
+        :return: True if the component is not in the VALIDATING state anymore
+        """
+        event = self.__validating
+        if event is not None:
+            event.wait(timeout)
+
+        return self.state != StoredInstance.VALIDATING
 
 
-    def __callback(self, event, *args, **kwargs):
+    def __release_validation_waiters(self):
         """
-        Calls the registered method in the component for the given event
+        Wakes up the threads waiting for the end of the validation. The
+        instance lock must be held by the caller.
+        """
+        event = self.__validating
+        if event is not None:
+            self.__validating = None
+            event.set()
 
-        :param event: An event (IPOPO_CALLBACK_VALIDATE, ...)
-        :return: The callback result, or None
-        :raise Exception: Something went wrong
+
+    def __fail_validation(self):
+        """
+        Puts the component in the ERRONEOUS state after a failed validation.
+        The instance lock must be held by the caller.
+        """
+        if self.state != StoredInstance.VALIDATING:
+            # Killed by the callback
+            return
+
+        # Undo the preparation of the validation
+        self.__safe_handlers_callback('pre_invalidate')
+        self.state = StoredInstance.ERRONEOUS
+        self.__safe_handlers_callback('post_invalidate')
+
+        self._logger.error("%s: validation failed, component is erroneous",
+                           self.name)
+
+
+    def __end_validation(self, start):
+        """
+        Ends the component validation. The instance lock must be held by the
+        caller.
+
+        :param start: Time when the validation started
+        """
+        # All good
+        self.state = StoredInstance.VALID
+
+        # Call the handlers
+        self.__safe_handlers_callback('post_validate')
+
+        # Update statistics
+        self.validation_time = time.time() - start
+        self.total_validation_time += self.validation_time
+        self.validation_count += 1
+
+        # We may have caused a framework error, so check if iPOPO is active
+        if self._ipopo_service is not None:
+            # Trigger the iPOPO event (after the service _registration)
+            self._ipopo_service._fire_ipopo_event(
+                                          constants.IPopoEvent.VALIDATED,
+                                          self.factory_name, self.name)
+
+
+    def __async_validation(self, validation, start):
+        """
+        Calls the validation callback of the component, from the iPOPO thread
+        pool
+
+        :param validation: The event identifying the current validation
+        :param start: Time when the validation started
         """
         with self._lock:
-            comp_callback = self.context.get_callback(event)
-            if not comp_callback:
-                # No registered callback
-                return True
+            if self.__validating is not validation:
+                # Outdated validation
+                return
 
-            # Call it
-            result = comp_callback(self.instance, *args, **kwargs)
-            if result is None:
-                # Special case, if the call back returns nothing
-                return True
+            elif self.state != StoredInstance.VALIDATING:
+                # Killed before being called back
+                self.__release_validation_waiters()
+                return
 
-            return result
+            context = self.context
+            instance = self.instance
+            bundle_context = self.bundle_context
+
+        result = True
+        callback = context.get_callback(constants.IPOPO_CALLBACK_VALIDATE)
+        if callback:
+            # Call the component without holding the lock
+            result = self.__run_callback(constants.IPOPO_CALLBACK_VALIDATE,
+                                         callback, instance, bundle_context)
+
+        if _is_future(result):
+            # Wait for the future in this thread
+            self.__wait_validation(validation, result, start, context,
+                                   instance, bundle_context)
 
+        else:
+            self.__validation_done(validation, bool(result), start, context,
+                                   instance, bundle_context)
 
-    def __field_callback(self, field, event, *args, **kwargs):
+
+    def __wait_validation(self, validation, future, start, context, instance,
+                          bundle_context):
         """
-        Calls the registered method in the component for the given field event
+        Waits for the future returned by the validation callback of the
+        component, from the iPOPO thread pool.
 
-        :param field: A field name
-        :param event: An event (IPOPO_CALLBACK_VALIDATE, ...)
-        :return: The callback result, or None
-        :raise Exception: Something went wrong
+        If the future doesn't complete before the validation timeout, it is
+        cancelled (if possible) and the component goes into the ERRONEOUS
+        state.
+
+        :param validation: The event identifying the current validation
+        :param future: The future returned by the validation callback
+        :param start: Time when the validation started
+        :param context: The component context
+        :param instance: The component instance
+        :param bundle_context: The context of the component bundle
+        """
+        timeout = self.__validation_timeout
+        try:
+            if timeout:
+                # The timeout counts from the beginning of the validation
+                future.result(max(start + timeout - time.time(), 0))
+
+            else:
+                future.result()
+
+            success = True
+
+        except Exception as ex:
+            success = False
+            if future.done():
+                self._logger.exception("%s: error validating the component: "
+                                       "%s", self.name, ex)
+
+            else:
+                self._logger.error("%s: validation timed out after %s "
+                                   "seconds", self.name, timeout)
+
+                # Stop the validation, if the future supports it
+                cancel = getattr(future, 'cancel', None)
+                if not callable(cancel) or not cancel():
+                    self._logger.warning("%s: the future of the timed out "
+                                         "validation can't be cancelled",
+                                         self.name)
+
+        self.__validation_done(validation, success, start, context, instance,
+                               bundle_context)
+
+
+    def __validation_done(self, validation, success, start, context, instance,
+                          bundle_context):
+        """
+        Ends a validation which was delegated to the iPOPO thread pool.
+        Does nothing if the given validation is not the current one.
+
+        :param validation: The event identifying the validation
+        :param success: True if the validation callback succeeded
+        :param start: Time when the validation started
+        :param context: The component context
+        :param instance: The component instance
+        :param bundle_context: The context of the component bundle
         """
         with self._lock:
-            comp_callback = self.context.get_field_callback(field, event)
-            if not comp_callback:
-                # No registered callback
-                return True
+            if self.__validating is not validation:
+                # Late completion of a previous validation
+                self._logger.debug("%s: ignoring the end of an outdated "
+                                   "validation", self.name)
+                return
+
+            try:
+                if self.state == StoredInstance.VALIDATING:
+                    if not success:
+                        # Stop there if the callback failed
+                        self.__fail_validation()
+                        return
+
+                    self.__end_validation(start)
+
+                    # Dependencies may have gone during the callback
+                    self.check_lifecycle()
+                    return
 
-            # Call it
-            result = comp_callback(self.instance, field, *args, **kwargs)
+            finally:
+                self.__release_validation_waiters()
+
+        if success and self.state == StoredInstance.KILLED:
+            # Killed during the validation: the component has been validated,
+            # so it must be invalidated
+            callback = context.get_callback(
+                                        constants.IPOPO_CALLBACK_INVALIDATE)
+            if callback:
+                self.__run_callback(constants.IPOPO_CALLBACK_INVALIDATE,
+                                    callback, instance, bundle_context)
+
+
+    def __run_coroutine(self, event, coroutine):
+        """
+        Executes a coroutine returned by a callback in the event loop service.
+        The validation waits for the coroutine to complete; the errors of the
+        other coroutines are logged.
+
+        :param event: The kind of callback (IPOPO_CALLBACK_VALIDATE, ...)
+        :param coroutine: The coroutine object
+        :return: A FutureResult object, or False if there is no event loop
+        """
+        reference = self.bundle_context.get_service_reference(
+                                                            SERVICE_EVENT_LOOP)
+        if reference is None:
+            self._logger.error("%s: no event loop service to run the "
+                               "coroutine of callback %s", self.name, event)
+            coroutine.close()
+            return False
+
+        try:
+            future = self.bundle_context.get_service(reference) \
+                         .run_coroutine(coroutine)
+
+        except ValueError as ex:
+            # Event loop stopped
+            self._logger.error("%s: can't run the coroutine of callback %s: "
+                               "%s", self.name, event, ex)
+            return False
+
+        finally:
+            self.bundle_context.unget_service(reference)
+
+        if event != constants.IPOPO_CALLBACK_VALIDATE:
+            def log_error(future):
+                """
+                Logs the exception of the coroutine
+                """
+                if not future.cancelled() and future.exception() is not None:
+                    self._logger.error("%s: error in the coroutine of "
+                                       "callback %s: %s", self.name, event,
+                                       future.exception())
+
+            future.add_done_callback(log_error)
+
+        return future
+
+
+    def __run_callback(self, event, comp_callback, *args):
+        """
+        Calls the given method of the component, logging its errors.
+        This method doesn't acquire the instance lock.
+
+        :param event: The kind of callback (IPOPO_CALLBACK_VALIDATE, ...)
+        :param comp_callback: The component method
+        :param args: The method arguments, including the component instance
+        :return: The callback result (True if it returned None), or False on
+                 error
+        """
+        try:
+            result = comp_callback(*args)
             if result is None:
                 # Special case, if the call back returns nothing
                 return True
 
+            elif _is_coroutine(result):
+                # Coroutine callback: run it in the event loop
+                return self.__run_coroutine(event, result)
+
             return result
 
+        except FrameworkException as ex:
+            # Important error
+            self._logger.exception("Critical error calling back %s: %s",
+                                   self.name, ex)
+
+            # Kill the component
+            ipopo_service = self._ipopo_service
+            if ipopo_service is not None:
+                ipopo_service.kill(self.name)
+
+            if ex.needs_stop:
+                # Framework must be stopped...
+                self._logger.error("%s said that the Framework must be "
+                                   "stopped.", self.name)
+                self.bundle_context.get_bundle(0).stop()
+            return False
 
-    def __safe_callback(self, event, *args, **kwargs):
+        except:
+            self._logger.exception("Component '%s' : error calling "
+                                   "callback method for event %s",
+                                   self.name, event)
+            return False
+
+
+    def __safe_callback(self, event, *args):
         """
         Calls the registered method in the component for the given event,
         ignoring raised exceptions
@@ -490,32 +1062,16 @@ class StoredInstance(object):
                 # Invalid state
                 return None
 
-            try:
-                return self.__callback(event, *args, **kwargs)
-
-            except FrameworkException as ex:
-                # Important error
-                self._logger.exception("Critical error calling back %s: %s",
-                                       self.name, ex)
+            comp_callback = self.context.get_callback(event)
+            if not comp_callback:
+                # No registered callback
+                return True
 
-                # Kill the component
-                self._ipopo_service.kill(self.name)
+            return self.__run_callback(event, comp_callback, self.instance,
+                                       *args)
 
-                if ex.needs_stop:
-                    # Framework must be stopped...
-                    self._logger.error("%s said that the Framework must be "
-                                       "stopped.", self.name)
-                    self.bundle_context.get_bundle(0).stop()
-                return False
 
-            except:
-                self._logger.exception("Component '%s' : error calling "
-                                       "callback method for event %s",
-                                       self.name, event)
-                return False
-
-
-    def __safe_field_callback(self, field, event, *args, **kwargs):
+    def __safe_field_callback(self, field, event, *args):
         """
         Calls the registered method in the component for the given event,
         ignoring raised exceptions
@@ -529,29 +1085,13 @@ class StoredInstance(object):
                 # Invalid state
                 return None
 
-            try:
-                return self.__field_callback(field, event, *args, **kwargs)
-
-            except FrameworkException as ex:
-                # Important error
-                self._logger.exception("Critical error calling back %s: %s",
-                                       self.name, ex)
-
-                # Kill the component
-                self._ipopo_service.kill(self.name)
-
-                if ex.needs_stop:
-                    # Framework must be stopped...
-                    self._logger.error("%s said that the Framework must be "
-                                       "stopped.", self.name)
-                    self.bundle_context.get_bundle(0).stop()
-                return False
+            comp_callback = self.context.get_field_callback(field, event)
+            if not comp_callback:
+                # No registered callback
+                return True
 
-            except:
-                self._logger.exception("Component '%s' : error calling "
-                                       "callback method for event %s",
-                                       self.name, event)
-                return False
+            return self.__run_callback(event, comp_callback, self.instance,
+                                       field, *args)
 
 
     def __safe_handler_callback(self, handler, method_name, *args, **kwargs):
@@ -679,6 +1219,10 @@ class StoredInstance(object):
         :param reference: The reference of the injected service
         """
         with self._lock:
+            # Update statistics
+            key = (dependency.get_field(), reference.get_property(SERVICE_ID))
+            self.bind_counts[key] = self.bind_counts.get(key, 0) + 1
+
             # Set the value
             setattr(self.instance, dependency.get_field(),
                     dependency.get_value())
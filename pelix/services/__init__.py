@@ -50,6 +50,19 @@ PROP_EVENT_TOPICS = "event.topics"
 PROP_EVENT_FILTER = "event.filter"
 """ Filter on events properties for an event handler """
 
+PROP_EVENT_DELIVERY = "event.delivery"
+"""
+Delivery of the posted events to an event handler: ordered (default) or not
+"""
+
+EVENT_DELIVERY_ASYNC_ORDERED = "async.ordered"
+"""
+Posted events are delivered one at a time to the handler, in posting order
+"""
+
+EVENT_DELIVERY_ASYNC_UNORDERED = "async.unordered"
+""" Posted events can be delivered concurrently to the handler """
+
 EVENT_PROP_FRAMEWORK_UID = "event.sender.framework.uid"
 """ UID of the framework that emitted the event """
 
@@ -81,6 +94,33 @@ CONFIG_PROP_BUNDLE_LOCATION = 'service.bundleLocation'
 
 #-------------------------------------------------------------------------------
 
+SERVICE_EXECUTOR = "pelix.services.executor"
+""" Specification of the shared executor service """
+
+PROP_EXECUTOR_MAX_THREADS = "pelix.executor.threads.max"
+""" Framework property: maximum number of threads of the shared executor """
+
+PROP_EXECUTOR_MIN_THREADS = "pelix.executor.threads.min"
+""" Framework property: number of threads kept by the idle shared executor """
+
+SERVICE_PROCESS_EXECUTOR = "pelix.services.executor.process"
+""" Specification of the process pool executor service """
+
+PROP_PROCESS_EXECUTOR_PROCESSES = "pelix.executor.processes"
+""" Framework property: number of worker processes (default: CPU count) """
+
+PROP_PROCESS_EXECUTOR_BUNDLES = "pelix.executor.processes.bundles"
+""" Framework property: bundles imported by the worker processes (list or
+comma-separated string) """
+
+PROP_PROCESS_EXECUTOR_METHOD = "pelix.executor.processes.start_method"
+""" Framework property: start method of the worker processes """
+
+SERVICE_EVENT_LOOP = "pelix.services.eventloop"
+""" Specification of the asyncio event loop service """
+
+#-------------------------------------------------------------------------------
+
 SERVICE_FILEINSTALL = 'pelix.services.fileinstall'
 """ Specification of the File Install service """
 
@@ -477,6 +477,7 @@ class _ConfigurationDirectory(object):
           aggregate=True, optional=True)
 @Requires('_managed', services.SERVICE_CONFIGADMIN_MANAGED,
           aggregate=True, optional=True)
+@Requires('_executor', services.SERVICE_EXECUTOR, optional=True)
 @Instantiate('pelix-services-configuration-admin')
 class ConfigurationAdmin(object):
     """
@@ -502,6 +503,9 @@ class ConfigurationAdmin(object):
         self._managed_refs = {}
         self.__lock = threading.RLock()
 
+        # Shared executor (injected, optional)
+        self._executor = None
+
         # Update thread pool
         self._pool = None
 
@@ -515,8 +519,15 @@ class ConfigurationAdmin(object):
         Component validated
         """
         with self.__lock:
-            # Create the update thread pool
-            self._pool = pelix.threadpool.ThreadPool(2, logname="ConfigAdmin")
+            if self._executor is not None:
+                # Use a queue of the shared executor
+                self._pool = self._executor.get_queue("configadmin",
+                                                      max_concurrency=2)
+
+            else:
+                # Create the update thread pool
+                self._pool = pelix.threadpool.ThreadPool(2,
+                                                         logname="ConfigAdmin")
             self._pool.start()
 
             # Validation flag
@@ -36,26 +36,298 @@ __docformat__ = "restructuredtext en"
 #-------------------------------------------------------------------------------
 
 # Pelix
-from pelix.ipopo.decorators import ComponentFactory, Provides, Property, \
-    Validate, Invalidate
+from pelix.ipopo.decorators import ComponentFactory, Provides, Requires, \
+    Property, Validate, Invalidate
+from pelix.utilities import is_string
 import pelix.framework
 import pelix.ldapfilter
 import pelix.services
 import pelix.threadpool
 
 # Standard library
+import collections
 import fnmatch
 import logging
+import re
+import threading
 import time
 
 #-------------------------------------------------------------------------------
 
 _logger = logging.getLogger(__name__)
 
+_WILDCARDS = re.compile(r"[*?[]")
+""" Characters of the fnmatch patterns """
+
+_MAX_ORDERED_BATCH = 100
+"""
+Number of ordered events delivered to a handler before letting the other
+handlers use the thread
+"""
+
+#-------------------------------------------------------------------------------
+
+class _TopicNode(object):
+    """
+    A level of the topics index
+    """
+    __slots__ = ('children', 'exact', 'subtopics', 'patterns')
+
+    def __init__(self):
+        """
+        Sets up members
+        """
+        # Topic level -> _TopicNode
+        self.children = {}
+
+        # Handlers of the topic ending at this level
+        self.exact = set()
+
+        # Handlers of all the sub-topics of this level ("level/*")
+        self.subtopics = set()
+
+        # Other patterns starting with this level: Handler -> [regex, ...]
+        self.patterns = {}
+
+
+    def is_empty(self):
+        """
+        Checks if the node can be removed from the index
+        """
+        return not (self.children or self.exact or self.subtopics
+                    or self.patterns)
+
+
+class _TopicIndex(object):
+    """
+    Index of the event handlers: a tree of the levels of their topics
+    (separated by slashes), with their pre-parsed filters.
+
+    Patterns are indexed up to their first level containing a wildcard: a
+    trailing ``*`` level matches all the sub-topics of the node, other
+    patterns are matched with a regular expression on the topics reaching the
+    node. Looking for handlers therefore costs the depth of the topic plus the
+    number of candidate handlers.
+    """
+    def __init__(self):
+        """
+        Sets up members
+        """
+        self.__root = _TopicNode()
+        self.__lock = threading.Lock()
+
+        # ServiceReference -> (LDAP filter, [(node, pattern), ...])
+        self.__handlers = {}
+
+
+    def add(self, reference):
+        """
+        Indexes (or indexes again) an event handler
+
+        :param reference: The ServiceReference of the handler
+        """
+        ldap_filter = reference.get_property(pelix.services.PROP_EVENT_FILTER)
+        try:
+            ldap_filter = pelix.ldapfilter.get_ldap_filter(ldap_filter or None)
+
+        except (TypeError, ValueError) as ex:
+            _logger.error("Ignoring event handler %s: invalid filter %r: %s",
+                          reference, ldap_filter, ex)
+            self.remove(reference)
+            return
+
+        topics = reference.get_property(pelix.services.PROP_EVENT_TOPICS)
+        if is_string(topics):
+            topics = (topics,)
+
+        with self.__lock:
+            self.__remove(reference)
+
+            locations = []
+            for topic in set(topics or ()):
+                locations.append(self.__add_pattern(reference, topic))
+
+            self.__handlers[reference] = (ldap_filter, locations)
+
+
+    def remove(self, reference):
+        """
+        Removes an event handler from the index
+
+        :param reference: The ServiceReference of the handler
+        """
+        with self.__lock:
+            self.__remove(reference)
+
+
+    def clear(self):
+        """
+        Empties the index
+        """
+        with self.__lock:
+            self.__root = _TopicNode()
+            self.__handlers.clear()
+
+
+    def get_handlers(self, topic, properties):
+        """
+        Retrieves the handlers of the given event
+
+        :param topic: Topic of the event
+        :param properties: Properties of the event
+        :return: The sorted list of the ServiceReference of the handlers
+        """
+        levels = topic.split('/')
+        nb_levels = len(levels)
+        candidates = set()
+
+        with self.__lock:
+            node = self.__root
+            depth = 0
+            while True:
+                if depth < nb_levels:
+                    # The topic is a sub-topic of this level
+                    candidates.update(node.subtopics)
+                    for handler, regexes in node.patterns.items():
+                        if handler not in candidates:
+                            for regex in regexes:
+                                if regex.match(topic):
+                                    candidates.add(handler)
+                                    break
+
+                else:
+                    # End of the topic
+                    candidates.update(node.exact)
+                    break
+
+                node = node.children.get(levels[depth])
+                if node is None:
+                    break
+
+                depth += 1
+
+            handlers = []
+            for reference in candidates:
+                ldap_filter = self.__handlers[reference][0]
+                if ldap_filter is None or ldap_filter.matches(properties):
+                    handlers.append(reference)
+
+        handlers.sort()
+        return handlers
+
+
+    def __add_pattern(self, reference, topic):
+        """
+        Indexes a topic pattern of a handler. The caller must hold the lock.
+
+        :param reference: The ServiceReference of the handler
+        :param topic: A topic pattern
+        :return: A (path, pattern) tuple, where path is the list of the nodes
+                 from the root and pattern is the regex or None
+        """
+        path = [self.__root]
+        levels = topic.split('/')
+        for idx, level in enumerate(levels):
+            if _WILDCARDS.search(level) is not None:
+                if level == '*' and idx == len(levels) - 1:
+                    # All sub-topics
+                    path[-1].subtopics.add(reference)
+                    return path, '*'
+
+                # Generic pattern
+                regex = re.compile(fnmatch.translate(topic))
+                path[-1].patterns.setdefault(reference, []).append(regex)
+                return path, regex
+
+            node = path[-1].children.get(level)
+            if node is None:
+                node = path[-1].children[level] = _TopicNode()
+
+            path.append(node)
+
+        # Full topic
+        path[-1].exact.add(reference)
+        return path, None
+
+
+    def __remove(self, reference):
+        """
+        Removes a handler from the index. The caller must hold the lock.
+
+        :param reference: The ServiceReference of the handler
+        """
+        try:
+            locations = self.__handlers.pop(reference)[1]
+
+        except KeyError:
+            # Unknown handler
+            return
+
+        for path, pattern in locations:
+            node = path[-1]
+            if pattern is None:
+                node.exact.discard(reference)
+
+            elif pattern == '*':
+                node.subtopics.discard(reference)
+
+            else:
+                node.patterns.pop(reference, None)
+
+            # Remove the empty nodes
+            for idx in range(len(path) - 1, 0, -1):
+                if not path[idx].is_empty():
+                    break
+
+                parent = path[idx - 1]
+                for level, child in list(parent.children.items()):
+                    if child is path[idx]:
+                        del parent.children[level]
+                        break
+
+#-------------------------------------------------------------------------------
+
+class _Handler(object):
+    """
+    An event handler bound to the EventAdmin, with its queue of posted events
+    """
+    __slots__ = ('reference', 'service', 'ordered', 'events', 'scheduled')
+
+    def __init__(self, reference, service):
+        """
+        :param reference: The ServiceReference of the handler
+        :param service: The handler service
+        """
+        self.reference = reference
+        self.service = service
+        self.ordered = True
+
+        # Posted events not yet delivered: (topic, properties)
+        self.events = collections.deque()
+
+        # A delivery task of the ordered events is queued or running
+        self.scheduled = False
+
+
+    def update(self):
+        """
+        Reads the delivery mode of the handler from its properties
+        """
+        delivery = self.reference.get_property(
+                                        pelix.services.PROP_EVENT_DELIVERY)
+        if is_string(delivery):
+            delivery = (delivery,)
+
+        delivery = delivery or ()
+        self.ordered = \
+            pelix.services.EVENT_DELIVERY_ASYNC_UNORDERED not in delivery \
+            or pelix.services.EVENT_DELIVERY_ASYNC_ORDERED in delivery
+
 #-------------------------------------------------------------------------------
 
 @ComponentFactory(pelix.services.FACTORY_EVENT_ADMIN)
 @Provides(pelix.services.SERVICE_EVENT_ADMIN)
+@Requires("_executor", pelix.services.SERVICE_EXECUTOR, optional=True)
 @Property("_nb_threads", "pool.threads", 10)
 class EventAdmin(object):
     """
@@ -74,120 +346,192 @@ class EventAdmin(object):
         # Number of threads in the pool
         self._nb_threads = 10
 
+        # Shared executor (injected, optional)
+        self._executor = None
+
         # Thread pool
         self._pool = None
 
+        # Index of the event handlers
+        self._index = _TopicIndex()
+
+        # Bound handlers: ServiceReference -> _Handler
+        self._handlers = {}
+        self._handlers_lock = threading.Lock()
+
+        # Handlers whose service is being retrieved: ServiceReference -> flag,
+        # set to False if the handler is removed meanwhile
+        self._adding = {}
+
+        # Protects the queues of posted events
+        self._events_lock = threading.Lock()
 
-    def _get_handlers_ids(self, topic, properties):
+
+    def _get_handlers(self, topic, properties):
         """
-        Retrieves the IDs of the listeners that requested to handle this event
+        Retrieves the references of the handlers that requested to handle
+        this event
 
         :param topic: Topic of the event
         :param properties: Associated properties
-        :return: The IDs of the services to call back for this event
+        :return: The sorted list of the references of the services to call
+                 back for this event
         """
-        handlers = []
+        return self._index.get_handlers(topic, properties)
 
-        # Get the handler service references
-        handlers_refs = self._context.get_all_service_references(\
-                                          pelix.services.SERVICE_EVENT_HANDLER,
-                                          None)
 
-        if handlers_refs is None:
-            # No service found
-            return
+    def service_changed(self, event):
+        """
+        Called by the framework when an event handler service is registered,
+        modified or unregistered: updates the handlers index
 
-        for svc_ref in handlers_refs:
-            # Check the LDAP filter
-            ldap_filter = svc_ref.get_property(pelix.services.PROP_EVENT_FILTER)
-            if self.__match_filter(properties, ldap_filter):
-                # Filter matches the event, test the topic
-                topics = svc_ref.get_property(pelix.services.PROP_EVENT_TOPICS)
-                for handled_topic in topics:
-                    if fnmatch.fnmatch(topic, handled_topic):
-                        # Full match, keep the service ID
-                        handlers.append(svc_ref.get_property(\
-                                                 pelix.framework.SERVICE_ID))
-                        break
+        :param event: A ServiceEvent object
+        """
+        kind = event.get_kind()
+        svc_ref = event.get_service_reference()
 
-        return handlers
+        if kind in (pelix.framework.ServiceEvent.REGISTERED,
+                    pelix.framework.ServiceEvent.MODIFIED):
+            self.__add_handler(svc_ref)
+
+        elif kind in (pelix.framework.ServiceEvent.UNREGISTERING,
+                      pelix.framework.ServiceEvent.MODIFIED_ENDMATCH):
+            self.__remove_handler(svc_ref)
 
 
-    def __match_filter(self, properties, ldap_filter):
+    def __add_handler(self, svc_ref):
         """
-        Tests if the given properties match the given filter
+        Gets the service of a new handler, which is kept until it is
+        unregistered, and (re-)indexes it
 
-        :param properties: A set of properties
-        :param ldap_filter: An LDAP filter string, object or None
-        :return: True if the properties match the filter
+        :param svc_ref: The reference of the handler service
         """
-        if not ldap_filter:
-            # No filter
-            return True
+        with self._handlers_lock:
+            handler = self._handlers.get(svc_ref)
+            if handler is not None:
+                # Known handler: update its index entry
+                handler.update()
+                self._index.add(svc_ref)
+                return
+
+            elif svc_ref in self._adding:
+                # Already being added by another thread, which will index
+                # its current properties
+                return
+
+            self._adding[svc_ref] = True
+
+        # Get the service without holding the lock: a service factory might
+        # register other handlers
+        context = self._context
+        try:
+            service = context.get_service(svc_ref)
+
+        except pelix.framework.BundleException as ex:
+            # Service disappeared
+            _logger.debug("Event handler %s disappeared: %s", svc_ref, ex)
+            with self._handlers_lock:
+                del self._adding[svc_ref]
+            return
 
-        # Normalize the filter
-        ldap_filter = pelix.ldapfilter.get_ldap_filter(ldap_filter)
-        return ldap_filter.matches(properties)
+        with self._handlers_lock:
+            if self._adding.pop(svc_ref):
+                handler = self._handlers[svc_ref] = _Handler(svc_ref, service)
+                handler.update()
+                self._index.add(svc_ref)
+                return
 
+        # Removed while getting its service
+        context.unget_service(svc_ref)
 
-    def __get_service(self, service_id):
+
+    def __remove_handler(self, svc_ref):
+        """
+        Forgets a handler and releases its service
+
+        :param svc_ref: The reference of the handler service
         """
-        Retrieves the reference and the service associated to the given ID,
-        or a (None, None) tuple if no service was found.
+        with self._handlers_lock:
+            if svc_ref in self._adding:
+                # Let the thread adding the handler release its service
+                self._adding[svc_ref] = False
+
+            self._index.remove(svc_ref)
+            handler = self._handlers.pop(svc_ref, None)
+            if handler is None:
+                # Unknown handler
+                return
+
+        # Drop its pending events
+        with self._events_lock:
+            handler.service = None
+            handler.events.clear()
 
-        The service must be freed with BundleContext.unget_service() after usage
+        self._context.unget_service(svc_ref)
 
-        :param service_id: A service ID
-        :return: A (reference, service) tuple or (None, None)
+
+    @staticmethod
+    def __notify(handler, topic, properties):
         """
-        try:
-            # Prepare the filter
-            ldap_filter = "({0}={1})".format(pelix.framework.SERVICE_ID,
-                                             service_id)
+        Notifies a handler of an event
 
-            # Get the reference
-            ref = self._context.get_service_reference(None, ldap_filter)
-            if ref is None:
-                # Unknown service
-                return None, None
+        :param handler: A _Handler object
+        :param topic: Topic of the event
+        :param properties: Associated properties
+        """
+        service = handler.service
+        if service is None:
+            # Handler unregistered since the event was posted
+            return
 
-            # Get the service
-            return ref, self._context.get_service(ref)
+        try:
+            # Use a copy of the properties each time
+            service.handle_event(topic, properties.copy())
 
-        except pelix.framework.BundleException:
-            # Service disappeared
-            return None
+        except Exception as ex:
+            _logger.exception("Error notifying event handler %s: %s (%s)",
+                              handler.reference, ex, type(ex).__name__)
 
 
-    def __notify_handlers(self, topic, properties, handlers_ids):
+    def __notify_handlers(self, topic, properties, handlers_refs):
         """
         Notifies the handlers of an event
 
         :param topic: Topic of the event
         :param properties: Associated properties
-        :param handlers_ids: IDs of the services to notify
+        :param handlers_refs: References of the services to notify
         """
-        if self._context is None:
-            # No more context
-            return
+        for svc_ref in handlers_refs:
+            handler = self._handlers.get(svc_ref)
+            if handler is not None:
+                self.__notify(handler, topic, properties)
 
-        for handler_id in handlers_ids:
-            # Define the "ref" variable name (and reset it on each loop)
-            ref = None
-            try:
-                # Get the service
-                ref, handler = self.__get_service(handler_id)
-                if handler is not None:
-                    # Use a copy of the properties each time
-                    handler.handle_event(topic, properties.copy())
 
-            except Exception as ex:
-                _logger.exception("Error notifying event handler %d: %s (%s)",
-                                  handler_id, ex, type(ex).__name__)
+    def __deliver_ordered(self, handler):
+        """
+        Delivers the posted events of a handler, in order (pool task). Only
+        one such task runs for a handler at a time.
+
+        :param handler: A _Handler object
+        """
+        for _ in range(_MAX_ORDERED_BATCH):
+            with self._events_lock:
+                if not handler.events:
+                    handler.scheduled = False
+                    return
+
+                topic, properties = handler.events.popleft()
 
-            finally:
-                if ref is not None:
-                    self._context.unget_service(ref)
+            self.__notify(handler, topic, properties)
+
+        # Let the other handlers be notified before continuing
+        pool = self._pool
+        if pool is not None:
+            pool.enqueue(self.__deliver_ordered, handler)
+
+        else:
+            with self._events_lock:
+                handler.scheduled = False
 
 
     def __setup_properties(self, properties):
@@ -229,15 +573,19 @@ class EventAdmin(object):
         properties = self.__setup_properties(properties)
 
         # Get the currently available handlers
-        handlers_ids = self._get_handlers_ids(topic, properties)
-        if handlers_ids:
+        handlers_refs = self._get_handlers(topic, properties)
+        if handlers_refs:
             # Notify them
-            self.__notify_handlers(topic, properties, handlers_ids)
+            self.__notify_handlers(topic, properties, handlers_refs)
 
 
     def post(self, topic, properties=None):
         """
-        Sends asynchronously the given event
+        Sends asynchronously the given event.
+
+        The handlers are notified in parallel. Unless its ``event.delivery``
+        property is ``async.unordered``, a handler receives the posted events
+        one at a time, in posting order.
 
         :param topic: Topic of event
         :param properties: Associated properties
@@ -246,11 +594,37 @@ class EventAdmin(object):
         properties = self.__setup_properties(properties)
 
         # Get the currently available handlers
-        handlers_ids = self._get_handlers_ids(topic, properties)
-        if handlers_ids:
-            # Enqueue the task in the thread pool
-            self._pool.enqueue(self.__notify_handlers, topic, properties,
-                               handlers_ids)
+        handlers = []
+        for svc_ref in self._get_handlers(topic, properties):
+            handler = self._handlers.get(svc_ref)
+            if handler is not None:
+                handlers.append(handler)
+
+        if not handlers:
+            return
+
+        # Add the event to the queues of the ordered handlers
+        unordered = []
+        to_schedule = []
+        with self._events_lock:
+            for handler in handlers:
+                if not handler.ordered:
+                    unordered.append((handler, topic, properties))
+
+                else:
+                    handler.events.append((topic, properties))
+                    if not handler.scheduled:
+                        handler.scheduled = True
+                        to_schedule.append((handler,))
+
+        # Enqueue the tasks in the thread pool, one per handler
+        if to_schedule:
+            self._pool.enqueue_many(self.__deliver_ordered, to_schedule,
+                                    fire_and_forget=True)
+
+        if unordered:
+            self._pool.enqueue_many(self.__notify, unordered,
+                                    fire_and_forget=True)
 
 
     @Validate
@@ -264,6 +638,15 @@ class EventAdmin(object):
         # Get the framework instance UID
         self._fw_uid = context.get_property(pelix.framework.FRAMEWORK_UID)
 
+        # Index the event handlers
+        context.add_service_listener(self, None,
+                                     pelix.services.SERVICE_EVENT_HANDLER)
+        handlers_refs = context.get_all_service_references(
+                                    pelix.services.SERVICE_EVENT_HANDLER, None)
+        if handlers_refs is not None:
+            for svc_ref in handlers_refs:
+                self.__add_handler(svc_ref)
+
         # Normalize properties
         try:
             self._nb_threads = int(self._nb_threads)
@@ -275,9 +658,15 @@ class EventAdmin(object):
             # Default value
             self._nb_threads = 10
 
-        # Create the thread pool
-        self._pool = pelix.threadpool.ThreadPool(self._nb_threads,
-                                                 logname="eventadmin-pool")
+        if self._executor is not None:
+            # Use a queue of the shared executor
+            self._pool = self._executor.get_queue(
+                                "eventadmin", max_concurrency=self._nb_threads)
+
+        else:
+            # Create the thread pool
+            self._pool = pelix.threadpool.ThreadPool(self._nb_threads,
+                                                     logname="eventadmin-pool")
         self._pool.start()
 
 
@@ -286,6 +675,24 @@ class EventAdmin(object):
         """
         Component invalidated
         """
+        # Forget the event handlers
+        context.remove_service_listener(self)
+        with self._handlers_lock:
+            for svc_ref in self._adding:
+                self._adding[svc_ref] = False
+
+            self._index.clear()
+            handlers = list(self._handlers.values())
+            self._handlers.clear()
+
+        with self._events_lock:
+            for handler in handlers:
+                handler.service = None
+                handler.events.clear()
+
+        for handler in handlers:
+            context.unget_service(handler.reference)
+
         # Stop the thread pool (empties its queue)
         self._pool.stop()
         self._pool = None
@@ -0,0 +1,421 @@
+#!/usr/bin/env python
+# -- Content-Encoding: UTF-8 --
+"""
+asyncio integration for Pelix: runs an event loop in a dedicated thread and
+provides it as a service, with helpers to wait for services and to receive
+service events in coroutines.
+
+When this service is available, iPOPO components can define their callbacks
+(``@Validate``, ``@Bind``, ...) as coroutines (``async def``): they are
+executed in the event loop.
+
+Requires Python 3.5+.
+
+:author: Thomas Calmant
+:copyright: Copyright 2013, isandlaTech
+:license: Apache License 2.0
+:version: 0.1
+:status: Beta
+
+..
+
+    Copyright 2013 isandlaTech
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Module version
+__version_info__ = (0, 1, 0)
+__version__ = ".".join(str(x) for x in __version_info__)
+
+# Documentation strings format
+__docformat__ = "restructuredtext en"
+
+#-------------------------------------------------------------------------------
+
+# Pelix
+from pelix.internals.events import ServiceEvent
+import pelix.services as services
+import pelix.threadpool
+
+# Standard library
+import asyncio
+import logging
+import threading
+
+#-------------------------------------------------------------------------------
+
+_logger = logging.getLogger(__name__)
+
+#-------------------------------------------------------------------------------
+
+class _ListenerBridge(object):
+    """
+    Service listener forwarding the events to a listener in the event loop
+    """
+    def __init__(self, loop_service, listener):
+        """
+        :param loop_service: The EventLoopService
+        :param listener: The listener called in the event loop
+        """
+        self.__loop_service = loop_service
+        self.__listener = listener
+
+
+    def service_changed(self, event):
+        """
+        Called by the framework: forwards the event without waiting
+        """
+        self.__loop_service.call_soon(self.__dispatch, event)
+
+
+    def __dispatch(self, event):
+        """
+        Notifies the listener, in the event loop thread
+        """
+        try:
+            result = self.__listener.service_changed(event)
+
+        except Exception as ex:
+            _logger.exception("Error notifying a service listener: %s", ex)
+
+        else:
+            if asyncio.iscoroutine(result):
+                self.__loop_service._create_task(result)
+
+
+class EventLoopService(object):
+    """
+    Runs an asyncio event loop in a dedicated thread
+    """
+    def __init__(self):
+        """
+        Sets up members
+        """
+        self.__loop = None
+        self.__thread = None
+        self.__lock = threading.Lock()
+
+        # (bundle context, listener) -> _ListenerBridge
+        self.__bridges = {}
+
+
+    @property
+    def loop(self):
+        """
+        The managed event loop (None if the service is stopped)
+        """
+        return self.__loop
+
+
+    def start(self):
+        """
+        Starts the event loop thread. Does nothing if it is already running.
+        """
+        with self.__lock:
+            if self.__loop is not None:
+                return
+
+            self.__loop = asyncio.new_event_loop()
+            started = threading.Event()
+            self.__loop.call_soon(started.set)
+            self.__thread = threading.Thread(target=self.__run,
+                                             args=(self.__loop,),
+                                             name="pelix-eventloop")
+            self.__thread.daemon = True
+            self.__thread.start()
+
+        started.wait()
+
+
+    def stop(self):
+        """
+        Cancels the pending tasks, stops the event loop and waits for its
+        thread
+        """
+        with self.__lock:
+            loop = self.__loop
+            thread = self.__thread
+            self.__loop = None
+            self.__thread = None
+
+        if loop is None:
+            return
+
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+
+
+    def call_soon(self, method, *args):
+        """
+        Calls a method in the event loop thread, from any thread
+
+        :param method: Method to call
+        :param args: Method arguments
+        :raise ValueError: The event loop is stopped
+        """
+        loop = self.__loop
+        if loop is None:
+            raise ValueError("The event loop is stopped")
+
+        loop.call_soon_threadsafe(method, *args)
+
+
+    def run_coroutine(self, coroutine):
+        """
+        Executes a coroutine in the event loop, from any thread
+
+        :param coroutine: A coroutine object
+        :return: A FutureResult object, to get the result of the coroutine
+        :raise ValueError: The event loop is stopped
+        """
+        loop = self.__loop
+        if loop is None:
+            coroutine.close()
+            raise ValueError("The event loop is stopped")
+
+        return pelix.threadpool.FutureResult.from_concurrent(
+                            asyncio.run_coroutine_threadsafe(coroutine, loop))
+
+
+    def wait_for_service(self, context, specification=None, ldap_filter=None):
+        """
+        Returns an asyncio future which will get the reference of the best
+        service matching the given specification and filter, as soon as one
+        is registered. Must be called in the event loop.
+
+        :param context: The bundle context used to look for the service
+        :param specification: The specification of the service
+        :param ldap_filter: An LDAP filter on the service properties
+        :return: An asyncio.Future object, resulting in a ServiceReference
+        :raise ValueError: The event loop is stopped
+        """
+        loop = self.__loop
+        if loop is None:
+            raise ValueError("The event loop is stopped")
+
+        future = loop.create_future()
+
+        def set_reference(reference):
+            """
+            Sets the future result (in the event loop thread)
+            """
+            if not future.done():
+                future.set_result(reference)
+
+        class Listener(object):
+            """
+            Waits for the registration of a matching service
+            """
+            @staticmethod
+            def service_changed(event):
+                """
+                Called by the framework
+                """
+                if event.get_kind() in (ServiceEvent.REGISTERED,
+                                        ServiceEvent.MODIFIED):
+                    loop.call_soon_threadsafe(set_reference,
+                                              event.get_service_reference())
+
+        listener = Listener()
+        context.add_service_listener(listener, ldap_filter, specification)
+        future.add_done_callback(
+                        lambda _: context.remove_service_listener(listener))
+
+        # Look for a service registered before the listener
+        reference = context.get_service_reference(specification, ldap_filter)
+        if reference is not None:
+            set_reference(reference)
+
+        return future
+
+
+    def get_service(self, context, specification=None, ldap_filter=None):
+        """
+        Returns an asyncio future which will get the best service matching
+        the given specification and filter, as soon as one is registered.
+        The service must be released with ``context.unget_service()``.
+        Must be called in the event loop.
+
+        :param context: The bundle context used to get the service
+        :param specification: The specification of the service
+        :param ldap_filter: An LDAP filter on the service properties
+        :return: An asyncio.Future object, resulting in a
+                 (ServiceReference, service) tuple
+        :raise ValueError: The event loop is stopped
+        """
+        reference_future = self.wait_for_service(context, specification,
+                                                 ldap_filter)
+        future = self.__loop.create_future()
+
+        def on_reference(reference_future):
+            """
+            A matching service has been found
+            """
+            if future.done():
+                return
+
+            elif reference_future.cancelled():
+                future.cancel()
+
+            else:
+                reference = reference_future.result()
+                try:
+                    future.set_result((reference,
+                                       context.get_service(reference)))
+
+                except Exception as ex:
+                    future.set_exception(ex)
+
+        reference_future.add_done_callback(on_reference)
+
+        # Stop waiting (and remove the service listener) if the caller gives
+        # up
+        future.add_done_callback(lambda _: reference_future.cancel())
+        return future
+
+
+    def add_service_listener(self, context, listener, ldap_filter=None,
+                             specification=None):
+        """
+        Registers a service listener whose ``service_changed()`` method is
+        called in the event loop. It can be a coroutine. The thread firing
+        the event doesn't wait for the listener, which might therefore be
+        notified after the service has been unregistered.
+
+        :param context: The bundle context registering the listener
+        :param listener: The listener to register
+        :param ldap_filter: An LDAP filter on the service properties
+        :param specification: The specification of the services to listen to
+        :return: True if the listener has been registered
+        """
+        bridge = _ListenerBridge(self, listener)
+        with self.__lock:
+            if (context, listener) in self.__bridges:
+                return False
+
+            self.__bridges[(context, listener)] = bridge
+
+        return context.add_service_listener(bridge, ldap_filter,
+                                            specification)
+
+
+    def remove_service_listener(self, context, listener):
+        """
+        Unregisters a service listener registered with add_service_listener()
+
+        :param context: The bundle context which registered the listener
+        :param listener: The listener to unregister
+        :return: True if the listener has been unregistered
+        """
+        with self.__lock:
+            bridge = self.__bridges.pop((context, listener), None)
+
+        if bridge is None:
+            return False
+
+        return context.remove_service_listener(bridge)
+
+
+    def _create_task(self, coroutine):
+        """
+        Schedules a coroutine in the event loop, logging its exception.
+        Must be called in the event loop.
+
+        :param coroutine: A coroutine object
+        :return: An asyncio.Task object
+        """
+        task = self.__loop.create_task(coroutine)
+        task.add_done_callback(self.__log_error)
+        return task
+
+
+    @staticmethod
+    def __log_error(task):
+        """
+        Logs the exception of a finished task
+        """
+        if not task.cancelled() and task.exception() is not None:
+            _logger.error("Error in a coroutine: %s", task.exception(),
+                          exc_info=task.exception())
+
+
+    @staticmethod
+    def __run(loop):
+        """
+        The event loop thread
+        """
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_forever()
+
+            # Cancel the remaining tasks
+            try:
+                # Python 3.7+
+                tasks = asyncio.all_tasks(loop)
+
+            except AttributeError:
+                tasks = asyncio.Task.all_tasks(loop)
+
+            for task in tasks:
+                task.cancel()
+
+            if tasks:
+                loop.run_until_complete(asyncio.gather(*tasks,
+                                                       return_exceptions=True))
+
+        finally:
+            loop.close()
+
+#-------------------------------------------------------------------------------
+
+class _Activator(object):
+    """
+    The bundle activator
+    """
+    def __init__(self):
+        """
+        Sets up members
+        """
+        self._service = None
+        self._registration = None
+
+
+    def start(self, context):
+        """
+        The bundle has started
+
+        :param context: The bundle context
+        """
+        self._service = EventLoopService()
+        self._service.start()
+        self._registration = context.register_service(
+                                services.SERVICE_EVENT_LOOP, self._service, {})
+
+
+    def stop(self, context):
+        """
+        The bundle has stopped
+
+        :param context: The bundle context
+        """
+        self._registration.unregister()
+        self._registration = None
+
+        self._service.stop()
+        self._service = None
+
+# ------------------------------------------------------------------------------
+
+# The activator instance
+activator = _Activator()
@@ -0,0 +1,564 @@
+#!/usr/bin/env python
+# -- Content-Encoding: UTF-8 --
+"""
+Shared executor service for Pelix: executes the tasks of named and weighted
+sub-queues in a single elastic thread pool.
+
+Components get a queue from the executor service instead of creating their
+own thread pool. The total number of threads is limited by the executor, and
+each queue can limit the number of its tasks executed concurrently. When the
+pool is saturated, the next task is taken from the queues according to their
+weight.
+
+:author: Thomas Calmant
+:copyright: Copyright 2013, isandlaTech
+:license: Apache License 2.0
+:version: 0.1
+:status: Beta
+
+..
+
+    Copyright 2013 isandlaTech
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Module version
+__version_info__ = (0, 1, 0)
+__version__ = ".".join(str(x) for x in __version_info__)
+
+# Documentation strings format
+__docformat__ = "restructuredtext en"
+
+#-------------------------------------------------------------------------------
+
+# Pelix
+import pelix.services as services
+import pelix.threadpool
+
+# Standard library
+import collections
+import logging
+import threading
+import time
+
+#-------------------------------------------------------------------------------
+
+_logger = logging.getLogger(__name__)
+
+#-------------------------------------------------------------------------------
+
+class ExecutorQueue(object):
+    """
+    A sub-queue of the executor. It has the same methods as a ThreadPool, so
+    that it can replace a private pool: tasks can be enqueued before the queue
+    is started, and stopping it empties it.
+    """
+    def __init__(self, executor, name, weight, max_concurrency):
+        """
+        Sets up the queue
+
+        :param executor: The Executor running the tasks
+        :param name: Name of the queue
+        :param weight: Weight of the queue
+        :param max_concurrency: Maximum number of tasks executed concurrently
+                                (0 for no limit)
+        """
+        self.name = name
+        self.weight = weight
+        self.max_concurrency = max_concurrency
+
+        self.__executor = executor
+        self.__condition = executor._condition
+
+        # Pending tasks: (method, args, kwargs, future)
+        self._tasks = collections.deque()
+        self._running = 0
+        self._executed = 0
+        self._active = False
+
+        # Current weight, for the weighted round-robin
+        self._current_weight = 0
+
+        # Private pool, used once the executor has been stopped
+        self._pool = None
+
+
+    def __str__(self):
+        """
+        String representation
+        """
+        return "ExecutorQueue({0}, weight={1}, max_concurrency={2})" \
+               .format(self.name, self.weight, self.max_concurrency)
+
+
+    def start(self):
+        """
+        Starts executing the tasks of the queue
+        """
+        with self.__condition:
+            if self._pool is None and not self._active:
+                if self.__executor._add_queue(self):
+                    self._active = True
+                    return
+
+                # Stopped executor
+                self._detach()
+
+            if self._pool is not None:
+                self._pool.start()
+
+
+    def stop(self):
+        """
+        Stops the queue: removes its pending tasks and waits for those being
+        executed
+        """
+        with self.__condition:
+            if self._pool is not None:
+                self._pool.stop()
+                return
+
+            self._active = False
+
+        self.__executor._remove_queue(self)
+        self.clear()
+
+
+    def enqueue(self, method, *args, **kwargs):
+        """
+        Enqueues a task
+
+        :param method: Method to call
+        :return: A FutureResult object, to get the result of the task
+        :raise ValueError: Invalid method
+        """
+        if not hasattr(method, '__call__'):
+            raise ValueError("{0} has no __call__ member." \
+                             .format(method))
+
+        future = pelix.threadpool.FutureResult()
+        with self.__condition:
+            if self._pool is not None:
+                # Executor stopped
+                self._pool.enqueue(self.__executor._execute,
+                                   method, args, kwargs, future)
+                return future
+
+            self._tasks.append((method, args, kwargs, future))
+            active = self._active
+
+        if active:
+            self.__executor._submit()
+
+        return future
+
+
+    def enqueue_many(self, method, arguments, fire_and_forget=False):
+        """
+        Enqueues a batch of calls to the same method
+
+        :param method: Method to call
+        :param arguments: An iterable of positional arguments tuples, one per
+                          task
+        :param fire_and_forget: If True, don't create FutureResult objects
+        :return: The list of the FutureResult objects of the tasks, or None in
+                 fire-and-forget mode
+        :raise ValueError: Invalid method
+        """
+        if not hasattr(method, '__call__'):
+            raise ValueError("{0} has no __call__ member." \
+                             .format(method))
+
+        if fire_and_forget:
+            futures = None
+            tasks = [(method, args, {}, None) for args in arguments]
+
+        else:
+            futures = []
+            tasks = []
+            for args in arguments:
+                future = pelix.threadpool.FutureResult()
+                futures.append(future)
+                tasks.append((method, args, {}, future))
+
+        with self.__condition:
+            if self._pool is not None:
+                # Executor stopped
+                for task in tasks:
+                    self._pool.enqueue(self.__executor._execute, *task)
+                return futures
+
+            self._tasks.extend(tasks)
+            active = self._active
+
+        if active and tasks:
+            self.__executor._submit(len(tasks))
+
+        return futures
+
+
+    def clear(self):
+        """
+        Empties the queue and waits for the tasks being executed
+        """
+        with self.__condition:
+            if self._pool is not None:
+                self._pool.clear()
+                return
+
+            self._tasks.clear()
+            while self._running:
+                self.__condition.wait()
+
+
+    def join(self, timeout=None):
+        """
+        Waits for all the tasks of the queue to be executed
+
+        :param timeout: Maximum time to wait (in seconds)
+        :return: True if the queue has been emptied, else False
+        """
+        with self.__condition:
+            if self._pool is not None:
+                return self._pool.join(timeout)
+
+            if timeout is not None:
+                deadline = time.time() + timeout
+
+            while self._tasks or self._running:
+                if timeout is None:
+                    self.__condition.wait()
+
+                else:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        return False
+
+                    self.__condition.wait(remaining)
+
+            return True
+
+
+    def get_stats(self):
+        """
+        Returns the state of the queue
+
+        :return: A dictionary with the name, weight and concurrency limit of
+                 the queue, its number of pending ("queued"), running and
+                 executed tasks
+        """
+        with self.__condition:
+            return {"name": self.name,
+                    "weight": self.weight,
+                    "max_concurrency": self.max_concurrency,
+                    "queued": len(self._tasks),
+                    "running": self._running,
+                    "executed": self._executed}
+
+
+    def _detach(self):
+        """
+        Moves the pending tasks to a private pool, as the executor is being
+        stopped. The caller must hold the executor condition.
+        """
+        self._pool = pelix.threadpool.ThreadPool(
+                                    self.max_concurrency or 1,
+                                    logname="{0}-detached".format(self.name))
+        while self._tasks:
+            self._pool.enqueue(self.__executor._execute, *self._tasks.popleft())
+
+        if self._active:
+            self._active = False
+            self._pool.start()
+
+#-------------------------------------------------------------------------------
+
+class Executor(object):
+    """
+    Executes the tasks of its queues in a shared elastic thread pool
+    """
+    def __init__(self, max_threads=10, min_threads=0, timeout=60,
+                 logname=None):
+        """
+        Sets up the executor
+
+        :param max_threads: Maximum number of threads
+        :param min_threads: Number of threads kept when idle
+        :param timeout: Keep-alive time of idle threads (in seconds)
+        :param logname: Name of the logger of the pool
+        :raise ValueError: Invalid number of threads
+        """
+        self._condition = threading.Condition()
+        self.__pool = pelix.threadpool.ThreadPool(max_threads, timeout=timeout,
+                                                  logname=logname,
+                                                  min_threads=min_threads)
+
+        # Started queues
+        self.__queues = []
+        self.__running = False
+
+
+    def start(self):
+        """
+        Starts the executor
+        """
+        with self._condition:
+            self.__running = True
+            self.__pool.start()
+
+
+    def stop(self):
+        """
+        Stops the executor. The queues still in use are given a private pool.
+        """
+        with self._condition:
+            self.__running = False
+            for queue in self.__queues:
+                _logger.debug("Executor stopped: detaching %s", queue)
+                queue._detach()
+
+            del self.__queues[:]
+
+        self.__pool.stop()
+
+
+    def get_queue(self, name, weight=1, max_concurrency=0):
+        """
+        Creates a new queue. The queue must be started before its tasks are
+        executed.
+
+        :param name: Name of the queue, for statistics and logs
+        :param weight: Weight of the queue, relatively to the other ones
+                       (strictly positive integer)
+        :param max_concurrency: Maximum number of tasks of this queue executed
+                                concurrently (0 for the size of the pool)
+        :return: An ExecutorQueue object
+        :raise ValueError: Invalid weight or concurrency
+        """
+        if type(weight) is not int or weight < 1:
+            raise ValueError("Invalid queue weight: {0}".format(weight))
+
+        if type(max_concurrency) is not int or max_concurrency < 0:
+            raise ValueError("Invalid queue concurrency: {0}"
+                             .format(max_concurrency))
+
+        queue = ExecutorQueue(self, name, weight, max_concurrency)
+        return queue
+
+
+    def get_stats(self):
+        """
+        Returns the state of the executor
+
+        :return: A dictionary with the statistics of the pool ("pool") and the
+                 list of those of the started queues ("queues")
+        """
+        with self._condition:
+            queues = self.__queues[:]
+
+        return {"pool": self.__pool.get_stats(),
+                "queues": [queue.get_stats() for queue in queues]}
+
+
+    def _add_queue(self, queue):
+        """
+        Adds a started queue, and submits the tasks enqueued before
+
+        :param queue: An ExecutorQueue
+        :return: False if the executor is stopped
+        """
+        with self._condition:
+            if not self.__running:
+                return False
+
+            self.__queues.append(queue)
+            if queue._tasks:
+                self._submit(len(queue._tasks))
+
+            return True
+
+
+    def _remove_queue(self, queue):
+        """
+        Removes a stopped queue
+
+        :param queue: An ExecutorQueue
+        """
+        with self._condition:
+            try:
+                self.__queues.remove(queue)
+
+            except ValueError:
+                # Unknown queue
+                pass
+
+
+    def _submit(self, count=1):
+        """
+        Asks the pool to execute the next task(s)
+
+        :param count: Number of tasks to execute
+        """
+        if count == 1:
+            self.__pool.enqueue(self.__run_next)
+
+        else:
+            self.__pool.enqueue_many(self.__run_next, [()] * count,
+                                     fire_and_forget=True)
+
+
+    def _execute(self, method, args, kwargs, future):
+        """
+        Executes a task, logging its exception
+
+        :param method: Method to call
+        :param args: Method arguments
+        :param kwargs: Method keyword arguments
+        :param future: The FutureResult of the task (None in fire-and-forget
+                       mode)
+        """
+        try:
+            if future is None:
+                method(*args, **kwargs)
+
+            else:
+                future.execute(method, args, kwargs)
+
+        except Exception as ex:
+            _logger.exception("Error executing %s: %s", method.__name__, ex)
+
+
+    def __select(self):
+        """
+        Selects the queue of the next task, with a smooth weighted round-robin
+        among the queues with pending tasks and under their concurrency limit.
+        The caller must hold the condition.
+
+        :return: An ExecutorQueue, or None
+        """
+        selected = None
+        total = 0
+        for queue in self.__queues:
+            if not queue._tasks or (queue.max_concurrency
+                                    and queue._running >= queue.max_concurrency):
+                continue
+
+            queue._current_weight += queue.weight
+            total += queue.weight
+            if selected is None \
+                    or queue._current_weight > selected._current_weight:
+                selected = queue
+
+        if selected is not None:
+            selected._current_weight -= total
+
+        return selected
+
+
+    def __run_next(self):
+        """
+        Executes the next task (called by the pool)
+        """
+        with self._condition:
+            queue = self.__select()
+            if queue is None:
+                # Nothing to do: the remaining tasks belong to queues at their
+                # concurrency limit, a new task will be submitted when one of
+                # their tasks ends.
+                return
+
+            task = queue._tasks.popleft()
+            queue._running += 1
+
+        try:
+            self._execute(*task)
+
+        finally:
+            with self._condition:
+                queue._running -= 1
+                queue._executed += 1
+                resubmit = queue._active and queue._tasks \
+                           and queue._pool is None
+                self._condition.notify_all()
+
+            if resubmit:
+                self._submit()
+
+#-------------------------------------------------------------------------------
+
+class _Activator(object):
+    """
+    The bundle activator
+    """
+    def __init__(self):
+        """
+        Sets up members
+        """
+        self._executor = None
+        self._registration = None
+
+
+    @staticmethod
+    def __get_int_property(context, name, default):
+        """
+        Returns the value of an integer framework property
+
+        :param context: The bundle context
+        :param name: Name of the property
+        :param default: Default value
+        :return: The value of the property, or the default one
+        """
+        try:
+            return int(context.get_property(name))
+
+        except (TypeError, ValueError):
+            return default
+
+
+    def start(self, context):
+        """
+        The bundle has started
+
+        :param context: The bundle context
+        """
+        max_threads = self.__get_int_property(
+                                context, services.PROP_EXECUTOR_MAX_THREADS, 10)
+        min_threads = self.__get_int_property(
+                                context, services.PROP_EXECUTOR_MIN_THREADS, 0)
+
+        self._executor = Executor(max_threads, min_threads,
+                                  logname="pelix-executor")
+        self._executor.start()
+        self._registration = context.register_service(
+                                services.SERVICE_EXECUTOR, self._executor,
+                                {services.PROP_EXECUTOR_MAX_THREADS:
+                                 max_threads})
+
+
+    def stop(self, context):
+        """
+        The bundle has stopped
+
+        :param context: The bundle context
+        """
+        self._registration.unregister()
+        self._registration = None
+
+        self._executor.stop()
+        self._executor = None
+
+# ------------------------------------------------------------------------------
+
+# The activator instance
+activator = _Activator()
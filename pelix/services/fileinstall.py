@@ -58,6 +58,7 @@ _logger = logging.getLogger(__name__)
 @Provides(services.SERVICE_FILEINSTALL)
 @Requires('_listeners', services.SERVICE_FILEINSTALL_LISTENERS,
           aggregate=True, optional=True)
+@Requires('_executor', services.SERVICE_EXECUTOR, optional=True)
 @Property('_poll_time', 'poll.time', 1)
 @Instantiate('pelix-services-file-install')
 class FileInstall(object):
@@ -80,9 +81,11 @@ class FileInstall(object):
         # Lock
         self.__lock = threading.RLock()
 
+        # Shared executor (injected, optional)
+        self._executor = None
+
         # Single thread task pool to notify listeners
-        self.__pool = pelix.threadpool.ThreadPool(1,
-                                                  logname="FileInstallNotifier")
+        self.__pool = None
 
         # 1 thread per watched folder (folder -> Thread)
         self.__threads = {}
@@ -100,6 +103,15 @@ class FileInstall(object):
         Component validated
         """
         with self.__lock:
+            if self._executor is not None:
+                # Use a queue of the shared executor
+                self.__pool = self._executor.get_queue("fileinstall",
+                                                       max_concurrency=1)
+
+            else:
+                self.__pool = pelix.threadpool.ThreadPool(
+                                        1, logname="FileInstallNotifier")
+
             # Start the task pool
             self.__pool.start()
 
@@ -126,6 +138,7 @@ class FileInstall(object):
 
             # Stop the task pool
             self.__pool.stop()
+            self.__pool = None
 
             # Clean up
             self.__stoppers.clear()
@@ -0,0 +1,305 @@
+#!/usr/bin/env python
+# -- Content-Encoding: UTF-8 --
+"""
+Process pool executor service for Pelix: executes CPU-bound tasks in worker
+processes, to avoid the limits of the GIL.
+
+Tasks and their results must be picklable: methods must be defined at the
+top level of a module. The worker processes import the modules of the bundles
+given at the creation of the pool before executing their first task. Large
+payloads can be shared with the workers in shared memory buffers
+(Python 3.8+).
+
+:author: Thomas Calmant
+:copyright: Copyright 2013, isandlaTech
+:license: Apache License 2.0
+:version: 0.1
+:status: Beta
+
+..
+
+    Copyright 2013 isandlaTech
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+# Module version
+__version_info__ = (0, 1, 0)
+__version__ = ".".join(str(x) for x in __version_info__)
+
+# Documentation strings format
+__docformat__ = "restructuredtext en"
+
+#-------------------------------------------------------------------------------
+
+# Pelix
+from pelix.utilities import is_string
+import pelix.services as services
+import pelix.threadpool
+
+# Standard library
+import concurrent.futures
+import importlib
+import logging
+import multiprocessing
+import threading
+
+try:
+    # Python 3.8+
+    from multiprocessing import shared_memory
+
+except ImportError:
+    shared_memory = None
+
+#-------------------------------------------------------------------------------
+
+_logger = logging.getLogger(__name__)
+
+#-------------------------------------------------------------------------------
+
+def _warm_up(modules):
+    """
+    Imports the given modules in a worker process
+
+    :param modules: Names of the modules to import
+    """
+    for name in modules:
+        try:
+            importlib.import_module(name)
+
+        except ImportError as ex:
+            _logger.error("Error importing %s in a worker process: %s",
+                          name, ex)
+
+
+class ProcessExecutor(object):
+    """
+    Executes picklable tasks in a pool of processes
+    """
+    def __init__(self, processes=None, bundles=None, start_method=None):
+        """
+        Sets up the executor
+
+        :param processes: Number of worker processes (number of CPUs if None)
+        :param bundles: Names of the bundles (modules) imported by the workers
+                        before their first task
+        :param start_method: Start method of the processes ("fork", "spawn",
+                             ...), None for the platform default
+        :raise ValueError: Invalid number of processes or start method
+        """
+        if processes is not None \
+                and (type(processes) is not int or processes < 1):
+            raise ValueError("Invalid number of processes: {0}"
+                             .format(processes))
+
+        self.__processes = processes or multiprocessing.cpu_count()
+        self.__bundles = tuple(bundles or ())
+        self.__context = multiprocessing.get_context(start_method)
+
+        self.__pool = None
+        self.__lock = threading.Lock()
+        self.__pending = 0
+
+        # Name -> SharedMemory
+        self.__buffers = {}
+
+
+    def start(self):
+        """
+        Starts the pool of processes. Does nothing if it is already started.
+        """
+        with self.__lock:
+            if self.__pool is None:
+                self.__pool = concurrent.futures.ProcessPoolExecutor(
+                                        self.__processes, self.__context,
+                                        _warm_up, (self.__bundles,))
+
+
+    def stop(self):
+        """
+        Stops the pool of processes, once the pending tasks are done, and
+        releases the shared memory buffers
+        """
+        with self.__lock:
+            pool = self.__pool
+            self.__pool = None
+            buffers = list(self.__buffers.values())
+            self.__buffers.clear()
+
+        if pool is not None:
+            pool.shutdown(True)
+
+        for buffer in buffers:
+            self.__release(buffer)
+
+
+    def enqueue(self, method, *args, **kwargs):
+        """
+        Executes a task in a worker process
+
+        :param method: Method to call (must be picklable)
+        :return: A FutureResult object, to get the result of the task
+        :raise ValueError: Invalid method or stopped pool
+        """
+        if not hasattr(method, '__call__'):
+            raise ValueError("{0} has no __call__ member." \
+                             .format(method))
+
+        with self.__lock:
+            if self.__pool is None:
+                raise ValueError("The process pool is not running")
+
+            future = self.__pool.submit(method, *args, **kwargs)
+            self.__pending += 1
+
+        future.add_done_callback(self.__task_done)
+        return pelix.threadpool.FutureResult.from_concurrent(future)
+
+
+    def create_buffer(self, size=0, data=None):
+        """
+        Creates a shared memory buffer, which can be given as argument to the
+        tasks: workers access the same memory through its ``buf`` member.
+        The buffer is released by release_buffer() or when the pool stops.
+
+        :param size: Size of the buffer, in bytes
+        :param data: Bytes to copy in the buffer (its size is used if greater
+                     than the given one)
+        :return: A multiprocessing.shared_memory.SharedMemory object
+        :raise ValueError: Invalid size
+        :raise NotImplementedError: Shared memory is not available
+        """
+        if shared_memory is None:
+            raise NotImplementedError("Shared memory requires Python 3.8+")
+
+        if data is not None:
+            size = max(size, len(data))
+
+        buffer = shared_memory.SharedMemory(create=True, size=size)
+        if data is not None:
+            buffer.buf[:len(data)] = data
+
+        with self.__lock:
+            self.__buffers[buffer.name] = buffer
+
+        return buffer
+
+
+    def release_buffer(self, buffer):
+        """
+        Releases a shared memory buffer created by this executor
+
+        :param buffer: A SharedMemory object
+        """
+        with self.__lock:
+            buffer = self.__buffers.pop(buffer.name, None)
+
+        if buffer is not None:
+            self.__release(buffer)
+
+
+    def get_stats(self):
+        """
+        Returns the state of the executor
+
+        :return: A dictionary with the number of processes, of tasks not yet
+                 done ("pending") and of shared memory buffers
+        """
+        with self.__lock:
+            return {"processes": self.__processes,
+                    "pending": self.__pending,
+                    "buffers": len(self.__buffers)}
+
+
+    def __task_done(self, _):
+        """
+        A task is done
+        """
+        with self.__lock:
+            self.__pending -= 1
+
+
+    @staticmethod
+    def __release(buffer):
+        """
+        Closes and destroys a shared memory buffer
+
+        :param buffer: A SharedMemory object
+        """
+        try:
+            buffer.close()
+            buffer.unlink()
+
+        except (OSError, BufferError) as ex:
+            _logger.warning("Error releasing shared memory %s: %s",
+                            buffer.name, ex)
+
+#-------------------------------------------------------------------------------
+
+class _Activator(object):
+    """
+    The bundle activator
+    """
+    def __init__(self):
+        """
+        Sets up members
+        """
+        self._executor = None
+        self._registration = None
+
+
+    def start(self, context):
+        """
+        The bundle has started
+
+        :param context: The bundle context
+        """
+        try:
+            processes = int(context.get_property(
+                                    services.PROP_PROCESS_EXECUTOR_PROCESSES))
+
+        except (TypeError, ValueError):
+            processes = None
+
+        bundles = context.get_property(services.PROP_PROCESS_EXECUTOR_BUNDLES)
+        if is_string(bundles):
+            bundles = [name.strip() for name in bundles.split(',')
+                       if name.strip()]
+
+        self._executor = ProcessExecutor(
+                processes, bundles,
+                context.get_property(services.PROP_PROCESS_EXECUTOR_METHOD))
+        self._executor.start()
+        self._registration = context.register_service(
+                                services.SERVICE_PROCESS_EXECUTOR,
+                                self._executor,
+                                {services.PROP_PROCESS_EXECUTOR_PROCESSES:
+                                 self._executor.get_stats()["processes"]})
+
+
+    def stop(self, context):
+        """
+        The bundle has stopped
+
+        :param context: The bundle context
+        """
+        self._registration.unregister()
+        self._registration = None
+
+        self._executor.stop()
+        self._executor = None
+
+# ------------------------------------------------------------------------------
+
+# The activator instance
+activator = _Activator()
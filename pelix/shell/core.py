@@ -416,6 +416,9 @@ class Shell(object):
         self.register_command(None, "threads", self.threads_list)
         self.register_command(None, "thread", self.thread_details)
 
+        self.register_command(None, "locks", self.locks_list)
+        self.register_command(None, "lock", self.lock_details)
+
         self.register_command(None, "help", self.print_help)
         self.register_command(None, "?", self.print_help)
 
@@ -1103,6 +1106,91 @@ class Shell(object):
         io_handler.write('\n'.join(lines))
 
 
+    def __get_lock_profiler(self, io_handler):
+        """
+        Retrieves the locks profiler of the framework, or prints a message if
+        the profiling is not activated
+
+        :param io_handler: I/O handler
+        :return: The LockProfiler object, or None
+        """
+        profiler = self._context.get_bundle(0).get_lock_profiler()
+        if profiler is None:
+            io_handler.write_line("Locks profiling is not activated (set the "
+                                  "{0} framework property)",
+                                  constants.LOCKS_PROFILING)
+
+        return profiler
+
+
+    def locks_list(self, io_handler, action=None):
+        """
+        Lists the statistics of the profiled locks ("locks reset" to reset them)
+        """
+        profiler = self.__get_lock_profiler(io_handler)
+        if profiler is None:
+            return
+
+        if action == "reset":
+            profiler.reset()
+            io_handler.write_line("Locks statistics reset")
+            return
+
+        elif action is not None:
+            io_handler.write_line("Unknown action: {0}", action)
+            return
+
+        headers = ('Name', 'Instances', 'Acquisitions', 'Contentions',
+                   'Wait total (ms)', 'Wait max (ms)', 'Hold total (ms)',
+                   'Hold max (ms)', 'Holders')
+
+        snapshot = profiler.snapshot()
+        lines = [(name, stats['instances'], stats['acquisitions'],
+                  stats['contentions'],
+                  '{0:.3f}'.format(stats['wait_total'] * 1000),
+                  '{0:.3f}'.format(stats['wait_max'] * 1000),
+                  '{0:.3f}'.format(stats['hold_total'] * 1000),
+                  '{0:.3f}'.format(stats['hold_max'] * 1000),
+                  len(stats['holders']))
+                 for name, stats in sorted(snapshot.items())]
+
+        io_handler.write(self._utils.make_table(headers, lines))
+
+
+    def lock_details(self, io_handler, name):
+        """
+        Prints the current holders of the profiled locks with the given name,
+        and the stack of their longest hold
+        """
+        profiler = self.__get_lock_profiler(io_handler)
+        if profiler is None:
+            return
+
+        try:
+            stats = profiler.snapshot()[name]
+
+        except KeyError:
+            io_handler.write_line("Unknown lock: {0}", name)
+            return
+
+        lines = []
+        lines.append("Lock: {0}".format(name))
+        lines.append("Longest hold: {0:.3f} ms, acquired at:"
+                     .format(stats['hold_max'] * 1000))
+        lines.extend(stats['hold_max_stack'] or ["\tn/a"])
+
+        lines.append("Current holders:")
+        for holder in stats['holders']:
+            lines.append("Thread: {0}".format(holder['thread']))
+            lines.extend(holder['stack'])
+
+        if not stats['holders']:
+            lines.append("\tn/a")
+
+        lines.append("")
+        io_handler.write('\n'.join(lines))
+
+
     def quit(self, io_handler):
         """
         Stops the current shell session (raises a KeyboardInterrupt exception)
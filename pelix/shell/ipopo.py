@@ -46,6 +46,7 @@ from pelix.ipopo.constants import IPOPO_SERVICE_SPECIFICATION
 # Shell constants
 from pelix.shell import SHELL_COMMAND_SPEC, SHELL_UTILS_SERVICE_SPEC
 
+import json
 import logging
 
 # ------------------------------------------------------------------------------
@@ -64,11 +65,98 @@ def ipopo_state_to_str(state):
     ipopo_states = {0: "INVALID",
                     1:"VALID",
                     2:"KILLED",
-                    3:"VALIDATING"
+                    3:"VALIDATING",
+                    4:"LAZY",
+                    5:"INVALIDATING",
+                    6:"ERRONEOUS"
     }
 
     return ipopo_states.get(state, "Unknown state (%d)".format(state))
 
+
+def graph_to_dot(graph):
+    """
+    Converts a graph computed by the iPOPO service get_dependency_graph()
+    method to the Graphviz DOT format.
+
+    Components are linked to the providers of the services they are bound to
+    (plain edges, labeled with the injected field and the bind count) or that
+    match their requirements (dashed edges). Unsatisfied mandatory
+    requirements point to a red "missing" node.
+
+    :param graph: A dependency graph dictionary
+    :return: The DOT representation of the graph
+    """
+    colors = {0: "red", 1: "green", 2: "gray", 3: "orange", 4: "blue",
+              5: "orange", 6: "darkred"}
+
+    def quote(value):
+        """
+        Returns the given value as a DOT string
+        """
+        return '"{0}"'.format(str(value).replace('"', '\\"'))
+
+    def target(svc):
+        """
+        Returns the node associated to the given service
+        """
+        if svc["provider"] is not None:
+            return quote(svc["provider"])
+
+        return quote("service-{0}".format(svc["service"]))
+
+    lines = ["digraph ipopo {", "\tnode [shape=box];"]
+
+    # Services provided by bundles, not by components
+    for svc in graph["services"]:
+        if svc["provider"] is None:
+            lines.append("\t{0} [shape=ellipse, label={1}];".format(
+                         quote("service-{0}".format(svc["id"])),
+                         quote("{0}\\nbundle {1}".format(
+                               ", ".join(svc["specifications"]),
+                               svc["bundle_id"]))))
+
+    for node in graph["instances"]:
+        name = node["name"]
+        label = "{0}\\n{1}\\n{2} ({3:.3f} ms)".format(
+                            name, node["factory"],
+                            ipopo_state_to_str(node["state"]),
+                            node["validation_time"] * 1000)
+        lines.append("\t{0} [label={1}, color={2}];".format(
+                     quote(name), quote(label),
+                     colors.get(node["state"], "black")))
+
+        for req in node["requirements"]:
+            bound = set()
+            for binding in req["bindings"]:
+                bound.add(binding["service"])
+                lines.append("\t{0} -> {1} [label={2}];".format(
+                             quote(name), target(binding),
+                             quote("{0} (x{1})".format(req["field"],
+                                                       binding["count"]))))
+
+            for candidate in req["candidates"]:
+                if candidate["service"] not in bound \
+                and candidate["provider"] != name:
+                    lines.append("\t{0} -> {1} [label={2}, style=dashed];"
+                                 .format(quote(name), target(candidate),
+                                         quote(req["field"])))
+
+            if not req["candidates"] and not req["optional"]:
+                # Missing requirement
+                missing = quote("missing-{0}-{1}".format(name, req["field"]))
+                lines.append("\t{0} [label={1}, color=red, shape=octagon];"
+                             .format(missing,
+                                     quote("{0}\\n{1}".format(
+                                           req["specification"],
+                                           req["filter"] or ""))))
+                lines.append("\t{0} -> {1} [label={2}, color=red, "
+                             "style=dashed];".format(quote(name), missing,
+                                                     quote(req["field"])))
+
+    lines.append("}")
+    return "\n".join(lines)
+
 # ------------------------------------------------------------------------------
 
 @ComponentFactory("ipopo-shell-commands-factory")
@@ -105,6 +193,8 @@ class IPopoCommands(object):
                 ("instance", self.instance_details),
                 ("instantiate", self.instantiate),
                 ("kill", self.kill),
+                ("retry", self.retry_erroneous),
+                ("graph", self.graph),
                 ]
 
 
@@ -264,3 +354,34 @@ class IPopoCommands(object):
 
         except ValueError as ex:
             io_handler.write_line("Invalid parameter: {0}", ex)
+
+
+    def retry_erroneous(self, io_handler, name):
+        """
+        Tries to validate again an erroneous component instance
+        """
+        try:
+            state = self._ipopo.retry_erroneous(name)
+            io_handler.write_line("Component '{0}' is now {1}.", name,
+                                  ipopo_state_to_str(state))
+
+        except ValueError as ex:
+            io_handler.write_line("Invalid parameter: {0}", ex)
+
+
+    def graph(self, io_handler, output_format="dot"):
+        """
+        Prints the graph of components and services, in DOT or JSON format
+        """
+        graph = self._ipopo.get_dependency_graph()
+
+        output_format = output_format.lower()
+        if output_format == "dot":
+            io_handler.write_line("{0}", graph_to_dot(graph))
+
+        elif output_format == "json":
+            io_handler.write_line("{0}", json.dumps(graph, indent=2,
+                                                    sort_keys=True))
+
+        else:
+            io_handler.write_line("Unknown output format: {0}", output_format)
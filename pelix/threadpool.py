@@ -36,8 +36,11 @@ __version__ = ".".join(str(x) for x in __version_info__)
 # ------------------------------------------------------------------------------
 
 # Standard library
+import heapq
+import itertools
 import logging
 import threading
+import time
 
 try:
     # Python 3
@@ -47,30 +50,64 @@ except ImportError:
     # Python 2
     import Queue as queue
 
+try:
+    # Python 3.2+ (or the "futures" back-port)
+    from concurrent.futures import CancelledError
+
+except ImportError:
+    class CancelledError(Exception):
+        """
+        The job has been cancelled
+        """
+        pass
+
+# ------------------------------------------------------------------------------
+
+_logger = logging.getLogger(__name__)
+
 # ------------------------------------------------------------------------------
 
 class FutureResult(object):
     """
     An object to wait for the result of a threaded execution
     """
+    __slots__ = ('_done_event', '_result', '_exception', '_expired',
+                 '_cancelled', '_running', '__callbacks', '__lock')
+
     def __init__(self):
         """
         Sets up the FutureResult object
         """
         self._done_event = threading.Event()
         self._result = None
+        self._exception = None
+        self._expired = False
+        self._cancelled = False
+        self._running = False
+
+        # Callbacks to call once done (None once called)
+        self.__callbacks = []
+        self.__lock = threading.Lock()
 
 
     def execute(self, method, args, kwargs):
         """
         Execute the given method and stores its result.
-        The result is considered "done" even if the method raises an exception
+        The result is considered "done" even if the method raises an exception.
+        Does nothing if the job has been cancelled.
 
         :param method: The method to execute
         :param args: Method positional arguments
         :param kwargs: Method keyword arguments
         :raise Exception: The exception raised by the method
         """
+        with self.__lock:
+            if self._done_event.is_set():
+                # Cancelled job
+                return
+
+            self._running = True
+
         # Normalize arguments
         if args is None:
             args = []
@@ -82,9 +119,76 @@ class FutureResult(object):
             # Call the method
             self._result = method(*args, **kwargs)
 
+        except Exception as ex:
+            # Keep the exception for result() and exception()
+            self._exception = ex
+            raise
+
         finally:
             # Mark the action as executed
-            self._done_event.set()
+            self.__set_done()
+
+
+    def expire(self):
+        """
+        Marks the job as done without having been executed, as it stayed in
+        the queue after its deadline
+        """
+        with self.__lock:
+            if self._done_event.is_set() or self._running:
+                return
+
+            self._expired = True
+
+        self.__set_done()
+
+
+    def cancel(self):
+        """
+        Cancels the job if it hasn't been started yet
+
+        :return: True if the job has been cancelled
+        """
+        with self.__lock:
+            if self._cancelled:
+                return True
+
+            elif self._done_event.is_set() or self._running:
+                return False
+
+            self._cancelled = True
+
+        self.__set_done()
+        return True
+
+
+    def add_done_callback(self, method):
+        """
+        Adds a method to call with this object as argument once the job is
+        done. The method is called immediately if the job is already done.
+
+        :param method: A method accepting a FutureResult as argument
+        """
+        with self.__lock:
+            if self.__callbacks is not None:
+                self.__callbacks.append(method)
+                return
+
+        self.__notify(method)
+
+
+    def cancelled(self):
+        """
+        Returns True if the job has been cancelled
+        """
+        return self._cancelled
+
+
+    def running(self):
+        """
+        Returns True if the job is being executed
+        """
+        return self._running
 
 
     def done(self):
@@ -94,38 +198,328 @@ class FutureResult(object):
         return self._done_event.is_set()
 
 
+    def expired(self):
+        """
+        Returns True if the job has been dropped after its deadline
+        """
+        return self._expired
+
+
+    def exception(self, timeout=None):
+        """
+        Waits up to timeout for the end of the threaded job and returns the
+        exception it raised
+
+        :param timeout: The maximum time to wait (in seconds)
+        :return: The exception raised by the job, or None
+        :raise OSError: The timeout raised before the job finished
+        :raise CancelledError: The job has been cancelled
+        """
+        if not self._done_event.wait(timeout) \
+                and not self._done_event.is_set():
+            raise OSError("Timeout raised")
+
+        if self._cancelled:
+            raise CancelledError()
+
+        return self._exception
+
+
     def result(self, timeout=None):
         """
         Waits up to timeout for the result the threaded job.
         Returns immediately the result if the job has already been done.
 
         :param timeout: The maximum time to wait for a result (in seconds)
+        :return: The result of the job (None if it expired)
         :raise OSError: The timeout raised before the job finished
+        :raise CancelledError: The job has been cancelled
+        :raise Exception: The exception raised by the job
+        """
+        exception = self.exception(timeout)
+        if exception is not None:
+            raise exception
+
+        return self._result
+
+
+    def to_concurrent(self):
+        """
+        Returns a concurrent.futures.Future object which will get the result,
+        the exception or the cancellation of this job
+
+        :return: A concurrent.futures.Future object
+        :raise ImportError: concurrent.futures is not available
+        """
+        import concurrent.futures
+        future = concurrent.futures.Future()
+
+        def propagate(_):
+            """
+            Copies the outcome of the job to the concurrent future
+            """
+            if self._cancelled:
+                future.cancel()
+
+            elif future.set_running_or_notify_cancel():
+                if self._exception is not None:
+                    future.set_exception(self._exception)
+
+                else:
+                    future.set_result(self._result)
+
+        self.add_done_callback(propagate)
+        return future
+
+
+    @classmethod
+    def from_concurrent(cls, future):
         """
-        if self._done_event.wait(timeout) or self._done_event.is_set():
-            return self._result
+        Returns a FutureResult object which will get the result, the exception
+        or the cancellation of the given concurrent.futures.Future object.
+        Cancelling the FutureResult object also cancels the given future.
 
-        raise OSError("Timeout raised")
+        :param future: A concurrent.futures.Future object
+        :return: A FutureResult object
+        """
+        result = cls()
+
+        def cancel(_):
+            """
+            Cancels the concurrent future with its FutureResult
+            """
+            if result.cancelled():
+                future.cancel()
+
+        def propagate(_):
+            """
+            Copies the outcome of the concurrent future
+            """
+            if future.cancelled():
+                result.cancel()
+
+            else:
+                exception = future.exception()
+                with result.__lock:
+                    result._result = None if exception else future.result()
+                    result._exception = exception
+
+                result.__set_done()
+
+        future.add_done_callback(propagate)
+        result.add_done_callback(cancel)
+        return result
+
+
+    def __set_done(self):
+        """
+        Marks the job as done and calls the callbacks
+        """
+        with self.__lock:
+            self._running = False
+            self._done_event.set()
+            callbacks = self.__callbacks
+            self.__callbacks = None
+
+        for callback in callbacks or ():
+            self.__notify(callback)
+
+
+    def __notify(self, callback):
+        """
+        Calls a done callback, logging its exception
+
+        :param callback: A method accepting this object as argument
+        """
+        try:
+            callback(self)
+
+        except Exception as ex:
+            _logger.exception("Error calling a FutureResult callback: %s", ex)
+
+
+def wait_all(futures, timeout=None):
+    """
+    Waits for all the given futures to be done. Accepts FutureResult and
+    concurrent.futures.Future objects.
+
+    :param futures: An iterable of futures
+    :param timeout: The maximum time to wait (in seconds)
+    :return: True if all futures are done, False if the timeout raised
+    """
+    futures = list(futures)
+    if not futures:
+        return True
+
+    event = threading.Event()
+    lock = threading.Lock()
+    remaining = [len(futures)]
+
+    def on_done(_):
+        """
+        A future is done
+        """
+        with lock:
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                event.set()
+
+    for future in futures:
+        future.add_done_callback(on_done)
+
+    return event.wait(timeout) or event.is_set()
+
+
+def wait_any(futures, timeout=None):
+    """
+    Waits for one of the given futures to be done. Accepts FutureResult and
+    concurrent.futures.Future objects.
+
+    :param futures: An iterable of futures
+    :param timeout: The maximum time to wait (in seconds)
+    :return: The first future done, or None if the timeout raised
+    """
+    done = []
+    event = threading.Event()
+
+    def on_done(future):
+        """
+        A future is done
+        """
+        done.append(future)
+        event.set()
+
+    for future in futures:
+        future.add_done_callback(on_done)
+        if done:
+            # No need to register more callbacks
+            break
+
+    if event.wait(timeout) or event.is_set():
+        return done[0]
+
+    return None
 
 # ------------------------------------------------------------------------------
 
+PRIORITY_NORMAL = 0
+""" Default priority of the tasks """
+
+# Priority of the stop markers: after all the tasks
+_PRIORITY_STOP = float("inf")
+
+
+class _TaskQueue(queue.PriorityQueue):
+    """
+    Priority queue which can store a batch of entries while holding its lock
+    only once, and wait for its tasks with a timeout.
+
+    Those methods use the locks and counters of the standard queue, which
+    are shared with its subclasses.
+    """
+    def put_many(self, items, block=True, timeout=None):
+        """
+        Adds a batch of entries to the queue, in order. The consumers are
+        notified once for all the entries of the batch.
+
+        If the queue is bounded, waits for free slots like ``put()``. The
+        timeout applies to the whole batch: if it is reached, the entries
+        stored until then are kept in the queue.
+
+        :param items: A sequence of entries
+        :param block: If False, don't wait for free slots
+        :param timeout: Maximum time to wait for free slots (in seconds)
+        :raise Full: The queue is full
+        """
+        if timeout is not None:
+            end_time = time.time() + timeout
+
+        added = 0
+        with self.not_full:
+            try:
+                for item in items:
+                    if self.maxsize > 0:
+                        while self._qsize() >= self.maxsize:
+                            if not block:
+                                raise queue.Full
+
+                            elif timeout is None:
+                                self.not_full.wait()
+
+                            else:
+                                remaining = end_time - time.time()
+                                if remaining <= 0:
+                                    raise queue.Full
+
+                                self.not_full.wait(remaining)
+
+                    self._put(item)
+                    self.unfinished_tasks += 1
+                    added += 1
+
+            finally:
+                if added:
+                    self.not_empty.notify(added)
+
+
+    def wait_tasks(self, timeout=None):
+        """
+        Waits for all the tasks of the queue to be marked as done
+
+        :param timeout: Maximum time to wait (in seconds)
+        :return: True if all the tasks are done, else False
+        """
+        with self.all_tasks_done:
+            if self.unfinished_tasks:
+                self.all_tasks_done.wait(timeout)
+
+            return not self.unfinished_tasks
+
+
 class ThreadPool(object):
     """
-    Executes the tasks stored in a FIFO in a thread pool
+    Executes the tasks stored in a priority queue in a thread pool. Tasks
+    with the same priority are executed in FIFO order.
+
+    The pool is elastic: it keeps at least *min_threads* threads, and starts
+    new ones, up to *max_threads*, when the tasks are queued faster than they
+    are executed. Threads above the minimum are stopped after having been
+    idle for *timeout* seconds. The minimal threads wait for tasks without
+    waking up periodically.
     """
-    def __init__(self, nb_threads, queue_size=0, timeout=5, logname=None):
+    def __init__(self, max_threads=None, queue_size=0, timeout=5,
+                 logname=None, min_threads=0, nb_threads=None):
         """
         Sets up the task executor
 
-        :param nb_threads: Size of the thread pool
+        The worker threads are daemon threads: they don't prevent the
+        interpreter from exiting if the pool hasn't been stopped.
+
+        :param max_threads: Maximum size of the thread pool
         :param queue_size: Size of the task queue (0 for infinite)
-        :param timeout: Queue timeout (in seconds)
+        :param timeout: Queue timeout and keep-alive time of the idle threads
+                        above the minimum (in seconds)
         :param logname: Name of the logger
+        :param min_threads: Minimum size of the thread pool
+        :param nb_threads: Former name of *max_threads*, kept for
+                           compatibility
         :raise ValueError: Invalid number of threads
         """
         # Validate parameters
-        if type(nb_threads) is not int or nb_threads < 1:
-            raise ValueError("Invalid pool size: {0}".format(nb_threads))
+        if max_threads is None:
+            max_threads = nb_threads
+
+        elif nb_threads is not None and nb_threads != max_threads:
+            raise ValueError("Both max_threads and nb_threads given: {0} / {1}"
+                             .format(max_threads, nb_threads))
+
+        if type(max_threads) is not int or max_threads < 1:
+            raise ValueError("Invalid pool size: {0}".format(max_threads))
+
+        if type(min_threads) is not int or min_threads < 0 \
+                or min_threads > max_threads:
+            raise ValueError("Invalid minimum pool size: {0}"
+                             .format(min_threads))
 
         # The logger
         self.__name = logname or __name__
@@ -143,14 +537,30 @@ class ThreadPool(object):
             # Not a valid integer
             queue_size = 0
 
-        self._queue = queue.Queue(queue_size)
+        # Queue entries: (-priority, sequence, task)
+        self._queue = _TaskQueue(queue_size)
+        self.__sequence = itertools.count()
         self._timeout = timeout
         self.__lock = threading.Lock()
 
+        # Scheduled tasks: heap of (due time, sequence, priority, task)
+        self.__scheduled = []
+        self.__timer_condition = threading.Condition()
+        self.__timer = None
+
         # The thread pool
-        self._nb_threads = nb_threads
+        self._min_threads = min_threads
+        self._max_threads = max_threads
         self._threads = []
 
+        # Threads accounting (protected by the threads lock)
+        self.__threads_lock = threading.Lock()
+        self.__idle = 0
+        self.__thread_id = 0
+        self.__spawned = 0
+        self.__retired = 0
+        self.__expired = 0
+
 
     def start(self):
         """
@@ -163,17 +573,12 @@ class ThreadPool(object):
         # Clear the stop event
         self._done_event.clear()
 
-        # Create the threads
-        i = 0
-        while i < self._nb_threads:
-            i += 1
-            thread = threading.Thread(target=self.__run,
-                                      name="{0}-{1}".format(self.__name, i))
-            self._threads.append(thread)
-
-        # Start'em
-        for thread in self._threads:
-            thread.start()
+        # Create the minimal threads, and those needed by the queued tasks
+        with self.__threads_lock:
+            nb_threads = max(self._min_threads,
+                             min(self._max_threads, self._queue.qsize()))
+            for _ in range(nb_threads):
+                self.__spawn()
 
 
     def stop(self):
@@ -187,49 +592,180 @@ class ThreadPool(object):
         # Set the stop event
         self._done_event.set()
 
+        # Forget the scheduled tasks
+        with self.__timer_condition:
+            del self.__scheduled[:]
+            self.__timer_condition.notify()
+
         with self.__lock:
+            with self.__threads_lock:
+                threads = self._threads[:]
+
             # Add something in the queue (to unlock the join())
             try:
-                for _ in self._threads:
-                    self._queue.put(self._done_event, True, self._timeout)
+                for _ in threads:
+                    self._queue.put((_PRIORITY_STOP, next(self.__sequence),
+                                     self._done_event), True, self._timeout)
 
             except queue.Full:
                 # There is already something in the queue
                 pass
 
             # Join threads
-            for thread in self._threads:
+            for thread in threads:
                 thread.join()
 
         # Clear storage
-        del self._threads[:]
+        with self.__threads_lock:
+            del self._threads[:]
+            self.__idle = 0
+
         self.clear()
 
 
     def enqueue(self, method, *args, **kwargs):
         """
-        Enqueues a task in the pool
+        Enqueues a task in the pool, with the normal priority
 
         :param method: Method to call
         :return: A FutureResult object, to get the result of the task
         :raise ValueError: Invalid method
         :raise Full: The task queue is full
         """
+        return self.enqueue_task(method, args, kwargs)
+
+
+    def schedule(self, delay, method, *args, **kwargs):
+        """
+        Enqueues a task in the pool after the given delay, with the normal
+        priority. The delay is handled by a single timer thread, which runs
+        only while tasks are scheduled.
+
+        :param delay: Time to wait before enqueuing the task (in seconds)
+        :param method: Method to call
+        :return: A FutureResult object, to get the result of the task
+        :raise ValueError: Invalid method
+        """
+        return self.enqueue_task(method, args, kwargs, delay=delay)
+
+
+    def enqueue_task(self, method, args=None, kwargs=None,
+                     priority=PRIORITY_NORMAL, deadline=None, delay=None,
+                     fire_and_forget=False):
+        """
+        Enqueues a task in the pool
+
+        :param method: Method to call
+        :param args: Method positional arguments
+        :param kwargs: Method keyword arguments
+        :param priority: Priority of the task: tasks with the highest priority
+                         are executed first
+        :param deadline: Maximum time the task can stay in the queue (in
+                         seconds). After that, the task is not executed and
+                         its FutureResult is marked as expired.
+        :param delay: Time to wait before enqueuing the task (in seconds)
+        :param fire_and_forget: If True, don't create a FutureResult for the
+                                task (its exception is only logged)
+        :return: A FutureResult object, to get the result of the task, or None
+                 in fire-and-forget mode
+        :raise ValueError: Invalid method
+        :raise Full: The task queue is full
+        """
         if not hasattr(method, '__call__'):
             raise ValueError("{0} has no __call__ member." \
-                             .format(method.__name__))
+                             .format(method))
 
         # Prepare the future result object
-        future = FutureResult()
+        future = None if fire_and_forget else FutureResult()
+        task = (method, args, kwargs, future, deadline)
+
+        if delay is not None and delay > 0:
+            # Give the task to the timer
+            with self.__timer_condition:
+                heapq.heappush(self.__scheduled,
+                               (time.time() + delay, next(self.__sequence),
+                                priority, task))
+                if self.__timer is None:
+                    self.__timer = threading.Thread(
+                                target=self.__run_timer,
+                                name="{0}-timer".format(self.__name))
+                    self.__timer.daemon = True
+                    self.__timer.start()
+
+                else:
+                    self.__timer_condition.notify()
 
-        # Use a lock, as we might be "resetting" the queue
-        with self.__lock:
-            # Add the task to the queue
-            self._queue.put((method, args, kwargs, future), True, self._timeout)
+        else:
+            self.__put(priority, (task,))
 
         return future
 
 
+    def enqueue_many(self, method, arguments, priority=PRIORITY_NORMAL,
+                     deadline=None, fire_and_forget=False):
+        """
+        Enqueues a batch of calls to the same method, adding them to the queue
+        at once. Tasks of the batch are executed in order, according to their
+        priority.
+
+        :param method: Method to call
+        :param arguments: An iterable of positional arguments tuples, one per
+                          task
+        :param priority: Priority of the tasks
+        :param deadline: Maximum time the tasks can stay in the queue (in
+                         seconds)
+        :param fire_and_forget: If True, don't create FutureResult objects
+        :return: The list of the FutureResult objects of the tasks, or None in
+                 fire-and-forget mode
+        :raise ValueError: Invalid method
+        :raise Full: The task queue is full
+        """
+        if not hasattr(method, '__call__'):
+            raise ValueError("{0} has no __call__ member." \
+                             .format(method))
+
+        if fire_and_forget:
+            self.__put(priority, [(method, args, None, None, deadline)
+                                  for args in arguments])
+            return None
+
+        futures = []
+        tasks = []
+        for args in arguments:
+            future = FutureResult()
+            futures.append(future)
+            tasks.append((method, args, None, future, deadline))
+
+        self.__put(priority, tasks)
+        return futures
+
+
+    def get_stats(self):
+        """
+        Returns the current state of the pool
+
+        :return: A dictionary with the number of threads ("threads"), of idle
+                 threads ("idle"), of queued and scheduled tasks ("queued",
+                 "scheduled"), of tasks dropped after their deadline
+                 ("expired"), the pool limits ("min_threads", "max_threads")
+                 and the number of threads started ("spawned") and stopped
+                 when idle ("retired")
+        """
+        with self.__timer_condition:
+            scheduled = len(self.__scheduled)
+
+        with self.__threads_lock:
+            return {"threads": len(self._threads),
+                    "idle": self.__idle,
+                    "queued": self._queue.qsize(),
+                    "scheduled": scheduled,
+                    "expired": self.__expired,
+                    "min_threads": self._min_threads,
+                    "max_threads": self._max_threads,
+                    "spawned": self.__spawned,
+                    "retired": self.__retired}
+
+
     def clear(self):
         """
         Empties the current queue content.
@@ -268,38 +804,188 @@ class ThreadPool(object):
 
         else:
             # Wait for the condition
-            with self._queue.all_tasks_done:
-                self._queue.all_tasks_done.wait(timeout)
-                return self._queue.empty()
+            return self._queue.wait_tasks(timeout)
 
 
-    def __run(self):
+    def __put(self, priority, tasks):
         """
-        The main loop
+        Adds tasks to the queue, and starts new threads if the idle ones can't
+        handle the queued tasks.
+
+        The pool lock isn't taken: a task added while the queue is being
+        cleared might be kept.
+
+        :param priority: Priority of the tasks
+        :param tasks: A sequence of (method, args, kwargs, future, deadline)
+                      tuples
+        :raise Full: The task queue is full
         """
-        while not self._done_event.is_set():
+        if not tasks:
+            return
+
+        deadline = tasks[0][4]
+        if deadline is not None:
+            # Compute the expiration time
+            expiration = time.time() + deadline
+            tasks = [task[:4] + (expiration,) for task in tasks]
+
+        priority = -priority
+        sequence = self.__sequence
+        work_queue = self._queue
+        if work_queue.maxsize > 0:
+            # Bounded queue: start the threads which will free the slots
+            # while adding the tasks
+            for task in tasks:
+                work_queue.put((priority, next(sequence), task),
+                               True, self._timeout)
+                self.__start_threads()
+
+        else:
+            # Add the whole batch at once
+            work_queue.put_many([(priority, next(sequence), task)
+                                 for task in tasks])
+            self.__start_threads()
+
+
+    def __start_threads(self):
+        """
+        Starts new threads if the idle ones can't handle the queued tasks
+        """
+        work_queue = self._queue
+
+        # Read the counters without lock: the threads lock is only taken if a
+        # thread might be needed. A thread counted as idle always looks at
+        # the queue before stopping.
+        if self.__idle < work_queue.qsize() \
+                and len(self._threads) < self._max_threads \
+                and not self._done_event.is_set():
+            with self.__threads_lock:
+                missing = min(work_queue.qsize() - self.__idle,
+                              self._max_threads - len(self._threads))
+                if not self._done_event.is_set():
+                    for _ in range(missing):
+                        self.__spawn()
+
+
+    def __run_timer(self):
+        """
+        Enqueues the scheduled tasks when they are due. Stops when no more
+        task is scheduled.
+        """
+        with self.__timer_condition:
+            while self.__scheduled:
+                due_time = self.__scheduled[0][0]
+                now = time.time()
+                if due_time > now:
+                    self.__timer_condition.wait(due_time - now)
+                    continue
+
+                _, _, priority, task = heapq.heappop(self.__scheduled)
+                try:
+                    self.__put(priority, (task,))
+
+                except queue.Full:
+                    self._logger.error("Queue full: scheduled task %s dropped",
+                                       task[0].__name__)
+
+            self.__timer = None
+
+
+    def __spawn(self):
+        """
+        Starts a new thread. The threads lock must be held by the caller.
+        """
+        self.__thread_id += 1
+        self.__spawned += 1
+        thread = threading.Thread(target=self.__run,
+                                  name="{0}-{1}".format(self.__name,
+                                                        self.__thread_id))
+        thread.daemon = True
+        self._threads.append(thread)
+        thread.start()
+
+
+    def __get_task(self):
+        """
+        Waits for a task. Threads above the minimum wait at most the pool
+        timeout, and are retired if no task arrived.
+
+        :return: A queue entry (its last item being a task or the stop
+                 event), or None if the thread must stop
+        """
+        current = threading.current_thread()
+        while True:
+            with self.__threads_lock:
+                self.__idle += 1
+                keep_alive = len(self._threads) > self._min_threads
+
             try:
-                # Wait for an action (blocking)
-                task = self._queue.get(True, self._timeout)
-                if task is self._done_event:
-                    # Stop event in the queue: get out
-                    return
+                if keep_alive:
+                    entry = self._queue.get(True, self._timeout)
+
+                else:
+                    entry = self._queue.get(True)
 
             except queue.Empty:
-                # Nothing to do
-                pass
+                with self.__threads_lock:
+                    # Stop being idle and retire in the same step, so that
+                    # producers never count a retired thread
+                    self.__idle -= 1
+                    if self._queue.empty() \
+                            and len(self._threads) > self._min_threads:
+                        # Idle for too long
+                        self._threads.remove(current)
+                        self.__retired += 1
+                        return None
 
             else:
-                # Extract elements
-                method, args, kwargs, future = task
-                try:
-                    # Call the method
+                with self.__threads_lock:
+                    self.__idle -= 1
+
+                return entry
+
+
+    def __run(self):
+        """
+        The main loop
+        """
+        while not self._done_event.is_set():
+            entry = self.__get_task()
+            if entry is None:
+                # Retired thread
+                return
+
+            elif entry[2] is self._done_event:
+                # Stop event in the queue: get out
+                self._queue.task_done()
+                return
+
+            # Extract elements
+            method, args, kwargs, future, expiration = entry[2]
+            if expiration is not None and time.time() > expiration:
+                # Deadline passed: drop the task
+                self._logger.debug("Task %s expired", method.__name__)
+                with self.__threads_lock:
+                    self.__expired += 1
+
+                if future is not None:
+                    future.expire()
+
+                self._queue.task_done()
+                continue
+
+            try:
+                # Call the method
+                if future is not None:
                     future.execute(method, args, kwargs)
 
-                except Exception as ex:
-                    self._logger.exception("Error executing %s: %s",
-                                           method.__name__, ex)
+                else:
+                    method(*(args or ()), **(kwargs or {}))
 
-                finally:
-                    # Mark the action as executed
-                    self._queue.task_done()
+            except Exception as ex:
+                self._logger.exception("Error executing %s: %s",
+                                       method.__name__, ex)
+
+            finally:
+                # Mark the action as executed
+                self._queue.task_done()
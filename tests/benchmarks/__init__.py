@@ -0,0 +1,13 @@
+#!/usr/bin/env python
+# -- Content-Encoding: UTF-8 --
+"""
+Benchmarks for Pelix and iPOPO.
+
+These modules are not run by the test suite: each one can be executed with
+``python -m tests.benchmarks.<module>``.
+
+The parametrised scenarios of the ``scenarios`` module can be run together,
+stored as JSON and compared with ``python -m tests.benchmarks``.
+
+:author: Thomas Calmant
+"""
@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+# -- Content-Encoding: UTF-8 --
+"""
+Benchmarks runner.
+
+Usage::
+
+    # List the scenarios and their default parameters
+    python -m tests.benchmarks list
+
+    # Run all or some scenarios, with custom parameters, and store the results
+    python -m tests.benchmarks run [SCENARIO ...] [-p SCENARIO.PARAM=VALUE]
+                                   [-r REPEAT] [-o RESULTS.json]
+
+    # Compare two results files
+    python -m tests.benchmarks compare BASE.json NEW.json [-t PERCENT]
+
+The metrics of each scenario are the best (lowest) values of its runs. The
+comparison exits with status 1 if a metric regressed by more than the
+threshold.
+
+:author: Thomas Calmant
+"""
+
+# Pelix
+import pelix.framework
+
+# Benchmarks
+from tests.benchmarks.scenarios import SCENARIOS
+
+# Standard library
+import argparse
+import json
+import platform
+import sys
+import time
+
+# ------------------------------------------------------------------------------
+
+__version__ = "1.0.0"
+
+# Documentation strings format
+__docformat__ = "restructuredtext en"
+
+# ------------------------------------------------------------------------------
+
+def _parse_value(value):
+    """
+    Converts a parameter value given on the command line
+
+    :param value: A string
+    :return: An integer, a float or the string itself
+    """
+    for converter in (int, float):
+        try:
+            return converter(value)
+
+        except ValueError:
+            pass
+
+    return value
+
+
+def _parse_parameters(parameters):
+    """
+    Parses the "scenario.param=value" command line parameters
+
+    :param parameters: A list of strings
+    :return: A dictionary: scenario -> {param -> value}
+    :raise ValueError: Invalid parameter
+    """
+    result = {}
+    for parameter in parameters or []:
+        try:
+            key, value = parameter.split("=", 1)
+            name, param = key.split(".", 1)
+
+        except ValueError:
+            raise ValueError("Invalid parameter: {0}".format(parameter))
+
+        if name not in SCENARIOS:
+            raise ValueError("Unknown scenario: {0}".format(name))
+
+        if param not in SCENARIOS[name].parameters:
+            raise ValueError("Unknown parameter of {0}: {1}"
+                             .format(name, param))
+
+        result.setdefault(name, {})[param] = _parse_value(value)
+
+    return result
+
+
+def run(names, parameters, repeat=1):
+    """
+    Runs the given scenarios
+
+    :param names: Names of the scenarios to run (all if empty)
+    :param parameters: A dictionary: scenario -> {param -> value}
+    :param repeat: Number of runs of each scenario
+    :return: The results dictionary
+    """
+    results = {}
+    for name in names or SCENARIOS:
+        method, defaults, _ = SCENARIOS[name]
+        kwargs = defaults.copy()
+        kwargs.update(parameters.get(name, {}))
+
+        metrics = {}
+        for _ in range(max(repeat, 1)):
+            for metric, value in method(**kwargs).items():
+                metrics[metric] = min(value, metrics.get(metric, value))
+
+        results[name] = {"parameters": kwargs, "metrics": metrics}
+        print("{0}: {1}".format(name, ", ".join(
+                                "{0}={1:.3f}".format(metric, metrics[metric])
+                                for metric in sorted(metrics))))
+
+    return {"date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "pelix": pelix.framework.__version__,
+            "repeat": repeat,
+            "results": results}
+
+
+def compare(base, new, threshold):
+    """
+    Compares two results dictionaries
+
+    :param base: The reference results
+    :param new: The results to compare
+    :param threshold: Tolerated increase of a metric, in percent
+    :return: The list of (scenario, metric, base, new, change %, regressed)
+             tuples, for the metrics found in both results
+    """
+    comparison = []
+    for name in sorted(set(base["results"]).intersection(new["results"])):
+        base_result = base["results"][name]
+        new_result = new["results"][name]
+        if base_result["parameters"] != new_result["parameters"]:
+            print("{0}: different parameters, not compared".format(name))
+            continue
+
+        base_metrics = base_result["metrics"]
+        new_metrics = new_result["metrics"]
+        for metric in sorted(set(base_metrics).intersection(new_metrics)):
+            old_value = base_metrics[metric]
+            new_value = new_metrics[metric]
+            if old_value:
+                change = (new_value - old_value) * 100. / abs(old_value)
+
+            else:
+                change = 0. if not new_value else float("inf")
+
+            comparison.append((name, metric, old_value, new_value, change,
+                               change > threshold))
+
+    return comparison
+
+
+def main(argv=None):
+    """
+    Entry point
+
+    :param argv: Program arguments
+    :return: An exit code
+    """
+    parser = argparse.ArgumentParser(description="Pelix benchmarks")
+    subparsers = parser.add_subparsers(dest="command")
+
+    subparsers.add_parser("list", help="List the scenarios")
+
+    run_parser = subparsers.add_parser("run", help="Run scenarios")
+    run_parser.add_argument("scenarios", nargs="*", metavar="SCENARIO",
+                            help="Scenarios to run (default: all)")
+    run_parser.add_argument("-p", "--param", action="append",
+                            metavar="SCENARIO.PARAM=VALUE",
+                            help="Set a scenario parameter")
+    run_parser.add_argument("-r", "--repeat", type=int, default=1,
+                            help="Number of runs of each scenario")
+    run_parser.add_argument("-o", "--output", metavar="FILE",
+                            help="Write the results in a JSON file")
+
+    compare_parser = subparsers.add_parser("compare",
+                                           help="Compare two results files")
+    compare_parser.add_argument("base", help="Reference results file")
+    compare_parser.add_argument("new", help="New results file")
+    compare_parser.add_argument("-t", "--threshold", type=float, default=10.,
+                                help="Tolerated increase, in percent")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        for name, (_, parameters, doc) in SCENARIOS.items():
+            print("{0}: {1}".format(name, doc))
+            print("    {0}".format(", ".join(
+                                    "{0}={1}".format(key, parameters[key])
+                                    for key in sorted(parameters))))
+        return 0
+
+    elif args.command == "run":
+        unknown = [name for name in args.scenarios if name not in SCENARIOS]
+        if unknown:
+            parser.error("Unknown scenarios: {0}".format(", ".join(unknown)))
+
+        try:
+            parameters = _parse_parameters(args.param)
+
+        except ValueError as ex:
+            parser.error(str(ex))
+
+        results = run(args.scenarios, parameters, args.repeat)
+        if args.output:
+            with open(args.output, "w") as fp:
+                json.dump(results, fp, indent=2, sort_keys=True)
+
+        return 0
+
+    elif args.command == "compare":
+        with open(args.base) as fp:
+            base = json.load(fp)
+
+        with open(args.new) as fp:
+            new = json.load(fp)
+
+        regressions = 0
+        for name, metric, old_value, new_value, change, regressed \
+                in compare(base, new, args.threshold):
+            print("{0:<8} {1}.{2}: {3:.3f} -> {4:.3f} ({5:+.1f}%)".format(
+                                "REGRESS" if regressed else "ok", name,
+                                metric, old_value, new_value, change))
+            regressions += regressed
+
+        return 1 if regressions else 0
+
+    parser.print_help()
+    return 1
+
+# ------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    sys.exit(main())
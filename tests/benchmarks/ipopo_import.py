@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -- Content-Encoding: UTF-8 --
+"""
+iPOPO import benchmark: measures the time needed to import a generated (and
+already compiled) module defining many component factories, then the time
+needed to register them (install and start the module as a bundle).
+
+Usage::
+
+    python -m tests.benchmarks.ipopo_import [-n FACTORIES]
+
+:author: Thomas Calmant
+"""
+
+# Pelix
+from pelix.framework import FrameworkFactory
+
+# Standard library
+import argparse
+import os
+import py_compile
+import shutil
+import sys
+import tempfile
+import time
+
+# ------------------------------------------------------------------------------
+
+__version__ = "1.0.0"
+
+# Documentation strings format
+__docformat__ = "restructuredtext en"
+
+MODULE_NAME = "ipopo_import_benchmark_factories"
+""" Name of the generated module """
+
+MODULE_HEADER = '''
+from pelix.ipopo.decorators import ComponentFactory, Provides, Requires, \\
+    Property, Validate, Invalidate, Bind, Unbind
+
+
+class Base(object):
+    """
+    Parent of the factories
+    """
+    def helper(self):
+        pass
+
+    @Validate
+    def validate(self, context):
+        pass
+
+    @Invalidate
+    def invalidate(self, context):
+        pass
+
+'''
+""" Beginning of the generated module """
+
+FACTORY_TEMPLATE = '''
+@ComponentFactory("factory-{idx}")
+@Provides("benchmark.service.{idx}")
+@Requires("_dep", "benchmark.service.{dep}", optional=True)
+@Property("_name", "benchmark.name", "factory-{idx}")
+class Factory{idx}(Base):
+    """
+    Generated factory {idx}
+    """
+    def method_a(self):
+        pass
+
+    def method_b(self):
+        pass
+
+    @Bind
+    def bind(self, svc, svc_ref):
+        pass
+
+    @Unbind
+    def unbind(self, svc, svc_ref):
+        pass
+
+'''
+""" Template of a generated factory """
+
+# ------------------------------------------------------------------------------
+
+def generate_module(nb_factories):
+    """
+    Generates the source of a module defining the given number of factories
+
+    :param nb_factories: Number of factories in the module
+    :return: The source code of the module
+    """
+    parts = [MODULE_HEADER]
+    for idx in range(nb_factories):
+        parts.append(FACTORY_TEMPLATE.format(idx=idx,
+                                             dep=(idx + 1) % nb_factories))
+
+    return "".join(parts)
+
+
+def run(nb_factories):
+    """
+    Imports then registers a module with the given number of factories
+
+    :param nb_factories: Number of factories in the generated module
+    :return: A dictionary with the import ("import") and the registration
+             ("register") times, in seconds
+    """
+    directory = tempfile.mkdtemp()
+    sys.path.insert(0, directory)
+    framework = FrameworkFactory.get_framework()
+    try:
+        filename = os.path.join(directory, MODULE_NAME + ".py")
+        with open(filename, "w") as fp:
+            fp.write(generate_module(nb_factories))
+
+        # Compile the module first: only measure its execution
+        py_compile.compile(filename, cfile=filename + "c")
+        os.remove(filename)
+
+        # Import the module
+        start = time.time()
+        __import__(MODULE_NAME)
+        imported = time.time()
+
+        # Register its factories
+        framework.start()
+        context = framework.get_bundle_context()
+        context.install_bundle("pelix.ipopo.core").start()
+
+        start_register = time.time()
+        context.install_bundle(MODULE_NAME).start()
+        registered = time.time()
+
+        return {"import": imported - start,
+                "register": registered - start_register}
+
+    finally:
+        framework.stop()
+        FrameworkFactory.delete_framework(framework)
+        sys.modules.pop(MODULE_NAME, None)
+        sys.path.remove(directory)
+        shutil.rmtree(directory)
+
+
+def main(argv=None):
+    """
+    Entry point
+
+    :param argv: Program arguments
+    :return: An exit code
+    """
+    parser = argparse.ArgumentParser(description="iPOPO import benchmark")
+    parser.add_argument("-n", "--factories", type=int, default=1000,
+                        help="Number of factories in the generated module")
+    args = parser.parse_args(argv)
+
+    result = run(args.factories)
+    print("Factories.....: {0}".format(args.factories))
+    print("Import time...: {0:.3f}s".format(result["import"]))
+    print("Register time.: {0:.3f}s".format(result["register"]))
+    return 0
+
+# ------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -- Content-Encoding: UTF-8 --
+"""
+iPOPO memory benchmark: measures the memory used by each component instance
+while it is alive, and the memory it leaves behind once it has been killed.
+
+Usage::
+
+    python -m tests.benchmarks.ipopo_memory [-n INSTANCES]
+
+Requires the tracemalloc module (Python 3.4+).
+
+:author: Thomas Calmant
+"""
+
+# Pelix
+from pelix.framework import FrameworkFactory
+import pelix.ipopo.constants as constants
+import pelix.ipopo.decorators as decorators
+
+# Standard library
+import argparse
+import gc
+import sys
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+# ------------------------------------------------------------------------------
+
+__version__ = "1.0.0"
+
+# Documentation strings format
+__docformat__ = "restructuredtext en"
+
+FACTORY = "memory-benchmark-factory"
+""" Name of the benchmarked component factory """
+
+# ------------------------------------------------------------------------------
+
+def _make_factory():
+    """
+    Prepares a component factory using the built-in handlers: one property,
+    one provided service, one simple and one aggregate dependency
+
+    :return: The manipulated class
+    """
+    class Component(object):
+        """
+        Benchmarked component
+        """
+        pass
+
+    decorators.Property("_name", "benchmark.name", "memory")(Component)
+    decorators.Requires("_simple", "benchmark.simple", optional=True) \
+                                                                (Component)
+    decorators.Requires("_aggregate", "benchmark.aggregate", aggregate=True,
+                        optional=True)(Component)
+    decorators.Provides("benchmark.provided")(Component)
+    decorators.ComponentFactory(FACTORY)(Component)
+    return Component
+
+
+def _traced_size():
+    """
+    Returns the current size of the memory blocks traced by tracemalloc,
+    after a garbage collection
+
+    :return: A number of bytes
+    """
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+
+def run(nb_instances):
+    """
+    Instantiates and kills the given number of components
+
+    :param nb_instances: Number of components to instantiate
+    :return: A dictionary with the number of bytes per living instance
+             ("alive") and the number of bytes left per killed instance
+             ("leaked")
+    """
+    framework = FrameworkFactory.get_framework()
+    framework.start()
+    try:
+        context = framework.get_bundle_context()
+        context.install_bundle("pelix.ipopo.core").start()
+        ipopo = constants.get_ipopo_svc_ref(context)[1]
+        ipopo.register_factory(context, _make_factory())
+
+        # Warm up: first instantiation allocates caches
+        ipopo.instantiate(FACTORY, "warm-up")
+        ipopo.kill("warm-up")
+
+        names = ["component-{0}".format(idx) for idx in range(nb_instances)]
+
+        tracemalloc.start()
+        try:
+            start = _traced_size()
+            for name in names:
+                ipopo.instantiate(FACTORY, name)
+            alive = _traced_size()
+
+            for name in names:
+                ipopo.kill(name)
+            end = _traced_size()
+
+        finally:
+            tracemalloc.stop()
+
+        return {"alive": float(alive - start) / nb_instances,
+                "leaked": float(end - start) / nb_instances}
+
+    finally:
+        framework.stop()
+        FrameworkFactory.delete_framework(framework)
+
+
+def main(argv=None):
+    """
+    Entry point
+
+    :param argv: Program arguments
+    :return: An exit code
+    """
+    parser = argparse.ArgumentParser(description="iPOPO memory benchmark")
+    parser.add_argument("-n", "--instances", type=int, default=10000,
+                        help="Number of component instances")
+    args = parser.parse_args(argv)
+
+    if tracemalloc is None:
+        print("The tracemalloc module is required")
+        return 1
+
+    result = run(args.instances)
+    print("Instances.....: {0}".format(args.instances))
+    print("Bytes/instance: {0:.0f}".format(result["alive"]))
+    print("Leaked/instance: {0:.0f}".format(result["leaked"]))
+    return 0
+
+# ------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    sys.exit(main())
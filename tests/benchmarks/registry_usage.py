@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -- Content-Encoding: UTF-8 --
+"""
+Service registry benchmark: measures the cost of tight get_service() /
+unget_service() loops, as done by code getting a service around each request,
+while the consumer bundle uses many other services.
+
+Usage::
+
+    python -m tests.benchmarks.registry_usage [-n CALLS] [-s SERVICES]
+
+:author: Thomas Calmant
+"""
+
+# Pelix
+from pelix.framework import FrameworkFactory
+
+# Standard library
+import argparse
+import sys
+import time
+
+# ------------------------------------------------------------------------------
+
+__version__ = "1.0.0"
+
+# Documentation strings format
+__docformat__ = "restructuredtext en"
+
+# ------------------------------------------------------------------------------
+
+def run(nb_calls, nb_services):
+    """
+    Gets and releases services in tight loops
+
+    :param nb_calls: Number of get/unget calls per loop
+    :param nb_services: Number of services held by the consumer bundle
+    :return: A dictionary with the time per get/unget pair (in microseconds)
+             of a service already in use ("held") and of a service released
+             after each call ("first_use")
+    """
+    framework = FrameworkFactory.get_framework()
+    try:
+        framework.start()
+        context = framework.get_bundle_context()
+        consumer = context.install_bundle("tests.simple_bundle") \
+                          .get_bundle_context()
+
+        # Services used by the consumer for the whole benchmark
+        references = [context.register_service("benchmark.held", object(),
+                                               {"idx": idx}).get_reference()
+                      for idx in range(nb_services)]
+        for reference in references:
+            consumer.get_service(reference)
+
+        reference = context.register_service("benchmark.called", object(),
+                                             {}).get_reference()
+
+        # The service is used between the calls
+        consumer.get_service(reference)
+        start = time.time()
+        for _ in range(nb_calls):
+            consumer.get_service(reference)
+            consumer.unget_service(reference)
+        held = time.time() - start
+        consumer.unget_service(reference)
+
+        # The service is not used between the calls
+        start = time.time()
+        for _ in range(nb_calls):
+            consumer.get_service(reference)
+            consumer.unget_service(reference)
+        first_use = time.time() - start
+
+        return {"held": held * 1e6 / nb_calls,
+                "first_use": first_use * 1e6 / nb_calls}
+
+    finally:
+        framework.stop()
+        FrameworkFactory.delete_framework(framework)
+
+
+def main(argv=None):
+    """
+    Entry point
+
+    :param argv: Program arguments
+    :return: An exit code
+    """
+    parser = argparse.ArgumentParser(description="Service usage benchmark")
+    parser.add_argument("-n", "--calls", type=int, default=100000,
+                        help="Number of get/unget calls")
+    parser.add_argument("-s", "--services", type=int, default=1000,
+                        help="Number of other services used by the consumer")
+    args = parser.parse_args(argv)
+
+    result = run(args.calls, args.services)
+    print("Calls.............: {0}".format(args.calls))
+    print("Services in use...: {0}".format(args.services))
+    print("Held service......: {0:.3f}us/call".format(result["held"]))
+    print("First use.........: {0:.3f}us/call".format(result["first_use"]))
+    return 0
+
+# ------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,393 @@
+#!/usr/bin/env python
+# -- Content-Encoding: UTF-8 --
+"""
+Parametrised benchmark scenarios of the framework, the service registry,
+iPOPO and the EventAdmin service.
+
+Each scenario is a function accepting its parameters as keyword arguments and
+returning a dictionary of metrics. All metrics are "lower is better": times
+are given per operation, in microseconds, and sizes in bytes.
+
+The scenarios are run by ``python -m tests.benchmarks``.
+
+:author: Thomas Calmant
+"""
+
+# Pelix
+from pelix.framework import FrameworkFactory
+import pelix.ipopo.constants as constants
+import pelix.ipopo.decorators as decorators
+import pelix.services
+
+# Benchmarks
+import tests.benchmarks.ipopo_import as import_benchmark
+import tests.benchmarks.ipopo_memory as memory_benchmark
+import tests.benchmarks.registry_usage as usage_benchmark
+import tests.benchmarks.threadpool_throughput as threadpool_benchmark
+
+# Standard library
+import collections
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# ------------------------------------------------------------------------------
+
+__version__ = "1.0.0"
+
+# Documentation strings format
+__docformat__ = "restructuredtext en"
+
+Scenario = collections.namedtuple("Scenario", "method, parameters, doc")
+""" A scenario: its method, its default parameters and its description """
+
+SCENARIOS = collections.OrderedDict()
+""" Name -> Scenario """
+
+BUNDLE_TEMPLATE = '''
+class Activator(object):
+    def start(self, context):
+        self.registration = context.register_service(
+                                "benchmark.boot.{idx}", self, {{}})
+
+    def stop(self, context):
+        self.registration.unregister()
+
+activator = Activator()
+'''
+""" Source of the bundles generated by the boot scenario """
+
+# ------------------------------------------------------------------------------
+
+def scenario(**parameters):
+    """
+    Registers the decorated method as a scenario, with the given default
+    parameters
+
+    :param parameters: Default values of the scenario parameters
+    :return: The decorator
+    """
+    def decorator(method):
+        """
+        Stores the scenario
+        """
+        SCENARIOS[method.__name__] = Scenario(method, parameters,
+                                              method.__doc__.strip()
+                                              .splitlines()[0])
+        return method
+
+    return decorator
+
+
+class _Framework(object):
+    """
+    Starts a framework in a "with" block, with the iPOPO bundle if needed,
+    and deletes it when leaving the block
+    """
+    def __init__(self, *bundles):
+        """
+        :param bundles: Names of the bundles to install and start
+        """
+        self.__bundles = bundles
+        self.framework = None
+
+
+    def __enter__(self):
+        """
+        Starts the framework
+
+        :return: The framework bundle context
+        """
+        self.framework = FrameworkFactory.get_framework()
+        self.framework.start()
+        context = self.framework.get_bundle_context()
+        for name in self.__bundles:
+            context.install_bundle(name).start()
+
+        return context
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        Stops and deletes the framework
+        """
+        self.framework.stop()
+        FrameworkFactory.delete_framework(self.framework)
+        return False
+
+
+def _per_op(start, count):
+    """
+    Computes the time per operation since the given start time
+
+    :param start: Start time, as given by time.time()
+    :param count: Number of operations
+    :return: The time per operation, in microseconds
+    """
+    return (time.time() - start) * 1e6 / max(count, 1)
+
+
+def _make_filter(depth):
+    """
+    Generates an LDAP filter of the given depth, matching the "idx" and
+    "name" properties of the registry scenario services
+
+    :param depth: Number of nested conjunctions (0 for no filter)
+    :return: An LDAP filter string, or None
+    """
+    if depth <= 0:
+        return None
+
+    ldap_filter = "(idx=*)"
+    for level in range(depth):
+        ldap_filter = "(&{0}(|(name=svc-{1}*)(level>={1})))" \
+                      .format(ldap_filter, level)
+
+    return ldap_filter
+
+# ------------------------------------------------------------------------------
+
+@scenario(services=1000, listeners=100, filter_depth=2, lookups=1000)
+def registry(services, listeners, filter_depth, lookups):
+    """
+    Service registration, lookup and events with filtered listeners
+    """
+    ldap_filter = _make_filter(filter_depth)
+
+    class Listener(object):
+        """
+        Counting service listener
+        """
+        count = 0
+
+        def service_changed(self, event):
+            Listener.count += 1
+
+    with _Framework() as context:
+        for _ in range(listeners):
+            context.add_service_listener(Listener(), ldap_filter,
+                                         "benchmark.registry")
+
+        # Registration (fires the REGISTERED events)
+        start = time.time()
+        registrations = [context.register_service(
+                                        "benchmark.registry", object(),
+                                        {"idx": idx, "name": "svc-0",
+                                         "level": filter_depth})
+                         for idx in range(services)]
+        register = _per_op(start, services)
+
+        # Look ups, filtered like the listeners
+        start = time.time()
+        for _ in range(lookups):
+            context.get_all_service_references("benchmark.registry",
+                                               ldap_filter)
+        lookup = _per_op(start, lookups)
+
+        # Properties update (fires the MODIFIED events)
+        start = time.time()
+        for registration in registrations:
+            registration.set_properties({"level": filter_depth + 1})
+        modify = _per_op(start, services)
+
+        # Unregistration
+        start = time.time()
+        for registration in registrations:
+            registration.unregister()
+        unregister = _per_op(start, services)
+
+    return {"register_us": register, "lookup_us": lookup,
+            "modify_us": modify, "unregister_us": unregister}
+
+
+@scenario(calls=100000, services=1000)
+def service_usage(calls, services):
+    """
+    Tight get_service() / unget_service() loops
+    """
+    result = usage_benchmark.run(calls, services)
+    return {"held_us": result["held"], "first_use_us": result["first_use"]}
+
+
+@scenario(instances=1000)
+def ipopo_churn(instances):
+    """
+    Instantiation and kill of components providing and requiring services
+    """
+    with _Framework("pelix.ipopo.core") as context:
+        ipopo = constants.get_ipopo_svc_ref(context)[1]
+        ipopo.register_factory(context, memory_benchmark._make_factory())
+        names = ["component-{0}".format(idx) for idx in range(instances)]
+
+        start = time.time()
+        for name in names:
+            ipopo.instantiate(memory_benchmark.FACTORY, name)
+        instantiate = _per_op(start, instances)
+
+        start = time.time()
+        for name in names:
+            ipopo.kill(name)
+        kill = _per_op(start, instances)
+
+    return {"instantiate_us": instantiate, "kill_us": kill}
+
+
+@scenario(providers=500, consumers=10)
+def aggregate_churn(providers, consumers):
+    """
+    Registration and unregistration of services injected in aggregate
+    dependencies
+    """
+    @decorators.ComponentFactory("aggregate-benchmark-consumer")
+    @decorators.Requires("_services", "benchmark.aggregate", aggregate=True,
+                         optional=True)
+    class Consumer(object):
+        """
+        Aggregate consumer
+        """
+        pass
+
+    with _Framework("pelix.ipopo.core") as context:
+        ipopo = constants.get_ipopo_svc_ref(context)[1]
+        ipopo.register_factory(context, Consumer)
+        for idx in range(consumers):
+            ipopo.instantiate("aggregate-benchmark-consumer",
+                              "consumer-{0}".format(idx))
+
+        start = time.time()
+        registrations = [context.register_service("benchmark.aggregate",
+                                                  object(), {})
+                         for _ in range(providers)]
+        bind = _per_op(start, providers)
+
+        start = time.time()
+        for registration in registrations:
+            registration.unregister()
+        unbind = _per_op(start, providers)
+
+    return {"bind_us": bind, "unbind_us": unbind}
+
+
+@scenario(bundles=100)
+def framework_boot(bundles):
+    """
+    Start and stop of a framework with generated bundles
+    """
+    directory = tempfile.mkdtemp()
+    sys.path.insert(0, directory)
+    names = ["benchmark_boot_bundle_{0}".format(idx)
+             for idx in range(bundles)]
+    try:
+        for idx, name in enumerate(names):
+            with open(os.path.join(directory, name + ".py"), "w") as fp:
+                fp.write(BUNDLE_TEMPLATE.format(idx=idx))
+
+        start = time.time()
+        framework = FrameworkFactory.get_framework()
+        framework.start()
+        context = framework.get_bundle_context()
+        for name in names:
+            context.install_bundle(name).start()
+        boot = time.time() - start
+
+        start = time.time()
+        framework.stop()
+        FrameworkFactory.delete_framework(framework)
+        stop = time.time() - start
+
+    finally:
+        for name in names:
+            sys.modules.pop(name, None)
+        sys.path.remove(directory)
+        shutil.rmtree(directory)
+
+    return {"boot_us": boot * 1e6 / max(bundles, 1),
+            "stop_us": stop * 1e6 / max(bundles, 1)}
+
+
+@scenario(events=10000, handlers=10)
+def eventadmin(events, handlers):
+    """
+    Events sent synchronously and posted by the EventAdmin service
+    """
+    class Handler(object):
+        """
+        Counting event handler
+        """
+        def __init__(self):
+            self.count = 0
+
+        def handle_event(self, topic, properties):
+            self.count += 1
+
+    with _Framework("pelix.ipopo.core", "pelix.services.eventadmin") \
+            as context:
+        ipopo = constants.get_ipopo_svc_ref(context)[1]
+        ipopo.instantiate(pelix.services.FACTORY_EVENT_ADMIN, "event-admin")
+        all_handlers = []
+        for idx in range(handlers):
+            handler = Handler()
+            all_handlers.append(handler)
+            context.register_service(pelix.services.SERVICE_EVENT_HANDLER,
+                                     handler,
+                                     {pelix.services.PROP_EVENT_TOPICS:
+                                      ["benchmark/{0}/*".format(idx % 2),
+                                       "benchmark/all"]})
+
+        event_admin = context.get_service(context.get_service_reference(
+                                        pelix.services.SERVICE_EVENT_ADMIN))
+
+        start = time.time()
+        for idx in range(events):
+            event_admin.send("benchmark/{0}/event".format(idx % 2))
+        send = _per_op(start, events)
+
+        # Post the same events, until they are all delivered
+        expected = 2 * sum(handler.count for handler in all_handlers)
+        start = time.time()
+        for idx in range(events):
+            event_admin.post("benchmark/{0}/event".format(idx % 2))
+
+        while sum(handler.count for handler in all_handlers) < expected:
+            time.sleep(.001)
+        post = _per_op(start, events)
+
+    return {"send_us": send, "post_us": post}
+
+
+@scenario(tasks=20000, producers=4, threads=4, batch=100)
+def threadpool(tasks, producers, threads, batch):
+    """
+    Thread pool throughput with concurrent producers
+    """
+    metrics = {}
+    for mode, (submit, total) in threadpool_benchmark.run(
+                                tasks, producers, threads, batch).items():
+        metrics[mode + "_submit_us"] = submit
+        metrics[mode + "_total_us"] = total
+
+    return metrics
+
+
+@scenario(factories=1000)
+def ipopo_import(factories):
+    """
+    Import and registration of a module defining many component factories
+    """
+    result = import_benchmark.run(factories)
+    return {"import_us": result["import"] * 1e6 / max(factories, 1),
+            "register_us": result["register"] * 1e6 / max(factories, 1)}
+
+
+@scenario(instances=10000)
+def ipopo_memory(instances):
+    """
+    Memory used by living and killed component instances (tracemalloc)
+    """
+    if memory_benchmark.tracemalloc is None:
+        raise ValueError("The tracemalloc module is required")
+
+    result = memory_benchmark.run(instances)
+    return {"alive_bytes": result["alive"], "leaked_bytes": result["leaked"]}
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -- Content-Encoding: UTF-8 --
+"""
+Thread pool benchmark: measures the throughput of the task submission,
+with concurrent producers, one task at a time, without FutureResult
+(fire-and-forget) and in batches.
+
+The modes missing in the tested version of the thread pool are skipped, so
+that the results of two versions can be compared by the benchmarks runner.
+
+Usage::
+
+    python -m tests.benchmarks.threadpool_throughput [-n TASKS] [-p PRODUCERS]
+                                                     [-t THREADS] [-b BATCH]
+
+:author: Thomas Calmant
+"""
+
+# Pelix
+import pelix.threadpool
+
+# Standard library
+import argparse
+import sys
+import threading
+import time
+
+# ------------------------------------------------------------------------------
+
+__version__ = "1.0.0"
+
+# Documentation strings format
+__docformat__ = "restructuredtext en"
+
+# ------------------------------------------------------------------------------
+
+def _noop(value):
+    """
+    The benchmark task
+    """
+    return value
+
+
+def _measure(nb_tasks, nb_producers, nb_threads, submit):
+    """
+    Runs the producers and waits for all their tasks to be executed
+
+    :param nb_tasks: Number of tasks per producer
+    :param nb_producers: Number of producer threads
+    :param nb_threads: Size of the pool
+    :param submit: Method called by each producer as submit(pool, nb_tasks)
+    :return: A (submission, total) tuple: the time spent by a producer per
+             submitted task and the time per executed task, in microseconds
+    """
+    pool = pelix.threadpool.ThreadPool(nb_threads, logname="benchmark")
+    pool.start()
+    try:
+        barrier = threading.Event()
+        durations = []
+
+        def producer():
+            """
+            Submits the tasks
+            """
+            barrier.wait()
+            start = time.time()
+            submit(pool, nb_tasks)
+            durations.append(time.time() - start)
+
+        producers = [threading.Thread(target=producer)
+                     for _ in range(nb_producers)]
+        for thread in producers:
+            thread.start()
+
+        start = time.time()
+        barrier.set()
+        for thread in producers:
+            thread.join()
+        pool.join()
+        total = time.time() - start
+
+    finally:
+        pool.stop()
+
+    return (max(durations) * 1e6 / nb_tasks,
+            total * 1e6 / (nb_tasks * nb_producers))
+
+
+def _enqueue(pool, nb_tasks):
+    """
+    Submits tasks one at a time
+    """
+    for idx in range(nb_tasks):
+        pool.enqueue(_noop, idx)
+
+
+def _fire_and_forget(pool, nb_tasks):
+    """
+    Submits tasks one at a time, without FutureResult
+    """
+    for idx in range(nb_tasks):
+        pool.enqueue_task(_noop, (idx,), fire_and_forget=True)
+
+
+def run(nb_tasks, nb_producers, nb_threads, batch_size):
+    """
+    Submits tasks in the available modes
+
+    :param nb_tasks: Number of tasks per producer
+    :param nb_producers: Number of producer threads
+    :param nb_threads: Size of the pool
+    :param batch_size: Number of tasks per call to enqueue_many()
+    :return: A dictionary: mode -> (submission, total) times per task, in
+             microseconds. Modes: "enqueue", "fire_and_forget", "enqueue_many"
+    """
+    results = {"enqueue": _measure(nb_tasks, nb_producers, nb_threads,
+                                   _enqueue)}
+
+    if hasattr(pelix.threadpool.ThreadPool, "enqueue_many"):
+        def enqueue_many(pool, nb_tasks):
+            """
+            Submits tasks in batches, without FutureResult
+            """
+            for first in range(0, nb_tasks, batch_size):
+                pool.enqueue_many(_noop, ((idx,) for idx in
+                                          range(first, min(first + batch_size,
+                                                           nb_tasks))),
+                                  fire_and_forget=True)
+
+        results["fire_and_forget"] = _measure(nb_tasks, nb_producers,
+                                              nb_threads, _fire_and_forget)
+        results["enqueue_many"] = _measure(nb_tasks, nb_producers,
+                                           nb_threads, enqueue_many)
+
+    return results
+
+
+def main(argv=None):
+    """
+    Entry point
+
+    :param argv: Program arguments
+    :return: An exit code
+    """
+    parser = argparse.ArgumentParser(description="Thread pool benchmark")
+    parser.add_argument("-n", "--tasks", type=int, default=20000,
+                        help="Number of tasks per producer")
+    parser.add_argument("-p", "--producers", type=int, default=4,
+                        help="Number of producer threads")
+    parser.add_argument("-t", "--threads", type=int, default=4,
+                        help="Size of the thread pool")
+    parser.add_argument("-b", "--batch", type=int, default=100,
+                        help="Size of the batches of enqueue_many()")
+    args = parser.parse_args(argv)
+
+    results = run(args.tasks, args.producers, args.threads, args.batch)
+    print("Tasks.............: {0} x {1} producers"
+          .format(args.tasks, args.producers))
+    for mode in ("enqueue", "fire_and_forget", "enqueue_many"):
+        if mode in results:
+            print("{0:.<18}: submit {1:.3f}us/task, total {2:.3f}us/task"
+                  .format(mode, *results[mode]))
+    return 0
+
+# ------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,368 @@
+#!/usr/bin/env python
+# -- Content-Encoding: UTF-8 --
+"""
+EventAdmin tests
+
+:author: Thomas Calmant
+"""
+
+import pelix.framework
+import pelix.ipopo.constants as constants
+import pelix.services as services
+
+import threading
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+# ------------------------------------------------------------------------------
+
+__version__ = (1, 0, 0)
+
+# Documentation strings format
+__docformat__ = "restructuredtext en"
+
+# ------------------------------------------------------------------------------
+
+class Handler(object):
+    """
+    Event handler storing the received events
+    """
+    def __init__(self):
+        """
+        Sets up members
+        """
+        self.events = []
+
+
+    def handle_event(self, topic, properties):
+        """
+        Stores an event
+        """
+        self.events.append((topic, properties))
+
+
+    def pop_topics(self):
+        """
+        Returns and clears the topics of the received events
+        """
+        topics = [topic for topic, _ in self.events]
+        del self.events[:]
+        return topics
+
+# ------------------------------------------------------------------------------
+
+class EventAdminTest(unittest.TestCase):
+    """
+    Tests the EventAdmin service
+    """
+    def setUp(self):
+        """
+        Starts a framework and instantiates an EventAdmin
+        """
+        self.framework = pelix.framework.create_framework(
+                            ['pelix.ipopo.core', 'pelix.services.eventadmin'])
+        self.framework.start()
+        self.context = self.framework.get_bundle_context()
+
+        ipopo = constants.get_ipopo_svc_ref(self.context)[1]
+        self.eventadmin = ipopo.instantiate(services.FACTORY_EVENT_ADMIN,
+                                            "event-admin")
+
+
+    def tearDown(self):
+        """
+        Stops the framework
+        """
+        self.framework.stop()
+        pelix.framework.FrameworkFactory.delete_framework(self.framework)
+
+
+    def _register(self, topics, ldap_filter=None, ranking=None,
+                  delivery=None, handler=None):
+        """
+        Registers an event handler
+
+        :return: A (handler, registration) tuple
+        """
+        properties = {services.PROP_EVENT_TOPICS: topics}
+        if delivery is not None:
+            properties[services.PROP_EVENT_DELIVERY] = delivery
+
+        if ldap_filter is not None:
+            properties[services.PROP_EVENT_FILTER] = ldap_filter
+
+        if ranking is not None:
+            properties[pelix.framework.SERVICE_RANKING] = ranking
+
+        if handler is None:
+            handler = Handler()
+
+        return handler, self.context.register_service(
+                                services.SERVICE_EVENT_HANDLER, handler,
+                                properties)
+
+
+    def testTopics(self):
+        """
+        Tests the selection of the handlers according to their topics
+        """
+        exact = self._register(["pelix/test"])[0]
+        subtopics = self._register(["pelix/*"])[0]
+        everything = self._register("*")[0]
+        pattern = self._register(["pelix/te?t", "*/other",
+                                  "pelix/[ab]*/c"])[0]
+
+        for topic in ("pelix/test", "pelix/tent", "pelix", "pelix/",
+                      "pelix/test/sub", "foo/other", "pelix/a/b/c", "other"):
+            self.eventadmin.send(topic)
+
+        self.assertEqual(exact.pop_topics(), ["pelix/test"])
+        self.assertEqual(subtopics.pop_topics(),
+                         ["pelix/test", "pelix/tent", "pelix/",
+                          "pelix/test/sub", "pelix/a/b/c"])
+        self.assertEqual(everything.pop_topics(),
+                         ["pelix/test", "pelix/tent", "pelix", "pelix/",
+                          "pelix/test/sub", "foo/other", "pelix/a/b/c",
+                          "other"])
+        self.assertEqual(pattern.pop_topics(),
+                         ["pelix/test", "pelix/tent", "foo/other",
+                          "pelix/a/b/c"])
+
+
+    def testFilter(self):
+        """
+        Tests the filter of the handlers
+        """
+        handler = self._register(["test"], "(answer=42)")[0]
+        invalid = self._register(["test"], "(invalid")[0]
+
+        self.eventadmin.send("test", {"answer": 0})
+        self.eventadmin.send("test", {"answer": 42})
+        self.assertEqual([properties["answer"]
+                          for _, properties in handler.events], [42])
+        self.assertEqual(invalid.events, [])
+
+
+    def testUpdates(self):
+        """
+        Tests the update of the handlers index
+        """
+        handler, registration = self._register(["a/b"])
+
+        # Modified topics
+        registration.set_properties({services.PROP_EVENT_TOPICS: ["a/c"]})
+        self.eventadmin.send("a/b")
+        self.eventadmin.send("a/c")
+        self.assertEqual(handler.pop_topics(), ["a/c"])
+
+        # Unregistered handler
+        registration.unregister()
+        self.eventadmin.send("a/c")
+        self.assertEqual(handler.pop_topics(), [])
+
+        # Handler registered before the EventAdmin
+        ipopo = constants.get_ipopo_svc_ref(self.context)[1]
+        ipopo.kill("event-admin")
+        handler = self._register(["a/*"])[0]
+        self.eventadmin = ipopo.instantiate(services.FACTORY_EVENT_ADMIN,
+                                            "event-admin")
+        self.eventadmin.send("a/b")
+        self.assertEqual(handler.pop_topics(), ["a/b"])
+
+
+    def testRanking(self):
+        """
+        Tests the order of notification of the handlers: the one of the
+        service registry
+        """
+        order = []
+        for ranking in (0, 10, -5):
+            handler = self._register(["test"], ranking=ranking)[0]
+            handler.handle_event = lambda topic, props, ranking=ranking: \
+                                        order.append(ranking)
+
+        self.eventadmin.send("test")
+        self.assertEqual(order, [svc_ref.get_property(
+                                            pelix.framework.SERVICE_RANKING)
+                                 for svc_ref in
+                                 self.context.get_all_service_references(
+                                        services.SERVICE_EVENT_HANDLER)])
+
+
+    def testHeldServices(self):
+        """
+        Tests the usage of the handler services
+        """
+        bundle = self.framework.get_bundle_by_name("pelix.services.eventadmin")
+        calls = []
+
+        class Factory(object):
+            """
+            Service factory of handlers
+            """
+            def get_service(self, bundle, registration):
+                calls.append("get")
+                return Handler()
+
+            def unget_service(self, bundle, registration, service):
+                calls.append("unget")
+
+        registration = self.context.register_service(
+                                services.SERVICE_EVENT_HANDLER, Factory(),
+                                {services.PROP_EVENT_TOPICS: ["test"]},
+                                factory=True)
+        svc_ref = registration.get_reference()
+
+        # The service is kept while the handler is registered
+        for _ in range(3):
+            self.eventadmin.send("test")
+
+        self.assertEqual(calls, ["get"])
+        self.assertIn(bundle, svc_ref.get_using_bundles())
+
+        # ... and released when it is unregistered
+        registration.unregister()
+        self.assertEqual(calls, ["get", "unget"])
+        self.assertNotIn(bundle, svc_ref.get_using_bundles())
+
+        # ... or when the EventAdmin is invalidated
+        registration = self._register(["test"])[1]
+        svc_ref = registration.get_reference()
+        self.assertIn(bundle, svc_ref.get_using_bundles())
+
+        constants.get_ipopo_svc_ref(self.context)[1].kill("event-admin")
+        self.assertNotIn(bundle, svc_ref.get_using_bundles())
+
+
+    def testReentrantHandler(self):
+        """
+        Tests a handler service factory registering another handler
+        """
+        context = self.context
+        registrations = []
+
+        class Factory(object):
+            """
+            Service factory registering a handler on first use
+            """
+            def get_service(self, bundle, registration):
+                registrations.append(context.register_service(
+                                    services.SERVICE_EVENT_HANDLER, Handler(),
+                                    {services.PROP_EVENT_TOPICS: ["test"]}))
+                return Handler()
+
+            def unget_service(self, bundle, registration, service):
+                pass
+
+        thread = threading.Thread(target=context.register_service,
+                                  args=(services.SERVICE_EVENT_HANDLER,
+                                        Factory(),
+                                        {services.PROP_EVENT_TOPICS: ["test"]}),
+                                  kwargs={"factory": True})
+        thread.daemon = True
+        thread.start()
+        thread.join(5)
+        self.assertFalse(thread.is_alive(), "Handler registration deadlocked")
+
+        # The handler registered by the factory is indexed
+        self.assertEqual(len(registrations), 1)
+        inner = context.get_service(registrations[0].get_reference())
+        self.eventadmin.send("test")
+        self.assertEqual(inner.pop_topics(), ["test"])
+
+
+    def testOrderedPost(self):
+        """
+        Tests the ordered delivery of posted events
+        """
+        lock = threading.Lock()
+        active = [0]
+        overlaps = []
+        done = threading.Event()
+
+        class SlowHandler(Handler):
+            """
+            Handler checking it is not notified concurrently
+            """
+            def handle_event(self, topic, properties):
+                with lock:
+                    active[0] += 1
+                    if active[0] > 1:
+                        overlaps.append(topic)
+
+                threading.Event().wait(.001)
+                Handler.handle_event(self, topic, properties)
+
+                with lock:
+                    active[0] -= 1
+
+                if len(self.events) == 50:
+                    done.set()
+
+        handler = self._register(["test"], handler=SlowHandler())[0]
+        for idx in range(50):
+            self.eventadmin.post("test", {"idx": idx})
+
+        self.assertTrue(done.wait(5))
+        self.assertEqual([properties["idx"]
+                          for _, properties in handler.events],
+                         list(range(50)))
+        self.assertEqual(overlaps, [])
+
+
+    def testParallelPost(self):
+        """
+        Tests the parallel delivery of posted events to different handlers
+        and to unordered handlers
+        """
+        unblocked = []
+
+        class BlockingHandler(Handler):
+            """
+            Handler blocked until the release event is set
+            """
+            def __init__(self, release):
+                Handler.__init__(self)
+                self.release = release
+
+            def handle_event(self, topic, properties):
+                if properties.get("release"):
+                    self.release.set()
+
+                else:
+                    unblocked.append(self.release.wait(5))
+
+                Handler.handle_event(self, topic, properties)
+
+        # Handlers are notified in parallel: the second one releases the
+        # first one
+        release = threading.Event()
+        blocking = self._register(["a"], handler=BlockingHandler(release))[0]
+        self._register(["b"], handler=BlockingHandler(release))
+        self.eventadmin.post("a")
+        self.eventadmin.post("b", {"release": True})
+
+        # An unordered handler is notified concurrently: the second event
+        # releases the first one
+        unordered = self._register(
+                        ["c"], handler=BlockingHandler(threading.Event()),
+                        delivery=services.EVENT_DELIVERY_ASYNC_UNORDERED)[0]
+        self.eventadmin.post("c")
+        self.eventadmin.post("c", {"release": True})
+
+        for _ in range(100):
+            if len(unblocked) == 2 and len(unordered.events) == 2:
+                break
+            threading.Event().wait(.05)
+
+        self.assertEqual(unblocked, [True, True])
+        self.assertEqual(blocking.pop_topics(), ["a"])
+        self.assertEqual(unordered.pop_topics(), ["c", "c"])
+
+# ------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# -- Content-Encoding: UTF-8 --
+"""
+Coroutines used by the event loop tests.
+
+This module uses the ``async def`` syntax (Python 3.5+): it must only be
+imported when it is available.
+
+:author: Thomas Calmant
+"""
+
+# Pelix
+import pelix.ipopo.decorators as decorators
+
+# Standard library
+import asyncio
+import threading
+
+# ------------------------------------------------------------------------------
+
+__version__ = (1, 0, 0)
+
+# Documentation strings format
+__docformat__ = "restructuredtext en"
+
+# ------------------------------------------------------------------------------
+
+async def compute(value):
+    """
+    Returns the name of the current thread and the double of the given value
+    """
+    await asyncio.sleep(.01)
+    return threading.current_thread().name, value * 2
+
+
+async def fail():
+    """
+    Raises a KeyError
+    """
+    raise KeyError("error")
+
+
+async def wait_reference(service, context, specification, ldap_filter=None):
+    """
+    Waits for a service reference with the event loop service
+    """
+    return await service.wait_for_service(context, specification, ldap_filter)
+
+
+async def wait_service(service, context, specification, ldap_filter=None):
+    """
+    Waits for a service with the event loop service
+    """
+    return await service.get_service(context, specification, ldap_filter)
+
+
+async def wait_service_timeout(service, context, specification, timeout):
+    """
+    Waits for a service with the event loop service, up to the given timeout.
+    Returns None on timeout.
+    """
+    try:
+        return await asyncio.wait_for(
+                            service.get_service(context, specification),
+                            timeout)
+
+    except asyncio.TimeoutError:
+        return None
+
+
+class Listener(object):
+    """
+    Service listener coroutine, storing the events and the threads notifying
+    them
+    """
+    def __init__(self, last_kind):
+        """
+        :param last_kind: Kind of the last expected event
+        """
+        self.events = []
+        self.done = threading.Event()
+        self.__last_kind = last_kind
+
+
+    async def service_changed(self, event):
+        """
+        Stores a service event
+        """
+        await asyncio.sleep(0)
+        self.events.append((event.get_kind(),
+                            threading.current_thread().name))
+        if event.get_kind() == self.__last_kind:
+            self.done.set()
+
+
+def make_component(factory_name, validated, bound):
+    """
+    Defines a component factory with coroutine callbacks
+
+    :param factory_name: Name of the factory
+    :param validated: An asyncio.Event set at the end of the validation
+    :param bound: A list filled with the names of the threads calling bind
+    :return: The component class
+    """
+    @decorators.ComponentFactory(factory_name)
+    @decorators.Requires("_svc", "test.svc", optional=True)
+    @decorators.Provides("test.coroutine")
+    class Component(object):
+        """
+        Component with coroutine callbacks
+        """
+        @decorators.Validate
+        async def validate(self, context):
+            await asyncio.sleep(.1)
+            validated.set()
+
+        @decorators.Bind
+        async def bind(self, svc, reference):
+            bound.append(threading.current_thread().name)
+
+    return Component
+
+
+def make_slow_component(factory_name, cancelled):
+    """
+    Defines a component factory with a coroutine validation callback which
+    never ends
+
+    :param factory_name: Name of the factory
+    :param cancelled: A threading.Event set when the validation is cancelled
+    :return: The component class
+    """
+    @decorators.ComponentFactory(factory_name)
+    @decorators.Provides("test.coroutine")
+    class Component(object):
+        """
+        Component with a coroutine validation callback
+        """
+        @decorators.Validate
+        async def validate(self, context):
+            try:
+                await asyncio.sleep(60)
+
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+    return Component
@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+# -- Content-Encoding: UTF-8 --
+"""
+Tests the asyncio event loop service and the coroutine callbacks of iPOPO
+
+:author: Thomas Calmant
+"""
+
+# Pelix
+from pelix.framework import FrameworkFactory, ServiceEvent
+from pelix.ipopo.instance import StoredInstance
+import pelix.ipopo.constants as constants
+import pelix.services as services
+
+# Tests
+from tests import log_on, log_off
+
+# Standard library
+import threading
+
+try:
+    import asyncio
+
+    # Coroutines are defined in a separate module, as their syntax can't be
+    # compiled by Python 2
+    import tests.eventloop_coroutines as coroutines
+
+except (ImportError, SyntaxError):
+    # Python < 3.5
+    asyncio = None
+
+# Tests
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+# ------------------------------------------------------------------------------
+
+__version__ = (1, 0, 0)
+
+# Documentation strings format
+__docformat__ = "restructuredtext en"
+
+# ------------------------------------------------------------------------------
+
+@unittest.skipIf(asyncio is None, "asyncio is not available")
+class EventLoopTest(unittest.TestCase):
+    """
+    Tests the event loop service
+    """
+    def setUp(self):
+        """
+        Starts a framework with the event loop and iPOPO bundles
+        """
+        self.framework = FrameworkFactory.get_framework()
+        self.framework.start()
+        self.context = self.framework.get_bundle_context()
+        self.context.install_bundle("pelix.services.eventloop").start()
+        self.ipopo = self.context.install_bundle("pelix.ipopo.core")
+        self.ipopo.start()
+
+        reference = self.context.get_service_reference(
+                                                services.SERVICE_EVENT_LOOP)
+        self.service = self.context.get_service(reference)
+
+
+    def tearDown(self):
+        """
+        Stops the framework
+        """
+        self.framework.stop()
+        FrameworkFactory.delete_framework(self.framework)
+
+
+    def testRunCoroutine(self):
+        """
+        Tests the execution of coroutines from other threads
+        """
+        future = self.service.run_coroutine(coroutines.compute(21))
+        self.assertEqual(future.result(1), ("pelix-eventloop", 42))
+
+        self.assertRaises(KeyError,
+                          self.service.run_coroutine(coroutines.fail()).result,
+                          1)
+
+
+    def testWaitForService(self):
+        """
+        Tests the coroutines waiting for services
+        """
+        # Service registered before the call
+        svc = object()
+        registration = self.context.register_service("test.svc", svc,
+                                                     {"answer": 0})
+        reference, found = self.service.run_coroutine(
+                                coroutines.wait_service(self.service,
+                                                        self.context,
+                                                        "test.svc")).result(1)
+        self.assertIs(reference, registration.get_reference())
+        self.assertIs(found, svc)
+        self.context.unget_service(reference)
+
+        # Service matching after the call
+        future = self.service.run_coroutine(
+                        coroutines.wait_reference(self.service, self.context,
+                                                  "test.svc", "(answer=42)"))
+        self.assertRaises(OSError, future.result, .1)
+        registration.set_properties({"answer": 42})
+        self.assertIs(future.result(1), registration.get_reference())
+
+
+    def testWaitForServiceCancelled(self):
+        """
+        Tests the removal of the service listener when the caller stops
+        waiting for a service
+        """
+        listeners = self.framework._dispatcher._EventDispatcher__svc_listeners
+        self.assertIsNone(self.service.run_coroutine(
+                            coroutines.wait_service_timeout(
+                                self.service, self.context, "missing.spec",
+                                .1)).result(1))
+
+        # The listener is removed by a callback of the event loop
+        for _ in range(10):
+            if "missing.spec" not in listeners:
+                break
+            threading.Event().wait(.05)
+        else:
+            self.fail("Service listener not removed")
+
+        # Stopped event loop
+        self.framework.get_bundle_by_name("pelix.services.eventloop").stop()
+        self.assertRaises(ValueError, self.service.wait_for_service,
+                          self.context, "missing.spec")
+        self.assertRaises(ValueError, self.service.get_service,
+                          self.context, "missing.spec")
+
+
+    def testServiceListener(self):
+        """
+        Tests the service listeners called in the event loop
+        """
+        listener = coroutines.Listener(ServiceEvent.UNREGISTERING)
+        self.assertTrue(self.service.add_service_listener(
+                                        self.context, listener, None,
+                                        "test.svc"))
+        self.assertFalse(self.service.add_service_listener(self.context,
+                                                           listener))
+
+        self.context.register_service("test.svc", object(), {}).unregister()
+        self.assertTrue(listener.done.wait(1))
+        self.assertEqual(listener.events,
+                         [(ServiceEvent.REGISTERED, "pelix-eventloop"),
+                          (ServiceEvent.UNREGISTERING, "pelix-eventloop")])
+
+        self.assertTrue(self.service.remove_service_listener(self.context,
+                                                             listener))
+        self.assertFalse(self.service.remove_service_listener(self.context,
+                                                              listener))
+
+
+    def testCoroutineCallbacks(self):
+        """
+        Tests the iPOPO callbacks defined as coroutines
+        """
+        validated = asyncio.Event()
+        bound = []
+        component = coroutines.make_component("coroutine-factory", validated,
+                                              bound)
+
+        ipopo = constants.get_ipopo_svc_ref(self.context)[1]
+        ipopo.register_factory(self.context, component)
+        ipopo.instantiate("coroutine-factory", "component")
+
+        # The service is registered once the coroutine completes
+        self.assertIsNone(self.context.get_service_reference(
+                                                        "test.coroutine"))
+        self.service.run_coroutine(validated.wait()).result(1)
+
+        for _ in range(10):
+            if self.context.get_service_reference("test.coroutine"):
+                break
+            threading.Event().wait(.05)
+        else:
+            self.fail("Component not validated")
+
+        self.context.register_service("test.svc", object(), {})
+        for _ in range(10):
+            if bound:
+                break
+            threading.Event().wait(.05)
+
+        self.assertEqual(bound, ["pelix-eventloop"])
+
+
+    def testCoroutineValidationTimeout(self):
+        """
+        Tests the cancellation of a coroutine validation callback which
+        doesn't end before the validation timeout
+        """
+        cancelled = threading.Event()
+        component = coroutines.make_slow_component("slow-factory", cancelled)
+
+        ipopo = constants.get_ipopo_svc_ref(self.context)[1]
+        ipopo.register_factory(self.context, component)
+
+        log_off()
+        try:
+            ipopo.instantiate("slow-factory", "component",
+                              {constants.IPOPO_VALIDATION_TIMEOUT: .2})
+            self.assertTrue(cancelled.wait(5))
+        finally:
+            log_on()
+
+        self.assertIsNone(self.context.get_service_reference(
+                                                        "test.coroutine"))
+        for _ in range(10):
+            if ipopo.get_instance_details("component")["state"] \
+                    == StoredInstance.ERRONEOUS:
+                break
+            threading.Event().wait(.05)
+        else:
+            self.fail("Component not erroneous")
+
+# ------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,7 +7,10 @@ iPOPO test module. Tests both the iPOPO core module and decorators
 """
 
 from pelix.ipopo.constants import IPopoEvent
-from pelix.framework import FrameworkFactory, Bundle, BundleContext
+from pelix.framework import FrameworkFactory, Bundle, BundleContext, \
+    BundleException
+from pelix.ipopo.instance import StoredInstance
+from pelix.threadpool import FutureResult
 
 from tests import log_on, log_off
 from tests.interfaces import IEchoService
@@ -17,8 +20,12 @@ import pelix.ipopo.decorators as decorators
 import pelix.ipopo.contexts as contexts
 import pelix.framework as pelix
 
+import gc
 import logging
 import os
+import threading
+import time
+import weakref
 
 try:
     import unittest2 as unittest
@@ -160,6 +167,53 @@ class DecoratorsTest(unittest.TestCase):
                 self.assertRaises(TypeError, decorator, bad)
 
 
+    def testLazyCallbacks(self):
+        """
+        Tests the computation of the callbacks on the factory registration
+        """
+        @decorators.ComponentFactory("lazy-parent")
+        class Parent(object):
+            @decorators.Validate
+            def validate(self, context):
+                pass
+
+            @decorators.Invalidate
+            def invalidate(self, context):
+                pass
+
+        @decorators.ComponentFactory("lazy-child")
+        class Child(Parent):
+            # Overridden without decorator: the parent callback is kept
+            def validate(self, context):
+                pass
+
+            @decorators.BindField("_field")
+            def bind_field(self, field, svc, svc_ref):
+                pass
+
+        parent_context = decorators._get_factory_context(Parent)
+        child_context = decorators._get_factory_context(Child)
+
+        # Nothing computed yet
+        for context in (parent_context, child_context):
+            self.assertFalse(context.callbacks_ready)
+            self.assertEqual(context.callbacks, {})
+
+        # Registering the child computes the parent callbacks first
+        self.ipopo.register_factory(self.framework.get_bundle_context(), Child)
+        self.assertTrue(parent_context.callbacks_ready)
+        self.assertTrue(child_context.callbacks_ready)
+
+        self.assertEqual(parent_context.callbacks,
+                    {constants.IPOPO_CALLBACK_VALIDATE: Parent.validate,
+                     constants.IPOPO_CALLBACK_INVALIDATE: Parent.invalidate})
+        self.assertEqual(child_context.callbacks, parent_context.callbacks)
+        self.assertEqual(child_context.field_callbacks,
+                         {"_field": {constants.IPOPO_CALLBACK_BIND_FIELD:
+                                     Child.bind_field}})
+        self.assertEqual(parent_context.field_callbacks, {})
+
+
     def testComponentFactory(self):
         """
         Tests the @decorators.ComponentFactory decorator
@@ -886,6 +940,125 @@ class ProvidesTest(unittest.TestCase):
             except:
                 pass
 
+
+    def testBatchProperties(self):
+        """
+        Tests the properties batch: a single service event for all changes
+        """
+        context = self.framework.get_bundle_context()
+
+        @decorators.ComponentFactory("batch-factory")
+        @decorators.Provides("batch.provided")
+        @decorators.Property("_a", "prop.a", 1)
+        @decorators.Property("_b", "prop.b", 2)
+        @decorators.Property("_c", "prop.c", 3)
+        class Component(object):
+            """
+            Component updating its properties in a batch
+            """
+            pass
+
+        self.ipopo.register_factory(context, Component)
+        component = self.ipopo.instantiate("batch-factory", "batch")
+        svc_ref = context.get_service_reference("batch.provided")
+
+        # Count the service events
+        events = []
+
+        class Listener(object):
+            def service_changed(self, event):
+                events.append(event.get_kind())
+
+        listener = Listener()
+        context.add_service_listener(listener, None, "batch.provided")
+
+        # Without batch: one event per property
+        component._a = 10
+        component._b = 20
+        self.assertEqual(len(events), 2)
+
+        # With a batch: one event at the end of the outermost batch
+        del events[:]
+        with component._ipopo_batch():
+            component._a = 100
+            with component._ipopo_batch():
+                component._b = 200
+                component._c = 300
+
+            self.assertEqual(events, [])
+            self.assertEqual(svc_ref.get_property("prop.c"), 3)
+
+        self.assertEqual(events, [pelix.ServiceEvent.MODIFIED])
+        self.assertEqual(svc_ref.get_property("prop.a"), 100)
+        self.assertEqual(svc_ref.get_property("prop.b"), 200)
+        self.assertEqual(svc_ref.get_property("prop.c"), 300)
+
+        # Values set back to their previous value: no event
+        del events[:]
+        with component._ipopo_batch():
+            component._a = 1
+            component._a = 100
+
+        self.assertEqual(events, [])
+
+        context.remove_service_listener(listener)
+        self.ipopo.kill("batch")
+
+
+    def testServiceFactory(self):
+        """
+        Tests a component providing a (prototype) service factory
+        """
+        context = self.framework.get_bundle_context()
+
+        # The component must implement the factory methods
+        self.assertRaises(TypeError, decorators.Provides("bad", factory=True),
+                          type("Bad", (object,), {}))
+
+        @decorators.ComponentFactory("service-factory")
+        @decorators.Provides("per.bundle", factory=True)
+        @decorators.Provides("per.call", prototype=True)
+        class Factory(object):
+            """
+            Component creating a service object per consumer
+            """
+            def __init__(self):
+                self.released = []
+
+            def get_service(self, bundle, registration):
+                return {"bundle": bundle}
+
+            def unget_service(self, bundle, registration, service):
+                self.released.append(service)
+
+        self.ipopo.register_factory(context, Factory)
+        component = self.ipopo.instantiate("service-factory", "factory")
+
+        # Bundle scope
+        ref = context.get_service_reference("per.bundle")
+        self.assertEqual(ref.get_property(pelix.SERVICE_SCOPE),
+                         pelix.SCOPE_BUNDLE)
+        service = context.get_service(ref)
+        self.assertEqual(service, {"bundle": self.framework})
+        self.assertIs(context.get_service(ref), service)
+
+        # Prototype scope
+        ref_proto = context.get_service_reference("per.call")
+        self.assertEqual(ref_proto.get_property(pelix.SERVICE_SCOPE),
+                         pelix.SCOPE_PROTOTYPE)
+        objects = context.get_service_objects(ref_proto)
+        svc_1 = objects.get_service()
+        svc_2 = objects.get_service()
+        self.assertIsNot(svc_1, svc_2)
+        objects.unget_service(svc_1)
+        self.assertEqual(len(component.released), 1)
+        self.assertIs(component.released[0], svc_1)
+
+        # Remaining service objects are released on invalidation
+        self.ipopo.kill("factory")
+        self.assertEqual(len(component.released), 3)
+        self.assertIsNone(context.get_service_reference("per.bundle"))
+
 # ------------------------------------------------------------------------------
 
 class RequirementTest(unittest.TestCase):
@@ -1562,6 +1735,47 @@ class SimpleCoreTests(unittest.TestCase):
                             "Should match with filter: {0}".format(props))
 
 
+    def testRequirementFilteredCopy(self):
+        """
+        Tests the cache of filtered copies of a Requirement
+        """
+        Requirement = contexts.Requirement
+        requirement = Requirement("spec", True, True, spec_filter="(a=1)")
+
+        copy_1 = requirement.filtered_copy("(test=True)")
+        self.assertIsNot(copy_1, requirement)
+        self.assertEqual(copy_1.original_filter, "(test=True)")
+        self.assertTrue(copy_1.aggregate)
+        self.assertTrue(copy_1.optional)
+        self.assertEqual(requirement.original_filter, "(a=1)")
+
+        # Same filter: same copy
+        self.assertIs(requirement.filtered_copy("(test=True)"), copy_1)
+        self.assertIsNot(requirement.filtered_copy("(test=False)"), copy_1)
+
+        # Copies are only kept while they are used
+        copy_ref = weakref.ref(copy_1)
+        del copy_1
+        for idx in range(1000):
+            requirement.filtered_copy("(uid={0})".format(idx))
+
+        gc.collect()
+        self.assertIsNone(copy_ref())
+        self.assertEqual(len(requirement._Requirement__filtered), 0)
+
+        # Invalid filters are not cached
+        for invalid in (123, "(invalid"):
+            self.assertRaises((TypeError, ValueError),
+                              requirement.filtered_copy, invalid)
+
+        # Requirements and handlers don't have a dictionary
+        from pelix.ipopo.handlers.provides import ServiceRegistrationHandler
+        from pelix.ipopo.handlers.requires import SimpleDependency
+        for obj in (requirement, SimpleDependency("field", requirement),
+                    ServiceRegistrationHandler(["spec"], None)):
+            self.assertFalse(hasattr(obj, "__dict__"))
+
+
     def testRequirementEquality(self):
         """
         Tests Requirement equality test
@@ -1634,6 +1848,58 @@ class SimpleCoreTests(unittest.TestCase):
         self.assertEqual(context, context_2, "Copy equality error")
         self.assertIsNot(req_1, context_2, "Requirements must be copied")
 
+
+    def testCheckEventWithoutLock(self):
+        """
+        Tests StoredInstance.check_event() while another thread holds the
+        instance lock
+        """
+        from pelix.internals.events import ServiceEvent
+        from pelix.ipopo.handlers.constants import Handler
+        from pelix.ipopo.handlers.provides import ServiceRegistrationHandler
+
+        context = contexts.ComponentContext(contexts.FactoryContext(),
+                                            "name", {})
+        provider = ServiceRegistrationHandler(["spec"], None)
+        stored = StoredInstance(None, context, object(),
+                                [Handler(), provider])
+
+        # Only the provider filters events
+        self.assertEqual(stored._event_checkers, (provider,))
+
+        # Lock the instance in another thread
+        locked = threading.Event()
+        release = threading.Event()
+
+        def hold_lock():
+            with stored._lock:
+                locked.set()
+                release.wait(5)
+
+        thread = threading.Thread(target=hold_lock)
+        thread.start()
+        locked.wait(5)
+
+        try:
+            # Events about other services are accepted
+            event = ServiceEvent(ServiceEvent.REGISTERED, object())
+            self.assertTrue(stored.check_event(event))
+
+            # Events about the provided service are ignored
+            provider._svc_reference = object()
+            event = ServiceEvent(ServiceEvent.REGISTERED,
+                                 provider._svc_reference)
+            self.assertFalse(stored.check_event(event))
+
+        finally:
+            release.set()
+            thread.join()
+
+        # Killed instances ignore everything
+        stored.state = StoredInstance.KILLED
+        event = ServiceEvent(ServiceEvent.REGISTERED, object())
+        self.assertFalse(stored.check_event(event))
+
 # ------------------------------------------------------------------------------
 
 class IPopoServiceTest(unittest.TestCase):
@@ -1859,6 +2125,72 @@ class IPopoServiceTest(unittest.TestCase):
         log_on()
 
 
+    def testDependencyGraph(self):
+        """
+        Tests the dependency graph snapshot
+        """
+        from pelix.shell.ipopo import graph_to_dot
+        import json
+
+        context = self.framework.get_bundle_context()
+
+        @decorators.ComponentFactory("graph-provider")
+        @decorators.Provides("graph.spec")
+        class Provider(object):
+            pass
+
+        @decorators.ComponentFactory("graph-consumer")
+        @decorators.Requires("_svc", "graph.spec")
+        @decorators.Requires("_missing", "graph.missing")
+        class Consumer(object):
+            pass
+
+        for factory in (Provider, Consumer):
+            self.ipopo.register_factory(context, factory)
+
+        # Bundle-provided service
+        context.register_service("graph.spec", object(), {})
+
+        self.ipopo.instantiate("graph-provider", "provider")
+        self.ipopo.instantiate("graph-consumer", "consumer")
+
+        graph = self.ipopo.get_dependency_graph()
+
+        # The result must be convertible to JSON
+        json.dumps(graph)
+
+        instances = dict((node["name"], node) for node in graph["instances"])
+        provider = instances["provider"]
+        consumer = instances["consumer"]
+
+        self.assertEqual(provider["state"], StoredInstance.VALID)
+        self.assertEqual(provider["validations"], 1)
+        self.assertEqual(len(provider["services"]), 1)
+
+        # The consumer is stuck by its missing requirement
+        self.assertEqual(consumer["state"], StoredInstance.INVALID)
+        requirements = dict((req["field"], req)
+                            for req in consumer["requirements"])
+        self.assertEqual(requirements["_missing"]["candidates"], [])
+
+        # ... but bound to one of the two candidates for the other one
+        svc_req = requirements["_svc"]
+        self.assertEqual(len(svc_req["bindings"]), 1)
+        self.assertEqual(svc_req["bindings"][0]["count"], 1)
+        self.assertEqual(len(svc_req["candidates"]), 2)
+        self.assertIn("provider", [candidate["provider"]
+                                   for candidate in svc_req["candidates"]])
+
+        # Both services are described
+        self.assertEqual(len(graph["services"]), 2)
+
+        # DOT conversion
+        dot = graph_to_dot(graph)
+        self.assertTrue(dot.startswith("digraph"))
+        self.assertIn('"missing-consumer-_missing"', dot)
+        self.assertIn('"consumer" -> "provider"', dot)
+
+
     def testIPopoEvents(self):
         """
         Tests iPOPO event listener
@@ -1958,6 +2290,801 @@ class IPopoServiceTest(unittest.TestCase):
 
 # ------------------------------------------------------------------------------
 
+class DeferredRegistrationTest(unittest.TestCase):
+    """
+    Tests the breadth-first validation cascade mode
+    """
+    def setUp(self):
+        """
+        Called before each test. Initiates a framework.
+        """
+        self.framework = FrameworkFactory.get_framework(
+                            {constants.IPOPO_DEFERRED_REGISTRATION: "true"})
+        self.framework.start()
+        self.ipopo = install_ipopo(self.framework)
+
+
+    def tearDown(self):
+        """
+        Called after each test
+        """
+        self.framework.stop()
+        FrameworkFactory.delete_framework(self.framework)
+
+
+    def testLongChain(self):
+        """
+        Validates a long chain of components, which would exceed the recursion
+        limit without the deferred registration
+        """
+        self.assertTrue(self.ipopo.deferred_registration)
+        context = self.framework.get_bundle_context()
+        nb_links = 300
+
+        # Prepare the factories: link N requires link N-1
+        for idx in range(nb_links):
+            class Link(object):
+                pass
+
+            if idx > 0:
+                decorators.Requires("_previous",
+                                    "link.{0}".format(idx - 1))(Link)
+
+            decorators.Provides("link.{0}".format(idx))(Link)
+            decorators.ComponentFactory("link-{0}".format(idx))(Link)
+            self.ipopo.register_factory(context, Link)
+
+        # Instantiate the chain from its end
+        for idx in reversed(range(nb_links)):
+            self.ipopo.instantiate("link-{0}".format(idx),
+                                   "link-{0}".format(idx))
+
+        # All components must be valid, with their service registered
+        for idx in range(nb_links):
+            details = self.ipopo.get_instance_details("link-{0}".format(idx))
+            self.assertEqual(details["state"], StoredInstance.VALID)
+            self.assertEqual(len(details["services"]), 1)
+
+
+    def testRegistrationError(self):
+        """
+        Tests the registration of the services of a cascade when one of them
+        can't be registered
+        """
+        context = self.framework.get_bundle_context()
+
+        # Fail the registration of the "cascade.bad" service
+        register_services = self.framework.register_services
+        batches = []
+
+        def checked_register_services(services, send_event=True):
+            batches.append(len(services))
+            for service in services:
+                if "cascade.bad" in service[1]:
+                    raise pelix.BundleException("Invalid service")
+
+            return register_services(services, send_event)
+
+        self.framework.register_services = checked_register_services
+
+        # Both components are validated by the root service: their services
+        # are registered in the same batch
+        @decorators.ComponentFactory("cascade-root")
+        @decorators.Provides("cascade.root")
+        class Root(object):
+            pass
+
+        @decorators.ComponentFactory("cascade-good")
+        @decorators.Requires("_root", "cascade.root")
+        @decorators.Provides("cascade.good")
+        class Good(object):
+            pass
+
+        @decorators.ComponentFactory("cascade-bad")
+        @decorators.Requires("_root", "cascade.root")
+        @decorators.Provides("cascade.bad")
+        class Bad(object):
+            pass
+
+        for factory in (Root, Good, Bad):
+            self.ipopo.register_factory(context, factory)
+
+        self.ipopo.instantiate("cascade-good", "good")
+        self.ipopo.instantiate("cascade-bad", "bad")
+
+        log_off()
+        try:
+            self.ipopo.instantiate("cascade-root", "root")
+        finally:
+            log_on()
+
+        # The failed batch has been registered service by service
+        self.assertEqual(batches, [1, 2, 1, 1])
+
+        # The valid service is registered
+        details = self.ipopo.get_instance_details("good")
+        self.assertEqual(details["state"], StoredInstance.VALID)
+        self.assertEqual(len(details["services"]), 1)
+        self.assertIsNotNone(context.get_service_reference("cascade.good"))
+        self.assertIsNone(context.get_service_reference("cascade.bad"))
+
+# ------------------------------------------------------------------------------
+
+def wait_for(condition, timeout=5):
+    """
+    Waits for the given condition to become true
+
+    :param condition: A method without argument
+    :param timeout: Maximum time to wait (in seconds)
+    :return: The last result of the condition
+    """
+    end = time.time() + timeout
+    while not condition() and time.time() < end:
+        time.sleep(.01)
+
+    return condition()
+
+
+class AsyncCallbacksTest(unittest.TestCase):
+    """
+    Tests the life-cycle callbacks called by the iPOPO thread pool
+    """
+    def setUp(self):
+        """
+        Called before each test. Initiates a framework.
+        """
+        self.framework = FrameworkFactory.get_framework()
+        self.framework.start()
+        self.ipopo = install_ipopo(self.framework)
+        self.context = self.framework.get_bundle_context()
+
+        # Calls to the component: (callback, injected dependency)
+        self.calls = calls = []
+
+        # Events blocking the callbacks
+        self.validate_event = validate_event = threading.Event()
+        self.invalidate_event = invalidate_event = threading.Event()
+
+        @decorators.ComponentFactory("async-factory")
+        @decorators.Requires("_dep", "async.dependency")
+        @decorators.Provides("async.provided")
+        @decorators.Property("_async", constants.IPOPO_ASYNC_CALLBACKS, True)
+        class Component(object):
+            """
+            Component with slow callbacks
+            """
+            def __init__(self):
+                self._dep = None
+
+            @decorators.Validate
+            def validate(self, context):
+                calls.append(("validate", self._dep))
+                validate_event.wait(5)
+
+            @decorators.Invalidate
+            def invalidate(self, context):
+                calls.append(("invalidate", self._dep))
+                invalidate_event.wait(5)
+
+            @decorators.Unbind
+            def unbind(self, svc, svc_ref):
+                calls.append(("unbind", self._dep))
+
+        self.ipopo.register_factory(self.context, Component)
+
+
+    def tearDown(self):
+        """
+        Called after each test
+        """
+        self.validate_event.set()
+        self.invalidate_event.set()
+        self.framework.stop()
+        FrameworkFactory.delete_framework(self.framework)
+
+
+    def get_state(self, name="async"):
+        """
+        Retrieves the state of the given component
+        """
+        return self.ipopo.get_instance_details(name)["state"]
+
+
+    def testValidation(self):
+        """
+        Tests the asynchronous validation and invalidation
+        """
+        dependency = object()
+        dep_reg = self.context.register_service("async.dependency",
+                                                dependency, {})
+        component = self.ipopo.instantiate("async-factory", "async")
+
+        # The validation callback is running: the instance lock is free
+        self.assertTrue(wait_for(lambda: self.calls))
+        self.assertEqual(self.calls, [("validate", dependency)])
+        self.assertEqual(self.get_state(), StoredInstance.VALIDATING)
+        self.assertIsNone(self.context.get_service_reference("async.provided"))
+
+        # End of the callback: the service is registered
+        self.validate_event.set()
+        self.assertTrue(wait_for(
+                        lambda: self.get_state() == StoredInstance.VALID))
+        svc_ref = self.context.get_service_reference("async.provided")
+        self.assertIs(self.context.get_service(svc_ref), component)
+
+        # Invalidation: the service is unregistered and the dependency stays
+        # injected until the callback returns
+        del self.calls[:]
+        dep_reg.unregister()
+        self.assertEqual(self.get_state(), StoredInstance.INVALIDATING)
+        self.assertIsNone(self.context.get_service_reference("async.provided"))
+        self.assertTrue(wait_for(lambda: self.calls))
+        self.assertIs(component._dep, dependency)
+
+        self.invalidate_event.set()
+        self.assertTrue(wait_for(
+                        lambda: self.get_state() == StoredInstance.INVALID))
+        self.assertEqual(self.calls, [("invalidate", dependency),
+                                      ("unbind", dependency)])
+        self.assertIsNone(component._dep)
+
+        # Validate again
+        del self.calls[:]
+        self.context.register_service("async.dependency", dependency, {})
+        self.assertTrue(wait_for(
+                        lambda: self.get_state() == StoredInstance.VALID))
+        self.assertEqual(self.calls, [("validate", dependency)])
+
+        # Kill: synchronous invalidation
+        del self.calls[:]
+        self.ipopo.kill("async")
+        self.assertEqual(self.calls, [("invalidate", dependency),
+                                      ("unbind", dependency)])
+
+
+    def testKillWhileValidating(self):
+        """
+        Tests the invalidation of a component killed during its validation
+        """
+        dependency = object()
+        self.context.register_service("async.dependency", dependency, {})
+        self.invalidate_event.set()
+        self.ipopo.instantiate("async-factory", "async")
+        self.assertTrue(wait_for(lambda: self.calls))
+
+        # Kill the component while its validation callback is running
+        self.ipopo.kill("async")
+        self.assertFalse(self.ipopo.is_registered_instance("async"))
+        self.assertEqual(self.calls, [("validate", dependency),
+                                      ("unbind", dependency)])
+
+        # The component is invalidated once validated
+        self.validate_event.set()
+        self.assertTrue(wait_for(lambda: len(self.calls) == 3))
+        self.assertEqual(self.calls[2][0], "invalidate")
+        self.assertIsNone(self.context.get_service_reference("async.provided"))
+
+# ------------------------------------------------------------------------------
+
+class ValidationFutureTest(unittest.TestCase):
+    """
+    Tests the validation callbacks returning a future
+    """
+    def setUp(self):
+        """
+        Called before each test. Initiates a framework.
+        """
+        self.framework = FrameworkFactory.get_framework()
+        self.framework.start()
+        self.ipopo = install_ipopo(self.framework)
+        self.context = self.framework.get_bundle_context()
+
+        # The futures to return, and the errors to raise, by the component
+        self.futures = futures = []
+        self.errors = errors = []
+
+        @decorators.ComponentFactory("future-factory")
+        @decorators.Provides("future.provided")
+        @decorators.Property("_timeout", constants.IPOPO_VALIDATION_TIMEOUT,
+                             .2)
+        class Component(object):
+            """
+            Component validated by a future
+            """
+            @decorators.Validate
+            def validate(self, context):
+                if errors:
+                    raise errors.pop(0)
+
+                if futures:
+                    return futures.pop(0)
+
+        self.ipopo.register_factory(self.context, Component)
+
+
+    def tearDown(self):
+        """
+        Called after each test
+        """
+        self.framework.stop()
+        FrameworkFactory.delete_framework(self.framework)
+
+
+    def get_state(self, name="future"):
+        """
+        Retrieves the state of the given component
+        """
+        return self.ipopo.get_instance_details(name)["state"]
+
+
+    def testFuture(self):
+        """
+        Tests the validation ended by a future
+        """
+        event = threading.Event()
+        future = FutureResult()
+        self.futures.append(future)
+
+        component = self.ipopo.instantiate("future-factory", "future",
+                                    {constants.IPOPO_VALIDATION_TIMEOUT: 5})
+
+        # The component waits for the future
+        self.assertEqual(self.get_state(), StoredInstance.VALIDATING)
+        self.assertIsNone(
+                    self.context.get_service_reference("future.provided"))
+
+        # Complete the future
+        thread = threading.Thread(target=future.execute,
+                                  args=(event.wait, (5,), None))
+        thread.start()
+        event.set()
+        thread.join()
+
+        self.assertTrue(wait_for(
+                        lambda: self.get_state() == StoredInstance.VALID))
+        svc_ref = self.context.get_service_reference("future.provided")
+        self.assertIs(self.context.get_service(svc_ref), component)
+
+
+    def testTimeout(self):
+        """
+        Tests the timeout of the future returned by the validation callback
+        """
+        # The future never completes
+        future = FutureResult()
+        self.futures.append(future)
+
+        log_off()
+        self.ipopo.instantiate("future-factory", "future")
+        self.assertEqual(self.get_state(), StoredInstance.VALIDATING)
+        self.assertTrue(wait_for(
+                        lambda: self.get_state() == StoredInstance.ERRONEOUS))
+        log_on()
+        self.assertIsNone(
+                    self.context.get_service_reference("future.provided"))
+
+        # The future has been cancelled
+        self.assertTrue(future.cancelled())
+
+        # Retry: no future this time
+        self.assertEqual(self.ipopo.retry_erroneous("future"),
+                         StoredInstance.VALID)
+        self.assertIsNotNone(
+                    self.context.get_service_reference("future.provided"))
+
+        # Unknown components can't be retried
+        self.assertRaises(ValueError, self.ipopo.retry_erroneous, "unknown")
+
+
+    def testLateCompletion(self):
+        """
+        Tests the completion of a timed out future which can't be cancelled
+        """
+        # The first future is running when the validation times out
+        event = threading.Event()
+        late_future = FutureResult()
+        thread = threading.Thread(target=late_future.execute,
+                                  args=(event.wait, (5,), None))
+        thread.start()
+        self.futures.append(late_future)
+
+        log_off()
+        self.ipopo.instantiate("future-factory", "future")
+        self.assertTrue(wait_for(
+                        lambda: self.get_state() == StoredInstance.ERRONEOUS))
+        log_on()
+        self.assertFalse(late_future.cancelled())
+
+        # Retry with a future which never completes
+        self.futures.append(FutureResult())
+        self.assertEqual(self.ipopo.retry_erroneous("future"),
+                         StoredInstance.VALIDATING)
+
+        # The completion of the first future doesn't end the new validation
+        event.set()
+        thread.join()
+        time.sleep(.05)
+        self.assertEqual(self.get_state(), StoredInstance.VALIDATING)
+        self.assertIsNone(
+                    self.context.get_service_reference("future.provided"))
+
+        log_off()
+        self.assertTrue(wait_for(
+                        lambda: self.get_state() == StoredInstance.ERRONEOUS))
+        log_on()
+
+
+    def testError(self):
+        """
+        Tests a validation callback raising an error
+        """
+        self.errors.append(ValueError("Erroneous"))
+
+        log_off()
+        self.ipopo.instantiate("future-factory", "future")
+        log_on()
+        self.assertEqual(self.get_state(), StoredInstance.ERRONEOUS)
+        self.assertIsNone(
+                    self.context.get_service_reference("future.provided"))
+
+        # Retry: the callback succeeds this time
+        self.assertEqual(self.ipopo.retry_erroneous("future"),
+                         StoredInstance.VALID)
+
+        # Retrying a valid component does nothing
+        self.assertEqual(self.ipopo.retry_erroneous("future"),
+                         StoredInstance.VALID)
+
+# ------------------------------------------------------------------------------
+
+class PoolTest(unittest.TestCase):
+    """
+    Tests the pools of poolable factories
+    """
+    def setUp(self):
+        """
+        Called before each test. Initiates a framework.
+        """
+        self.framework = FrameworkFactory.get_framework()
+        self.framework.start()
+        self.ipopo = install_ipopo(self.framework)
+        self.context = self.framework.get_bundle_context()
+
+        # Number of calls to the constructor of the component
+        self.created = created = []
+
+        @decorators.ComponentFactory("pool-factory")
+        @decorators.Poolable(1)
+        @decorators.Requires("_dep", "pool.dependency")
+        @decorators.Provides("pool.provided", "_controller")
+        @decorators.Property("_name", "worker.name")
+        class Worker(object):
+            """
+            Stateless worker
+            """
+            def __init__(self):
+                created.append(self)
+                self._dep = None
+                self._controller = True
+
+        self.ipopo.register_factory(self.context, Worker)
+
+
+    def tearDown(self):
+        """
+        Called after each test
+        """
+        self.framework.stop()
+        FrameworkFactory.delete_framework(self.framework)
+
+
+    def testDecorator(self):
+        """
+        Tests the @Poolable decorator arguments
+        """
+        for invalid in (0, -1, None, "10", 1.5):
+            self.assertRaises(ValueError, decorators.Poolable, invalid)
+
+        def method():
+            pass
+
+        for invalid in (None, method, 123):
+            self.assertRaises(TypeError, decorators.Poolable(), invalid)
+
+
+    def testReuse(self):
+        """
+        Tests the reuse of a killed instance
+        """
+        dependency = object()
+        self.context.register_service("pool.dependency", dependency, {})
+
+        # First instance: a miss
+        worker = self.ipopo.instantiate("pool-factory", "worker-1",
+                                        {"worker.name": "first"})
+        self.assertIs(worker._dep, dependency)
+        worker._controller = False
+        self.assertIsNone(self.context.get_service_reference("pool.provided"))
+
+        self.ipopo.kill("worker-1")
+        self.assertIsNone(worker._dep)
+        self.assertEqual(self.ipopo.get_pool_stats(),
+                         {"pool-factory": {"hits": 0, "misses": 1,
+                                           "hit_rate": 0., "pooled": 1}})
+
+        # Second instance: the same object, with the new properties
+        worker_2 = self.ipopo.instantiate("pool-factory", "worker-2",
+                                          {"worker.name": "second"})
+        self.assertIs(worker_2, worker)
+        self.assertEqual(len(self.created), 1)
+        self.assertIs(worker._dep, dependency)
+        self.assertEqual(worker._name, "second")
+
+        # The controller has been reset
+        svc_ref = self.context.get_service_reference("pool.provided")
+        self.assertIsNotNone(svc_ref)
+        self.assertEqual(svc_ref.get_property("worker.name"), "second")
+
+        # Third instance: the pool is empty
+        worker_3 = self.ipopo.instantiate("pool-factory", "worker-3")
+        self.assertIsNot(worker_3, worker)
+        self.assertEqual(len(self.created), 2)
+
+        stats = self.ipopo.get_pool_stats()["pool-factory"]
+        self.assertEqual((stats["hits"], stats["misses"], stats["pooled"]),
+                         (1, 2, 0))
+        self.assertAlmostEqual(stats["hit_rate"], 1. / 3)
+
+        # The pool keeps only one instance
+        self.ipopo.kill("worker-2")
+        self.ipopo.kill("worker-3")
+        self.assertEqual(self.ipopo.get_pool_stats()["pool-factory"]["pooled"],
+                         1)
+
+        # The pool is released with the factory
+        self.ipopo.unregister_factory("pool-factory")
+        self.assertEqual(self.ipopo.get_pool_stats(), {})
+
+
+    def testOtherRequirements(self):
+        """
+        Tests the reuse of an instance with other requirement filters
+        """
+        dep_a = object()
+        dep_b = object()
+        self.context.register_service("pool.dependency", dep_a, {"id": "a"})
+        self.context.register_service("pool.dependency", dep_b, {"id": "b"})
+
+        worker = self.ipopo.instantiate("pool-factory", "worker-a",
+                        {constants.IPOPO_REQUIRES_FILTERS: {"_dep": "(id=a)"}})
+        self.assertIs(worker._dep, dep_a)
+        self.ipopo.kill("worker-a")
+
+        # New handlers are created for the pooled object
+        worker_b = self.ipopo.instantiate("pool-factory", "worker-b",
+                        {constants.IPOPO_REQUIRES_FILTERS: {"_dep": "(id=b)"}})
+        self.assertIs(worker_b, worker)
+        self.assertIs(worker._dep, dep_b)
+        self.assertEqual(len(self.created), 1)
+
+# ------------------------------------------------------------------------------
+
+class LazyInstantiationTest(unittest.TestCase):
+    """
+    Tests the instantiation of components on the first use of their services
+    """
+    def setUp(self):
+        """
+        Called before each test. Initiates a framework.
+        """
+        self.framework = FrameworkFactory.get_framework()
+        self.framework.start()
+        self.ipopo = install_ipopo(self.framework)
+        self.context = self.framework.get_bundle_context()
+        self.created = []
+
+        created = self.created
+
+        class Lazy(object):
+            def __init__(self):
+                created.append(self)
+
+        # Prepare the factories
+        decorators.Requires("_dep", "lazy.dependency")(Lazy)
+        decorators.Provides(["lazy.spec.1", "lazy.spec.2"])(Lazy)
+        decorators.Provides("lazy.other")(Lazy)
+        decorators.Property("_lazy", constants.IPOPO_LAZY, True)(Lazy)
+        decorators.ComponentFactory("lazy-factory")(Lazy)
+        self.ipopo.register_factory(self.context, Lazy)
+
+
+    def tearDown(self):
+        """
+        Called after each test
+        """
+        self.framework.stop()
+        FrameworkFactory.delete_framework(self.framework)
+
+
+    def testAsyncValidation(self):
+        """
+        Tests the first use of a lazy component with asynchronous callbacks
+        """
+        validated = []
+
+        @decorators.ComponentFactory("lazy-async-factory")
+        @decorators.Provides("lazy.async")
+        @decorators.Property("_lazy", constants.IPOPO_LAZY, True)
+        @decorators.Property("_async", constants.IPOPO_ASYNC_CALLBACKS, True)
+        class LazyAsync(object):
+            """
+            Lazy component with a slow validation
+            """
+            @decorators.Validate
+            def validate(self, context):
+                time.sleep(.2)
+                validated.append(self)
+
+        self.ipopo.register_factory(self.context, LazyAsync)
+        self.ipopo.instantiate("lazy-async-factory", "lazy-async")
+
+        # The first use waits for the validation in the thread pool
+        ref = self.context.get_service_reference("lazy.async")
+        svc = self.context.get_service(ref)
+        self.assertEqual(validated, [svc])
+        self.assertEqual(self.ipopo.get_instance_details("lazy-async")["state"],
+                         StoredInstance.VALID)
+
+
+    def testConcurrentFirstUse(self):
+        """
+        Tests the first use of a lazy component by two bundles at the same
+        time
+        """
+        created = []
+
+        @decorators.ComponentFactory("lazy-slow-factory")
+        @decorators.Provides("lazy.slow")
+        @decorators.Property("_lazy", constants.IPOPO_LAZY, True)
+        class LazySlow(object):
+            """
+            Lazy component with a slow validation
+            """
+            @decorators.Validate
+            def validate(self, context):
+                created.append(self)
+                time.sleep(.2)
+
+        self.ipopo.register_factory(self.context, LazySlow)
+        self.ipopo.instantiate("lazy-slow-factory", "lazy-slow")
+        ref = self.context.get_service_reference("lazy.slow")
+
+        # Get the service from two bundles in parallel
+        bundle = self.context.install_bundle("tests.simple_bundle")
+        bundle.start()
+        results = {}
+
+        def get_service(key, context):
+            try:
+                results[key] = context.get_service(ref)
+            except Exception as ex:
+                results[key] = ex
+
+        threads = [threading.Thread(target=get_service, args=(key, context))
+                   for key, context in (("b1", self.context),
+                                        ("b2", bundle.get_bundle_context()))]
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join(5)
+
+        # Both got the single instance
+        self.assertEqual(len(created), 1)
+        self.assertIs(results["b1"], created[0])
+        self.assertIs(results["b2"], created[0])
+
+
+    def testFirstUse(self):
+        """
+        Tests the instantiation of a lazy component on the first call to
+        get_service()
+        """
+        dep_reg = self.context.register_service("lazy.dependency", object(),
+                                                {})
+
+        self.assertIsNone(self.ipopo.instantiate("lazy-factory", "lazy"))
+        self.assertTrue(self.ipopo.is_registered_instance("lazy"))
+        self.assertEqual(self.ipopo.get_instances(),
+                         [("lazy", "lazy-factory", StoredInstance.LAZY)])
+        self.assertRaises(ValueError, self.ipopo.instantiate,
+                          "lazy-factory", "lazy")
+
+        # Services are registered, but the component doesn't exist yet
+        details = self.ipopo.get_instance_details("lazy")
+        self.assertEqual(details["state"], StoredInstance.LAZY)
+        self.assertEqual(len(details["services"]), 2)
+        self.assertEqual(self.created, [])
+
+        ref = self.context.get_service_reference("lazy.spec.2")
+        other_ref = self.context.get_service_reference("lazy.other")
+        self.assertTrue(ref.is_factory())
+        self.assertEqual(ref.get_property(constants.IPOPO_INSTANCE_NAME),
+                         "lazy")
+
+        # First use: instantiate and validate the component
+        svc = self.context.get_service(ref)
+        self.assertEqual(self.created, [svc])
+        self.assertIs(svc._dep, self.context.get_service(
+                                            dep_reg.get_reference()))
+        details = self.ipopo.get_instance_details("lazy")
+        self.assertEqual(details["state"], StoredInstance.VALID)
+
+        # The component took over the registrations of the factory
+        self.assertEqual(sorted(details["services"].values()),
+                         sorted([ref, other_ref]))
+        self.assertIs(self.context.get_service(other_ref), svc)
+        self.assertEqual(self.created, [svc])
+
+        # Invalidate the component: its services are registered again,
+        # without factory
+        dep_reg.unregister()
+        self.assertIsNone(self.context.get_service_reference("lazy.spec.1"))
+        dep_reg = self.context.register_service("lazy.dependency", object(),
+                                                {})
+        ref = self.context.get_service_reference("lazy.spec.1")
+        self.assertFalse(ref.is_factory())
+        self.assertIs(self.context.get_service(ref), svc)
+
+        self.ipopo.kill("lazy")
+        self.assertIsNone(self.context.get_service_reference("lazy.spec.1"))
+        self.assertEqual(self.created, [svc])
+
+
+    def testKillUnused(self):
+        """
+        Tests the destruction of a lazy component that has never been used
+        """
+        self.ipopo.instantiate("lazy-factory", "lazy")
+        self.assertIsNotNone(self.context.get_service_reference("lazy.other"))
+
+        self.ipopo.kill("lazy")
+        self.assertFalse(self.ipopo.is_registered_instance("lazy"))
+        self.assertIsNone(self.context.get_service_reference("lazy.other"))
+        self.assertEqual(self.created, [])
+
+        # Unregistering the factory removes lazy components too
+        self.ipopo.instantiate("lazy-factory", "lazy")
+        self.ipopo.unregister_factory("lazy-factory")
+        self.assertFalse(self.ipopo.is_registered_instance("lazy"))
+        self.assertIsNone(self.context.get_service_reference("lazy.other"))
+
+
+    def testInvalidOnFirstUse(self):
+        """
+        Tests the first use of a lazy component that can't be validated
+        """
+        self.ipopo.instantiate("lazy-factory", "lazy")
+        ref = self.context.get_service_reference("lazy.other")
+
+        log_off()
+        self.assertRaises(BundleException, self.context.get_service, ref)
+        log_on()
+
+        # The component exists, but its services are only registered once it
+        # has been validated
+        self.assertEqual(len(self.created), 1)
+        details = self.ipopo.get_instance_details("lazy")
+        self.assertEqual(details["state"], StoredInstance.INVALID)
+        self.assertIsNone(self.context.get_service_reference("lazy.other"))
+
+        self.context.register_service("lazy.dependency", object(), {})
+        ref = self.context.get_service_reference("lazy.other")
+        self.assertFalse(ref.is_factory())
+        self.assertIs(self.context.get_service(ref), self.created[0])
+
+# ------------------------------------------------------------------------------
+
 if __name__ == "__main__":
     # Set logging level
     logging.basicConfig(level=logging.DEBUG)
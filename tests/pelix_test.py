@@ -1013,6 +1013,80 @@ class FrameworkTest(unittest.TestCase):
 
 # ------------------------------------------------------------------------------
 
+class LockProfilingTest(unittest.TestCase):
+    """
+    Tests the profiling of the internal locks
+    """
+    def tearDown(self):
+        """
+        Called after each test
+        """
+        self.framework.stop()
+        FrameworkFactory.delete_framework(self.framework)
+
+
+    def testDeactivated(self):
+        """
+        Tests the default behavior: no profiling
+        """
+        self.framework = FrameworkFactory.get_framework()
+        self.assertIsNone(self.framework.get_lock_profiler())
+
+
+    def testProfiling(self):
+        """
+        Tests the statistics of the locks
+        """
+        self.framework = FrameworkFactory.get_framework(
+                                                {pelix.LOCKS_PROFILING: "1"})
+        self.framework.start()
+        profiler = self.framework.get_lock_profiler()
+        self.assertIsNotNone(profiler)
+
+        # Framework locks are instrumented
+        context = self.framework.get_bundle_context()
+        context.register_service("profiled", object(), {})
+        stats = profiler.snapshot()["ServiceRegistry.__svc_lock"]
+        self.assertEqual(stats["instances"], 1)
+        self.assertGreater(stats["acquisitions"], 0)
+
+        # Reentrant lock: only the outermost acquisition is counted
+        profiler.reset()
+        lock = profiler.create_lock("test", True)
+        with lock:
+            with lock:
+                holders = profiler.snapshot()["test"]["holders"]
+                self.assertEqual(len(holders), 1)
+                self.assertEqual(holders[0]["thread"],
+                                 threading.current_thread().name)
+                self.assertTrue(any("testProfiling" in line
+                                    for line in holders[0]["stack"]))
+
+        stats = profiler.snapshot()["test"]
+        self.assertEqual(stats["acquisitions"], 1)
+        self.assertEqual(stats["holders"], [])
+        self.assertTrue(stats["hold_max_stack"])
+
+        # Contention
+        other = profiler.create_lock("test")
+        other.acquire()
+        self.assertFalse(other.acquire(False))
+        thread = threading.Thread(target=lambda: other.acquire() \
+                                  or other.release())
+        thread.start()
+        time.sleep(.1)
+        other.release()
+        thread.join()
+
+        stats = profiler.snapshot()["test"]
+        self.assertEqual(stats["instances"], 2)
+        self.assertEqual(stats["contentions"], 2)
+        self.assertEqual(stats["acquisitions"], 3)
+        self.assertGreaterEqual(stats["wait_max"], .05)
+        self.assertGreaterEqual(stats["hold_max"], .05)
+
+# ------------------------------------------------------------------------------
+
 class LocalBundleTest(unittest.TestCase):
     """
     Tests the installation of the __main__ bundle
@@ -1415,6 +1489,328 @@ class ServicesTest(unittest.TestCase):
                           None, "/// Invalid Filter ///")
 
 
+    def testRegisterServices(self):
+        """
+        Tests the registration of a batch of services
+        """
+        context = self.framework.get_bundle_context()
+        bundle = context.get_bundle()
+        events = []
+
+        class Listener(object):
+            """
+            Service listener checking that all services are registered when
+            an event is received
+            """
+            def service_changed(self, event):
+                refs = context.get_all_service_references("batch")
+                events.append((event.get_service_reference(), len(refs)))
+
+        listener = Listener()
+        context.add_service_listener(listener, None, "batch")
+
+        # Invalid entries: nothing must be registered
+        self.assertRaises(BundleException, self.framework.register_services,
+                          [(bundle, "batch", object(), None),
+                           (bundle, None, object(), None)])
+        self.assertIsNone(context.get_service_reference("batch"))
+
+        # Register a batch of services
+        services = [object(), object(), object()]
+        registrations = self.framework.register_services(
+                                    [(bundle, "batch", service, {"idx": idx})
+                                     for idx, service in enumerate(services)])
+
+        # Registrations are given in order
+        for idx, registration in enumerate(registrations):
+            ref = registration.get_reference()
+            self.assertEqual(ref.get_property("idx"), idx)
+            self.assertIs(context.get_service(ref), services[idx])
+            context.unget_service(ref)
+
+        # Events are sent in order, once all services have been registered
+        self.assertEqual(events,
+                         [(registration.get_reference(), len(services))
+                          for registration in registrations])
+
+        # Registration without events
+        del events[:]
+        registrations = self.framework.register_services(
+                                    [(bundle, "batch", object(), None)], False)
+        self.assertEqual(events, [])
+
+        self.framework.fire_registered_events(registrations)
+        self.assertEqual(events,
+                         [(registrations[0].get_reference(),
+                           len(services) + 1)])
+
+        context.remove_service_listener(listener)
+
+
+    def testServiceFactory(self):
+        """
+        Tests the registration of a service factory
+        """
+        context = self.framework.get_bundle_context()
+        bundle = context.install_bundle(self.test_bundle_name)
+        bundle_context = bundle.get_bundle_context()
+        released = []
+
+        class Factory(object):
+            """
+            Service factory: one list per bundle
+            """
+            def get_service(self, bundle, registration):
+                return [bundle]
+
+            def unget_service(self, bundle, registration, service):
+                released.append(service)
+
+        registration = context.register_service("factory", Factory(), {},
+                                                factory=True)
+        ref = registration.get_reference()
+        self.assertTrue(ref.is_factory())
+        self.assertEqual(ref.get_property(pelix.SERVICE_SCOPE),
+                         pelix.SCOPE_BUNDLE)
+
+        # One service object per bundle
+        svc_fw = context.get_service(ref)
+        svc_bnd = bundle_context.get_service(ref)
+        self.assertEqual(svc_fw, [self.framework])
+        self.assertEqual(svc_bnd, [bundle])
+        self.assertIs(bundle_context.get_service(ref), svc_bnd)
+        self.assertIn(ref, bundle.get_services_in_use())
+
+        # The service is released when the bundle doesn't use it anymore
+        bundle_context.unget_service(ref)
+        self.assertEqual(released, [])
+        bundle_context.unget_service(ref)
+        self.assertEqual(released, [svc_bnd])
+
+        # A new service object is created on the next call
+        svc_bnd_2 = bundle_context.get_service(ref)
+        self.assertIsNot(svc_bnd_2, svc_bnd)
+        self.assertEqual(svc_bnd_2, [bundle])
+
+        # The remaining objects are released on unregistration
+        del released[:]
+        registration.unregister()
+        self.assertEqual(len(released), 2)
+        self.assertIn(svc_fw, released)
+        self.assertIn(svc_bnd_2, released)
+        self.assertRaises(BundleException, context.get_service, ref)
+
+        # Classic services keep the singleton scope
+        registration = context.register_service("singleton", object(), {})
+        ref = registration.get_reference()
+        self.assertFalse(ref.is_factory())
+        self.assertEqual(ref.get_property(pelix.SERVICE_SCOPE),
+                         pelix.SCOPE_SINGLETON)
+
+        # The scope can't be modified
+        registration.set_properties({pelix.SERVICE_SCOPE: pelix.SCOPE_BUNDLE})
+        self.assertEqual(ref.get_property(pelix.SERVICE_SCOPE),
+                         pelix.SCOPE_SINGLETON)
+        registration.unregister()
+
+
+    def testServiceFactoryConcurrency(self):
+        """
+        Tests the calls to service factories from several threads
+        """
+        context = self.framework.get_bundle_context()
+        calls = []
+
+        class SlowFactory(object):
+            """
+            Service factory taking some time to create its services
+            """
+            def get_service(self, bundle, registration):
+                calls.append(bundle)
+                time.sleep(.1)
+                return object()
+
+            def unget_service(self, bundle, registration, service):
+                pass
+
+        class OtherThreadFactory(object):
+            """
+            Service factory getting another factory service in a thread
+            """
+            def __init__(self, reference):
+                self.reference = reference
+
+            def get_service(self, bundle, registration):
+                result = []
+                thread = threading.Thread(
+                        target=lambda: result.append(
+                                        context.get_service(self.reference)))
+                thread.start()
+                thread.join(2)
+                return result[0]
+
+            def unget_service(self, bundle, registration, service):
+                pass
+
+        slow_ref = context.register_service("slow", SlowFactory(), {},
+                                            factory=True).get_reference()
+        other_ref = context.register_service(
+                                "other", OtherThreadFactory(slow_ref), {},
+                                factory=True).get_reference()
+
+        # A factory can wait for another factory called by another thread
+        service = context.get_service(other_ref)
+        self.assertIs(context.get_service(slow_ref), service)
+        self.assertEqual(len(calls), 1)
+
+        # Concurrent first calls for a bundle: the factory is called once
+        bundle = context.install_bundle(self.test_bundle_name)
+        bundle_context = bundle.get_bundle_context()
+        services = []
+        threads = [threading.Thread(target=lambda: services.append(
+                                        bundle_context.get_service(slow_ref)))
+                   for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(2)
+
+        self.assertEqual(len(services), 3)
+        self.assertIs(services[0], services[1])
+        self.assertIs(services[0], services[2])
+        self.assertEqual(calls, [self.framework, bundle])
+
+        # Recursive calls for the same bundle are refused
+        class RecursiveFactory(object):
+            """
+            Service factory getting its own service
+            """
+            def get_service(self, bundle, registration):
+                return context.get_service(registration.get_reference())
+
+            def unget_service(self, bundle, registration, service):
+                pass
+
+        recursive_ref = context.register_service("recursive",
+                                                 RecursiveFactory(), {},
+                                                 factory=True).get_reference()
+        log_off()
+        self.assertRaises(BundleException, context.get_service, recursive_ref)
+        log_on()
+
+
+    def testPrototypeServiceFactory(self):
+        """
+        Tests the registration of a prototype service factory
+        """
+        context = self.framework.get_bundle_context()
+        bundle = context.install_bundle(self.test_bundle_name)
+        bundle_context = bundle.get_bundle_context()
+        released = []
+
+        class Factory(object):
+            """
+            Prototype service factory: one list per call
+            """
+            def get_service(self, bundle, registration):
+                return [bundle]
+
+            def unget_service(self, bundle, registration, service):
+                released.append(service)
+
+        registration = context.register_service("prototype", Factory(), {},
+                                                prototype=True)
+        ref = registration.get_reference()
+        self.assertTrue(ref.is_factory())
+        self.assertTrue(ref.is_prototype())
+        self.assertEqual(ref.get_property(pelix.SERVICE_SCOPE),
+                         pelix.SCOPE_PROTOTYPE)
+
+        # One service object per call to the service objects
+        objects = bundle_context.get_service_objects(ref)
+        self.assertIs(objects.get_service_reference(), ref)
+        svc_1 = objects.get_service()
+        svc_2 = objects.get_service()
+        self.assertEqual(svc_1, [bundle])
+        self.assertEqual(svc_2, [bundle])
+        self.assertIsNot(svc_1, svc_2)
+        self.assertIn(ref, bundle.get_services_in_use())
+
+        # get_service() still gives a single object per bundle
+        svc_bnd = bundle_context.get_service(ref)
+        self.assertIs(bundle_context.get_service(ref), svc_bnd)
+        self.assertIsNot(svc_bnd, svc_1)
+        self.assertIsNot(svc_bnd, svc_2)
+
+        # Each object is released on its own
+        self.assertTrue(objects.unget_service(svc_2))
+        self.assertEqual(released, [svc_2])
+        self.assertFalse(objects.unget_service(svc_2))
+        self.assertFalse(objects.unget_service([bundle]))
+
+        # The bundle-level object is counted
+        bundle_context.unget_service(ref)
+        bundle_context.unget_service(ref)
+        self.assertEqual(released, [svc_2, svc_bnd])
+        self.assertIn(ref, bundle.get_services_in_use())
+
+        # The remaining objects are released on unregistration
+        del released[:]
+        registration.unregister()
+        self.assertEqual(released, [svc_1])
+        self.assertRaises(BundleException, objects.get_service)
+
+        # Service objects of a classic service give the singleton
+        service = object()
+        registration = context.register_service("singleton", service, {})
+        ref = registration.get_reference()
+        self.assertFalse(ref.is_prototype())
+        objects = bundle_context.get_service_objects(ref)
+        self.assertIs(objects.get_service(), service)
+        self.assertIs(objects.get_service(), service)
+        self.assertTrue(objects.unget_service(service))
+        self.assertTrue(objects.unget_service(service))
+        self.assertFalse(objects.unget_service(service))
+        registration.unregister()
+
+        self.assertRaises(TypeError, bundle_context.get_service_objects, None)
+
+
+    def testUsageCount(self):
+        """
+        Tests the count of the usages of a service by a bundle
+        """
+        context = self.framework.get_bundle_context()
+        bundle = context.install_bundle(self.test_bundle_name)
+        bundle_context = bundle.get_bundle_context()
+
+        service = object()
+        ref = context.register_service("counted", service, {}).get_reference()
+
+        # Each call is counted, but the reference is listed once
+        for _ in range(3):
+            self.assertIs(bundle_context.get_service(ref), service)
+
+        self.assertEqual(bundle.get_services_in_use(), [ref])
+        self.assertEqual(ref.get_using_bundles(), [bundle])
+
+        # The usage is removed with the last release
+        for _ in range(2):
+            self.assertTrue(bundle_context.unget_service(ref))
+            self.assertEqual(bundle.get_services_in_use(), [ref])
+
+        self.assertTrue(bundle_context.unget_service(ref))
+        self.assertEqual(bundle.get_services_in_use(), [])
+        self.assertEqual(ref.get_using_bundles(), [])
+        self.assertFalse(bundle_context.unget_service(ref))
+
+        # The service can be used again
+        self.assertIs(bundle_context.get_service(ref), service)
+        self.assertEqual(bundle.get_services_in_use(), [ref])
+        self.assertTrue(bundle_context.unget_service(ref))
+        self.assertEqual(bundle.get_services_in_use(), [])
+
+
     def testMultipleUnregistrations(self):
         """
         Tests behavior when unregistering the same service twice
@@ -1703,6 +2099,193 @@ class ServiceEventTest(unittest.TestCase):
 
 # ------------------------------------------------------------------------------
 
+class ServiceTrackerTest(unittest.TestCase):
+    """
+    Tests the service tracker
+    """
+    def setUp(self):
+        """
+        Called before each test. Initiates a framework.
+        """
+        self.framework = FrameworkFactory.get_framework()
+        self.framework.start()
+        self.context = self.framework.get_bundle_context()
+
+
+    def tearDown(self):
+        """
+        Called after each test
+        """
+        self.framework.stop()
+        FrameworkFactory.delete_framework(self.framework)
+
+
+    def testBestService(self):
+        """
+        Tests the tracking of the best service
+        """
+        context = self.context
+        svc_low, svc_high = object(), object()
+
+        reg_low = context.register_service("tracked", svc_low,
+                                           {pelix.SERVICE_RANKING: 0})
+
+        with pelix.ServiceTracker(context, "tracked") as tracker:
+            self.assertIs(tracker.get(), svc_low)
+            self.assertIs(tracker.get_reference(), reg_low.get_reference())
+            self.assertEqual(tracker.get_all(), (svc_low,))
+
+            # A better service replaces the current one
+            reg_high = context.register_service("tracked", svc_high,
+                                                {pelix.SERVICE_RANKING: 10})
+            self.assertIs(tracker.get(), svc_high)
+            self.assertEqual(len(tracker), 2)
+            self.assertEqual(tracker.get_references(),
+                             [reg_high.get_reference(),
+                              reg_low.get_reference()])
+
+            # Only the best service is used
+            self.assertNotIn(reg_low.get_reference(),
+                             self.framework.get_services_in_use())
+
+            # Ranking update
+            reg_low.set_properties({pelix.SERVICE_RANKING: 20})
+            self.assertIs(tracker.get(), svc_low)
+            self.assertNotIn(reg_high.get_reference(),
+                             self.framework.get_services_in_use())
+
+            # Unregistration
+            reg_low.unregister()
+            self.assertIs(tracker.get(), svc_high)
+            reg_high.unregister()
+            self.assertIsNone(tracker.get())
+            self.assertIsNone(tracker.get_reference())
+            self.assertEqual(tracker.get_all(), tuple())
+
+        self.assertEqual(self.framework.get_services_in_use(), [])
+
+
+    def testFilter(self):
+        """
+        Tests the tracking of the services matching a filter
+        """
+        context = self.context
+        service = object()
+        registration = context.register_service("tracked", service,
+                                                {"answer": 0})
+
+        tracker = pelix.ServiceTracker(context, "tracked", "(answer=42)")
+        tracker.open()
+        self.assertIsNone(tracker.get())
+
+        # Service now matching
+        registration.set_properties({"answer": 42})
+        self.assertIs(tracker.get(), service)
+
+        # Service not matching anymore
+        registration.set_properties({"answer": 0})
+        self.assertIsNone(tracker.get())
+
+        tracker.close()
+        registration.unregister()
+        self.assertRaises(ValueError, pelix.ServiceTracker, context, None)
+
+
+    def testAggregate(self):
+        """
+        Tests the tracking of all the matching services
+        """
+        context = self.context
+        services = [object() for _ in range(3)]
+        registrations = [context.register_service("tracked", service,
+                                                  {pelix.SERVICE_RANKING: idx})
+                         for idx, service in enumerate(services)]
+
+        with pelix.ServiceTracker(context, "tracked",
+                                  aggregate=True) as tracker:
+            # Best first
+            snapshot = tracker.get_all()
+            self.assertEqual(snapshot, tuple(reversed(services)))
+            self.assertIs(tracker.get(), services[-1])
+            self.assertEqual(len(self.framework.get_services_in_use()), 3)
+
+            # Same snapshot while the services are the same
+            registrations[0].set_properties({"other": True})
+            self.assertIs(tracker.get_all(), snapshot)
+
+            # New snapshot on unregistration
+            registrations[1].unregister()
+            self.assertEqual(tracker.get_all(), (services[2], services[0]))
+
+        self.assertEqual(self.framework.get_services_in_use(), [])
+        self.assertEqual(tracker.get_all(), tuple())
+
+
+    def testFactoryError(self):
+        """
+        Tests the tracking of a service whose factory fails
+        """
+        context = self.context
+
+        class FailingFactory(object):
+            """
+            Service factory raising an error
+            """
+            def get_service(self, bundle, registration):
+                raise ValueError("Factory error")
+
+            def unget_service(self, bundle, registration, service):
+                pass
+
+        log_off()
+        try:
+            for aggregate in (False, True):
+                service = object()
+                tracker = pelix.ServiceTracker(context, "tracked",
+                                               aggregate=aggregate)
+                tracker.open()
+
+                # The failing service is ignored
+                reg_fail = context.register_service(
+                                        "tracked", FailingFactory(),
+                                        {pelix.SERVICE_RANKING: 0},
+                                        factory=True)
+                self.assertIsNone(tracker.get())
+                self.assertEqual(len(tracker), 0)
+
+                # ... in favor of a lower ranked one
+                reg_ok = context.register_service("tracked", service,
+                                                  {pelix.SERVICE_RANKING: -5})
+                self.assertIs(tracker.get(), service)
+                self.assertIs(tracker.get_reference(),
+                              reg_ok.get_reference())
+                self.assertEqual(tracker.get_all(), (service,))
+                self.assertEqual(len(tracker), 1)
+
+                # It is retried when modified
+                reg_fail.set_properties({pelix.SERVICE_RANKING: 10})
+                self.assertIs(tracker.get(), service)
+                self.assertEqual(tracker.get_all(), (service,))
+
+                tracker.close()
+                reg_fail.unregister()
+                reg_ok.unregister()
+
+            # Failing service registered before the tracker is opened
+            reg_fail = context.register_service("tracked", FailingFactory(),
+                                                {}, factory=True)
+            with pelix.ServiceTracker(context, "tracked") as tracker:
+                self.assertIsNone(tracker.get())
+
+            reg_fail.unregister()
+
+        finally:
+            log_on()
+
+        self.assertEqual(self.framework.get_services_in_use(), [])
+
+# ------------------------------------------------------------------------------
+
 class UtilityMethodsTest(unittest.TestCase):
     """
     Pelix bundle event tests
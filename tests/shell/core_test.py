@@ -14,12 +14,18 @@ __docformat__ = "restructuredtext en"
 # ------------------------------------------------------------------------------
 
 # Pelix
-from pelix.framework import FrameworkFactory
+from pelix.framework import FrameworkFactory, LOCKS_PROFILING
 
 # Shell constants
 from pelix.shell import SHELL_SERVICE_SPEC, SHELL_COMMAND_SPEC, \
     SHELL_UTILS_SERVICE_SPEC
 
+# Standard library
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
 # Tests
 try:
     import unittest2 as unittest
@@ -456,5 +462,75 @@ class ShellCommandTest(unittest.TestCase):
 
 # ------------------------------------------------------------------------------
 
+class ShellLocksTest(unittest.TestCase):
+    """
+    Tests the locks profiling commands
+    """
+    def _start(self, properties=None):
+        """
+        Starts a framework and the shell bundle
+
+        :param properties: The framework properties
+        :return: The shell service
+        """
+        self.framework = FrameworkFactory.get_framework(properties)
+        self.framework.start()
+        context = self.framework.get_bundle_context()
+        context.install_bundle("pelix.shell.core").start()
+        return context.get_service(
+                            context.get_service_reference(SHELL_SERVICE_SPEC))
+
+
+    def tearDown(self):
+        """
+        Cleans up the framework
+        """
+        self.framework.stop()
+        FrameworkFactory.delete_framework(self.framework)
+        self.framework = None
+
+
+    def _execute(self, shell, command):
+        """
+        Executes a command and returns its output
+
+        :param shell: The shell service
+        :param command: The command line
+        :return: The output of the command
+        """
+        output = StringIO()
+        self.assertTrue(shell.execute(command, stdout=output))
+        return output.getvalue()
+
+
+    def testNotActivated(self):
+        """
+        Tests the commands without the profiling
+        """
+        shell = self._start()
+        self.assertIn("not activated", self._execute(shell, "locks"))
+
+
+    def testLocks(self):
+        """
+        Tests the locks commands
+        """
+        shell = self._start({LOCKS_PROFILING: "true"})
+
+        output = self._execute(shell, "locks")
+        self.assertIn("ServiceRegistry.__svc_lock", output)
+        self.assertIn("Framework.__bundles_lock", output)
+
+        output = self._execute(shell, "lock ServiceRegistry.__svc_lock")
+        self.assertIn("Longest hold", output)
+        self.assertIn("Unknown lock", self._execute(shell, "lock unknown"))
+
+        self.assertIn("reset", self._execute(shell, "locks reset"))
+        stats = self.framework.get_lock_profiler().snapshot()
+        self.assertEqual(stats["EventDispatcher.__fw_lock"]
+                         ["acquisitions"], 0)
+
+# ------------------------------------------------------------------------------
+
 if __name__ == "__main__":
     unittest.main()
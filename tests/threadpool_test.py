@@ -13,13 +13,30 @@ __docformat__ = "restructuredtext en"
 
 # ------------------------------------------------------------------------------
 
-# Tested module
+# Tested modules
+import pelix.services
+import pelix.services.executor as executor
 import pelix.threadpool as threadpool
+from pelix.framework import FrameworkFactory
 
 # Standard library
 import threading
 import time
 
+try:
+    # Python 3
+    import queue
+except ImportError:
+    # Python 2
+    import Queue as queue
+
+try:
+    import concurrent.futures
+    import pelix.services.processpool as processpool
+except ImportError:
+    # Python 2
+    concurrent = processpool = None
+
 # Tests
 try:
     import unittest2 as unittest
@@ -35,6 +52,28 @@ def _slow_call(wait, result):
     time.sleep(wait)
     return result
 
+
+def _checksum(buffer, size):
+    """
+    Sums the bytes of a shared memory buffer (executed in a worker process)
+    """
+    return sum(bytearray(buffer.buf[:size]))
+
+
+def _fill(buffer, value):
+    """
+    Fills a shared memory buffer (executed in a worker process)
+    """
+    buffer.buf[:] = bytes(bytearray([value]) * buffer.size)
+
+
+def _warmed_up():
+    """
+    Checks if the warm-up module has been imported by the worker process
+    """
+    import sys
+    return "tests.simple_bundle" in sys.modules
+
 # ------------------------------------------------------------------------------
 
 class FutureTest(unittest.TestCase):
@@ -88,7 +127,10 @@ class FutureTest(unittest.TestCase):
 
         # The call must be considered as done
         self.assertTrue(future.done(), "Execution flag not updated")
-        self.assertIsNone(future.result(), "A result has been set")
+
+        # The exception is kept
+        self.assertIsInstance(future.exception(), ValueError)
+        self.assertRaises(ValueError, future.result)
 
 
     def testTimeout(self):
@@ -116,6 +158,121 @@ class FutureTest(unittest.TestCase):
         self.assertIs(future.result(2), result, "Invalid result")
         self.assertTrue(future.done(), "Execution flag not updated")
 
+
+    def testCallbacks(self):
+        """
+        Tests the done callbacks
+        """
+        future = threadpool.FutureResult()
+        called = []
+        future.add_done_callback(called.append)
+        self.assertEqual(called, [])
+
+        future.execute(self._simple_call, (1, 2, 3), None)
+        self.assertEqual(called, [future])
+
+        # Immediate call once done, even if a callback fails
+        future.add_done_callback(lambda _: self._raise_call())
+        future.add_done_callback(called.append)
+        self.assertEqual(called, [future, future])
+
+
+    def testCancel(self):
+        """
+        Tests the cancellation of a job
+        """
+        future = threadpool.FutureResult()
+        called = []
+        future.add_done_callback(called.append)
+
+        self.assertTrue(future.cancel())
+        self.assertTrue(future.cancelled())
+        self.assertTrue(future.done())
+        self.assertEqual(called, [future])
+        self.assertRaises(threadpool.CancelledError, future.result)
+
+        # A cancelled job is not executed
+        future.execute(self._raise_call, None, None)
+
+        # A finished job can't be cancelled
+        future = threadpool.FutureResult()
+        future.execute(self._simple_call, (1, 2, 3), None)
+        self.assertFalse(future.cancel())
+        self.assertEqual(future.result(), (1, 2, 3))
+
+
+    def testWait(self):
+        """
+        Tests wait_all() and wait_any()
+        """
+        futures = [threadpool.FutureResult() for _ in range(3)]
+        self.assertFalse(threadpool.wait_all(futures, .1))
+        self.assertIsNone(threadpool.wait_any(futures, .1))
+
+        threading.Timer(.1, futures[1].execute,
+                        (self._simple_call, (1, 2, 3), None)).start()
+        self.assertIs(threadpool.wait_any(futures, 1), futures[1])
+        self.assertFalse(threadpool.wait_all(futures, .1))
+
+        futures[0].cancel()
+        futures[2].execute(self._simple_call, (1, 2, 3), None)
+        self.assertTrue(threadpool.wait_all(futures, 1))
+        self.assertTrue(threadpool.wait_all([]))
+
+
+    @unittest.skipIf(concurrent is None, "concurrent.futures is not available")
+    def testConcurrent(self):
+        """
+        Tests the conversion from and to concurrent.futures.Future
+        """
+        # FutureResult -> Future
+        future = threadpool.FutureResult()
+        converted = future.to_concurrent()
+        self.assertFalse(converted.done())
+        future.execute(self._simple_call, (1, 2, 3), None)
+        self.assertEqual(converted.result(0), (1, 2, 3))
+
+        future = threadpool.FutureResult()
+        converted = future.to_concurrent()
+        self.assertRaises(ValueError, future.execute, self._raise_call,
+                          None, None)
+        self.assertIsInstance(converted.exception(0), ValueError)
+
+        future = threadpool.FutureResult()
+        converted = future.to_concurrent()
+        future.cancel()
+        self.assertTrue(converted.cancelled())
+
+        # Future -> FutureResult
+        with concurrent.futures.ThreadPoolExecutor(1) as executor:
+            source = executor.submit(_slow_call, .1, 42)
+            future = threadpool.FutureResult.from_concurrent(source)
+            self.assertEqual(future.result(1), 42)
+
+            source = executor.submit(self._raise_call)
+            future = threadpool.FutureResult.from_concurrent(source)
+            self.assertRaises(ValueError, future.result, 1)
+
+        # Cancellations are propagated both ways
+        source = concurrent.futures.Future()
+        future = threadpool.FutureResult.from_concurrent(source)
+        self.assertTrue(future.cancel())
+        self.assertTrue(source.cancelled())
+
+        source = concurrent.futures.Future()
+        future = threadpool.FutureResult.from_concurrent(source)
+        self.assertTrue(source.cancel())
+        self.assertTrue(future.cancelled())
+
+        # Mixed waits
+        source = concurrent.futures.Future()
+        future = threadpool.FutureResult()
+        future.execute(self._simple_call, (1, 2, 3), None)
+        self.assertIs(threadpool.wait_any([source, future], 1), future)
+        self.assertFalse(threadpool.wait_all([source, future], .1))
+        source.set_result(None)
+        self.assertTrue(threadpool.wait_all([source, future], 1))
+
 # ------------------------------------------------------------------------------
 
 class ThreadPoolTest(unittest.TestCase):
@@ -147,6 +304,16 @@ class ThreadPoolTest(unittest.TestCase):
         for invalid_nb in (0, -1, 5.1):
             self.assertRaises(ValueError, threadpool.ThreadPool, invalid_nb)
 
+        # Missing or conflicting sizes
+        self.assertRaises(ValueError, threadpool.ThreadPool)
+        self.assertRaises(ValueError, threadpool.ThreadPool, 2, nb_threads=3)
+
+        # Former name of the maximum size
+        self.pool = threadpool.ThreadPool(nb_threads=3)
+        self.assertEqual(self.pool._max_threads, 3)
+        self.pool = threadpool.ThreadPool(3, nb_threads=3)
+        self.assertEqual(self.pool._max_threads, 3)
+
 
     def testPreStartEnqueue(self):
         """
@@ -198,6 +365,537 @@ class ThreadPoolTest(unittest.TestCase):
         self.assertIs(future.result(1), result, "Invalid result")
         self.assertTrue(future.done(), "Execution flag not updated")
 
+
+    def testInitMinThreads(self):
+        """
+        Tests the validation of the minimum pool size
+        """
+        for invalid_nb in (-1, 5.1, 3):
+            self.assertRaises(ValueError, threadpool.ThreadPool, 2,
+                              min_threads=invalid_nb)
+
+
+    def testElastic(self):
+        """
+        Tests the creation of threads on demand and their retirement
+        """
+        self.pool = threadpool.ThreadPool(4, timeout=.2, min_threads=1)
+        self.pool.start()
+
+        # Only the minimal threads are started
+        stats = self.pool.get_stats()
+        self.assertEqual(stats["threads"], 1)
+        self.assertEqual(stats["min_threads"], 1)
+        self.assertEqual(stats["max_threads"], 4)
+
+        # Block the threads: the pool grows up to its maximum
+        event = threading.Event()
+        futures = [self.pool.enqueue(event.wait) for _ in range(6)]
+        stats = self.pool.get_stats()
+        self.assertEqual(stats["threads"], 4)
+        self.assertEqual(stats["spawned"], 4)
+
+        # Wait for the threads to take the tasks
+        time.sleep(.1)
+        self.assertEqual(self.pool.get_stats()["queued"], 2)
+
+        # Release them
+        event.set()
+        for future in futures:
+            future.result(1)
+
+        # Idle threads above the minimum are retired
+        time.sleep(.5)
+        stats = self.pool.get_stats()
+        self.assertEqual(stats["threads"], 1)
+        self.assertEqual(stats["idle"], 1)
+        self.assertEqual(stats["retired"], 3)
+
+        # The pool still works
+        self.assertEqual(self.pool.enqueue(_slow_call, 0, 42).result(1), 42)
+        self.pool.stop()
+        self.assertEqual(self.pool.get_stats()["threads"], 0)
+
+
+    def testNoMinThreads(self):
+        """
+        Tests a pool without minimal threads
+        """
+        self.pool = threadpool.ThreadPool(2, timeout=.1)
+        self.pool.start()
+        self.assertEqual(self.pool.get_stats()["threads"], 0)
+
+        # A thread is started for the task
+        self.assertEqual(self.pool.enqueue(_slow_call, 0, 42).result(1), 42)
+
+        # ... and stopped when idle
+        time.sleep(.3)
+        self.assertEqual(self.pool.get_stats()["threads"], 0)
+
+        # A new one is started for the next task
+        self.assertEqual(self.pool.enqueue(_slow_call, 0, 24).result(1), 24)
+
+
+    def testPriorities(self):
+        """
+        Tests the order of execution of tasks with priorities
+        """
+        self.pool = threadpool.ThreadPool(1)
+        order = []
+
+        # Enqueue tasks before starting the pool
+        futures = [self.pool.enqueue_task(order.append, (name,),
+                                          priority=priority)
+                   for name, priority in (("low-1", -1), ("normal-1", 0),
+                                          ("high-1", 5), ("normal-2", 0),
+                                          ("low-2", -1), ("high-2", 5))]
+        futures.append(self.pool.enqueue(order.append, "normal-3"))
+
+        self.pool.start()
+        for future in futures:
+            future.result(1)
+
+        self.assertEqual(order, ["high-1", "high-2", "normal-1", "normal-2",
+                                 "normal-3", "low-1", "low-2"])
+
+
+    def testDeadline(self):
+        """
+        Tests the tasks dropped after their deadline
+        """
+        self.pool = threadpool.ThreadPool(1)
+        event = threading.Event()
+        self.pool.start()
+
+        # Block the pool
+        self.pool.enqueue(event.wait, 1)
+        expired = self.pool.enqueue_task(_slow_call, (0, 1), deadline=.1)
+        kept = self.pool.enqueue_task(_slow_call, (0, 2), deadline=10)
+
+        time.sleep(.2)
+        event.set()
+
+        self.assertIsNone(expired.result(1))
+        self.assertTrue(expired.expired())
+        self.assertEqual(kept.result(1), 2)
+        self.assertFalse(kept.expired())
+        self.assertEqual(self.pool.get_stats()["expired"], 1)
+
+
+    def testCancelTask(self):
+        """
+        Tests the cancellation of a queued task
+        """
+        self.pool = threadpool.ThreadPool(1)
+        called = []
+        cancelled = self.pool.enqueue(called.append, 1)
+        executed = self.pool.enqueue(called.append, 2)
+        self.assertTrue(cancelled.cancel())
+
+        self.pool.start()
+        executed.result(1)
+        self.assertEqual(called, [2])
+        self.assertFalse(executed.cancel())
+
+
+    def testEnqueueMany(self):
+        """
+        Tests the batch submission of tasks
+        """
+        self.pool = threadpool.ThreadPool(1)
+        order = []
+
+        futures = self.pool.enqueue_many(order.append, ((idx,)
+                                                        for idx in range(5)))
+        self.assertEqual(len(futures), 5)
+        self.assertIsNone(self.pool.enqueue_many(order.append,
+                                                 [(5,), (6,)],
+                                                 fire_and_forget=True))
+        self.assertEqual(self.pool.enqueue_many(order.append, []), [])
+        high = self.pool.enqueue_many(order.append, [("high",)], priority=1)
+
+        self.pool.start()
+        self.pool.enqueue(order.append, "end").result(1)
+        self.assertEqual(order, ["high"] + list(range(7)) + ["end"])
+        self.assertTrue(all(future.done() for future in futures + high))
+
+        # Batch added to a running pool
+        del order[:]
+        futures = self.pool.enqueue_many(order.append, [(1,), (2,)])
+        self.assertTrue(threadpool.wait_all(futures, 1))
+        self.assertEqual(order, [1, 2])
+
+        self.assertRaises(ValueError, self.pool.enqueue_many, "", [])
+
+
+    def testEnqueueManyBounded(self):
+        """
+        Tests the batch submission of tasks in a bounded queue
+        """
+        self.pool = threadpool.ThreadPool(1, queue_size=2, timeout=.1)
+        order = []
+
+        # The batch is stored until the queue is full
+        self.assertRaises(queue.Full, self.pool.enqueue_many, order.append,
+                          [(idx,) for idx in range(3)])
+        self.assertEqual(self.pool.get_stats()["queued"], 2)
+
+        # The stored tasks are executed
+        self.pool.start()
+        self.assertTrue(self.pool.join(1))
+        self.assertEqual(order, [0, 1])
+
+        # Batches bigger than the queue are stored once there are free slots
+        futures = self.pool.enqueue_many(order.append,
+                                         [(idx,) for idx in range(10)])
+        self.assertTrue(threadpool.wait_all(futures, 1))
+        self.assertEqual(order, [0, 1] + list(range(10)))
+
+        # Batch stored directly in the queue
+        task_queue = threadpool._TaskQueue(2)
+        self.assertRaises(queue.Full, task_queue.put_many, [1, 2, 3],
+                          True, .1)
+        self.assertRaises(queue.Full, task_queue.put_many, [4], False)
+        self.assertEqual([task_queue.get_nowait() for _ in range(2)], [1, 2])
+        self.assertFalse(task_queue.wait_tasks(.1))
+        task_queue.task_done()
+        task_queue.task_done()
+        self.assertTrue(task_queue.wait_tasks(.1))
+
+
+    def testFireAndForget(self):
+        """
+        Tests the tasks enqueued without FutureResult
+        """
+        self.pool = threadpool.ThreadPool(2)
+        self.pool.start()
+        event = threading.Event()
+
+        self.assertIsNone(self.pool.enqueue_task(event.set,
+                                                 fire_and_forget=True))
+        self.assertTrue(event.wait(1))
+
+        # Errors are only logged
+        self.assertIsNone(self.pool.enqueue_task(int, ("a",),
+                                                 fire_and_forget=True))
+        self.assertEqual(self.pool.enqueue(_slow_call, 0, 1).result(1), 1)
+
+
+    def testSchedule(self):
+        """
+        Tests the delayed execution of tasks
+        """
+        self.pool = threadpool.ThreadPool(2)
+        self.pool.start()
+
+        start = time.time()
+        late = self.pool.schedule(.3, time.time)
+        early = self.pool.schedule(.1, time.time)
+        self.assertEqual(self.pool.get_stats()["scheduled"], 2)
+
+        self.assertGreaterEqual(early.result(1) - start, .1)
+        self.assertFalse(late.done())
+        self.assertGreaterEqual(late.result(1) - start, .3)
+        self.assertEqual(self.pool.get_stats()["scheduled"], 0)
+
+        # Scheduled tasks are forgotten when the pool stops
+        future = self.pool.schedule(.1, time.time)
+        self.pool.stop()
+        time.sleep(.2)
+        self.assertFalse(future.done())
+        self.assertEqual(self.pool.get_stats()["scheduled"], 0)
+
+# ------------------------------------------------------------------------------
+
+class ExecutorTest(unittest.TestCase):
+    """
+    Tests the shared executor
+    """
+    def setUp(self):
+        """
+        Sets up the test
+        """
+        self.executor = executor.Executor(2, timeout=.5)
+        self.executor.start()
+
+
+    def tearDown(self):
+        """
+        Cleans up the test
+        """
+        self.executor.stop()
+
+
+    def testQueue(self):
+        """
+        Tests the execution of the tasks of a queue
+        """
+        queue = self.executor.get_queue("test")
+        result = object()
+
+        # Tasks are not executed before the queue is started
+        future = queue.enqueue(_slow_call, 0, result)
+        time.sleep(.1)
+        self.assertFalse(future.done())
+
+        queue.start()
+        self.assertIs(future.result(1), result)
+        self.assertTrue(queue.join(1))
+
+        stats = queue.get_stats()
+        self.assertEqual(stats["name"], "test")
+        self.assertEqual(stats["executed"], 1)
+        self.assertEqual(stats["queued"], 0)
+        self.assertEqual(self.executor.get_stats()["queues"], [stats])
+
+        # Stopped queues are removed
+        queue.stop()
+        self.assertEqual(self.executor.get_stats()["queues"], [])
+
+        # Invalid parameters
+        for weight, concurrency in ((0, 0), (1.5, 0), (1, -1)):
+            self.assertRaises(ValueError, self.executor.get_queue, "test",
+                              weight, concurrency)
+
+
+    def testLimits(self):
+        """
+        Tests the global and per-queue concurrency limits
+        """
+        event = threading.Event()
+        lock = threading.Lock()
+        running = {"limited": 0, "free": 0}
+        maximum = {"limited": 0, "free": 0}
+
+        def task(name):
+            with lock:
+                running[name] += 1
+                maximum[name] = max(maximum[name], running[name])
+
+            event.wait(1)
+            with lock:
+                running[name] -= 1
+
+        limited = self.executor.get_queue("limited", max_concurrency=1)
+        free = self.executor.get_queue("free")
+        limited.start()
+        free.start()
+
+        futures = [queue.enqueue(task, queue.name)
+                   for queue in (limited, free) for _ in range(4)]
+        time.sleep(.2)
+
+        # The pool is full: one task of each queue
+        self.assertEqual(self.executor.get_stats()["pool"]["threads"], 2)
+        self.assertEqual(running, {"limited": 1, "free": 1})
+
+        event.set()
+        for future in futures:
+            future.result(2)
+
+        self.assertEqual(maximum["limited"], 1)
+        self.assertEqual(limited.get_stats()["executed"], 4)
+        self.assertEqual(free.get_stats()["executed"], 4)
+
+
+    def testWeights(self):
+        """
+        Tests the order of the tasks when the pool is saturated
+        """
+        # Single thread executor
+        self.executor.stop()
+        self.executor = executor.Executor(1)
+        self.executor.start()
+
+        order = []
+        event = threading.Event()
+        blocker = self.executor.get_queue("blocker")
+        heavy = self.executor.get_queue("heavy", 3)
+        light = self.executor.get_queue("light", 1)
+        for queue in (blocker, heavy, light):
+            queue.start()
+
+        # Block the pool while the tasks are enqueued
+        blocker.enqueue(event.wait, 1)
+        futures = [queue.enqueue(order.append, queue.name)
+                   for queue in (heavy, light) for _ in range(4)]
+        event.set()
+        for future in futures:
+            future.result(1)
+
+        # 3 heavy tasks for 1 light one, while both queues have tasks
+        self.assertEqual(order, ["heavy", "heavy", "light", "heavy",
+                                 "heavy", "light", "light", "light"])
+
+
+    def testStoppedExecutor(self):
+        """
+        Tests the queues of a stopped executor
+        """
+        started = self.executor.get_queue("started")
+        started.start()
+        future = started.enqueue(_slow_call, .2, 1)
+        pending = started.enqueue(_slow_call, 0, 2)
+        not_started = self.executor.get_queue("not-started")
+
+        self.executor.stop()
+
+        # Queues still work, with a private pool
+        self.assertEqual(future.result(1), 1)
+        self.assertEqual(pending.result(1), 2)
+        self.assertEqual(started.enqueue(_slow_call, 0, 3).result(1), 3)
+
+        not_started.start()
+        self.assertEqual(not_started.enqueue(_slow_call, 0, 4).result(1), 4)
+        started.stop()
+        not_started.stop()
+
+
+    def testEnqueueMany(self):
+        """
+        Tests the batch submission of tasks to a queue
+        """
+        queue = self.executor.get_queue("test")
+        results = []
+
+        # Tasks enqueued before the queue is started
+        futures = queue.enqueue_many(_slow_call, [(0, idx) for idx in range(3)])
+        self.assertIsNone(queue.enqueue_many(results.append,
+                                             [(idx,) for idx in range(3)],
+                                             fire_and_forget=True))
+        queue.start()
+        self.assertEqual([future.result(1) for future in futures], [0, 1, 2])
+
+        # ... and after
+        self.assertIsNone(queue.enqueue_many(results.append,
+                                             [(idx,) for idx in range(3, 6)],
+                                             fire_and_forget=True))
+        self.assertTrue(queue.join(1))
+        self.assertEqual(sorted(results), list(range(6)))
+        self.assertEqual(queue.get_stats()["executed"], 9)
+        self.assertRaises(ValueError, queue.enqueue_many, None, [()])
+        queue.stop()
+
+
+    def testService(self):
+        """
+        Tests the executor bundle
+        """
+        framework = FrameworkFactory.get_framework(
+                                {pelix.services.PROP_EXECUTOR_MAX_THREADS: 3})
+        try:
+            framework.start()
+            context = framework.get_bundle_context()
+            context.install_bundle("pelix.services.executor").start()
+
+            reference = context.get_service_reference(
+                                            pelix.services.SERVICE_EXECUTOR)
+            self.assertEqual(reference.get_property(
+                                pelix.services.PROP_EXECUTOR_MAX_THREADS), 3)
+
+            svc = context.get_service(reference)
+            queue = svc.get_queue("test")
+            queue.start()
+            self.assertEqual(queue.enqueue(_slow_call, 0, 42).result(1), 42)
+            self.assertEqual(svc.get_stats()["pool"]["max_threads"], 3)
+            queue.stop()
+
+        finally:
+            framework.stop()
+            FrameworkFactory.delete_framework(framework)
+
+# ------------------------------------------------------------------------------
+
+@unittest.skipIf(processpool is None, "concurrent.futures is not available")
+class ProcessExecutorTest(unittest.TestCase):
+    """
+    Tests the process pool executor
+    """
+    def setUp(self):
+        """
+        Sets up the test
+        """
+        self.executor = processpool.ProcessExecutor(
+                                        2, ["tests.simple_bundle"], "fork")
+        self.executor.start()
+
+
+    def tearDown(self):
+        """
+        Cleans up the test
+        """
+        self.executor.stop()
+
+
+    def testEnqueue(self):
+        """
+        Tests the execution of tasks in processes
+        """
+        futures = [self.executor.enqueue(pow, idx, 2) for idx in range(10)]
+        self.assertTrue(threadpool.wait_all(futures, 10))
+        self.assertEqual([future.result() for future in futures],
+                         [idx ** 2 for idx in range(10)])
+
+        # Exceptions are given back
+        self.assertRaises(ValueError,
+                          self.executor.enqueue(int, "a").result, 10)
+
+        # Workers imported the given bundles
+        self.assertTrue(self.executor.enqueue(_warmed_up).result(10))
+        self.assertEqual(self.executor.get_stats()["pending"], 0)
+
+        # Invalid calls
+        self.assertRaises(ValueError, self.executor.enqueue, "")
+        self.executor.stop()
+        self.assertRaises(ValueError, self.executor.enqueue, pow, 1, 2)
+
+
+    @unittest.skipIf(processpool is None or processpool.shared_memory is None,
+                     "Shared memory is not available")
+    def testSharedBuffer(self):
+        """
+        Tests the shared memory buffers
+        """
+        data = bytes(bytearray(range(256))) * 1024
+        buffer = self.executor.create_buffer(data=data)
+        self.assertGreaterEqual(buffer.size, len(data))
+        self.assertEqual(self.executor.enqueue(
+                                _checksum, buffer, len(data)).result(10),
+                         sum(bytearray(data)))
+
+        # Written by a worker
+        self.executor.enqueue(_fill, buffer, 7).result(10)
+        self.assertEqual(bytes(buffer.buf[:3]), b"\x07\x07\x07")
+
+        self.assertEqual(self.executor.get_stats()["buffers"], 1)
+        self.executor.release_buffer(buffer)
+        self.assertEqual(self.executor.get_stats()["buffers"], 0)
+
+
+    def testService(self):
+        """
+        Tests the process pool bundle
+        """
+        framework = FrameworkFactory.get_framework(
+                    {pelix.services.PROP_PROCESS_EXECUTOR_PROCESSES: 1,
+                     pelix.services.PROP_PROCESS_EXECUTOR_METHOD: "fork"})
+        try:
+            framework.start()
+            context = framework.get_bundle_context()
+            context.install_bundle("pelix.services.processpool").start()
+
+            reference = context.get_service_reference(
+                                    pelix.services.SERVICE_PROCESS_EXECUTOR)
+            self.assertEqual(reference.get_property(
+                        pelix.services.PROP_PROCESS_EXECUTOR_PROCESSES), 1)
+
+            svc = context.get_service(reference)
+            self.assertEqual(svc.enqueue(pow, 2, 10).result(10), 1024)
+
+        finally:
+            framework.stop()
+            FrameworkFactory.delete_framework(framework)
+
 # ------------------------------------------------------------------------------
 
 if __name__ == "__main__":